@@ -242,6 +242,38 @@ def _build_parser(**kwargs):
         help="attempt to reduce memory usage (will increase disk usage "
         "in working directory)",
     )
+    g_perfm.add_argument(
+        "--fused-resampling",
+        dest="fused_resampling",
+        required=False,
+        action="store_true",
+        default=False,
+        help="Resample BOLD series within a single multi-threaded process that composes "
+        "all transforms once and writes the output directly, instead of splitting the "
+        "series and resampling each volume with ANTs (the aCompCor masks are also "
+        "projected onto the BOLD grid in one step)",
+    )
+    g_perfm.add_argument(
+        "--lazy-native",
+        dest="lazy_native",
+        required=False,
+        action="store_true",
+        default=False,
+        help="Do not resample the whole BOLD series in native space unless it is a "
+        "requested output: the reference is calculated from the first volumes only, "
+        "and confounds are computed correcting head-motion on the fly (requires "
+        "--fused-resampling and --fused-confounds; single-echo runs without fieldmaps)",
+    )
+    g_perfm.add_argument(
+        "--parallel-hmc",
+        dest="parallel_hmc",
+        required=False,
+        action="store_true",
+        default=False,
+        help="Estimate head-motion with concurrent MCFLIRT processes, each registering a "
+        "chunk of consecutive volumes to the BOLD reference, instead of a single process "
+        "over the whole series",
+    )
     g_perfm.add_argument(
         "--use-plugin",
         "--nipype-plugin-file",
@@ -408,6 +440,15 @@ Useful for further Tedana processing post-fMRIPrep."""
         help="Exact or maximum number of MELODIC components to estimate "
         "(positive = exact, negative = maximum)",
     )
+    g_aroma.add_argument(
+        "--aroma-native",
+        dest="aroma_native",
+        action="store_true",
+        default=False,
+        help="Classify MELODIC components and denoise within fMRIPrep, computing "
+        "the features of ICA-AROMA for all components at once, instead of running "
+        "ICA_AROMA.py",
+    )
 
     # Confounds options
     g_confounds = parser.add_argument_group("Specific options for estimating confounds")
@@ -441,6 +482,26 @@ Useful for further Tedana processing post-fMRIPrep."""
         help="Threshold for flagging a frame as an outlier on the basis of standardised "
         "DVARS",
     )
+    g_confounds.add_argument(
+        "--fused-confounds",
+        dest="fused_confounds",
+        required=False,
+        action="store_true",
+        default=False,
+        help="Calculate DVARS, global signals, tCompCor and aCompCor within a single "
+        "process that reads the BOLD series only once",
+    )
+    g_confounds.add_argument(
+        "--confounds-only",
+        dest="confounds_only",
+        required=False,
+        action="store_true",
+        default=False,
+        help="Recalculate only the confounds (e.g., with new spike thresholds), reusing "
+        "the native-space BOLD series, masks, transforms and head-motion estimates of "
+        "a previous run found in the output directory (which must have been run with "
+        "--output-spaces func). Only the confounds files are overwritten",
+    )
 
     #  ANTs options
     g_ants = parser.add_argument_group("Specific options for ANTs registrations")
@@ -80,13 +80,14 @@ def main():
     if retcode != 0:
         sys.exit(retcode)
 
-    # Generate boilerplate
-    with Manager() as mgr:
-        from .workflow import build_boilerplate
+    # Generate boilerplate (unless only confounds are recalculated)
+    if not config.workflow.confounds_only:
+        with Manager() as mgr:
+            from .workflow import build_boilerplate
 
-        p = Process(target=build_boilerplate, args=(str(config_file), fmriprep_wf))
-        p.start()
-        p.join()
+            p = Process(target=build_boilerplate, args=(str(config_file), fmriprep_wf))
+            p.start()
+            p.join()
 
     if config.execution.boilerplate_only:
         sys.exit(int(retcode > 0))
@@ -155,7 +156,7 @@ def main():
                 f"boilerplate text found in {boiler_file}.",
             )
 
-        if config.workflow.run_reconall:
+        if config.workflow.run_reconall and not config.workflow.confounds_only:
             from templateflow import api
             from niworkflows.utils.misc import _copy_any
 
@@ -168,28 +169,33 @@ def main():
             )
         errno = 0
     finally:
-        from fmriprep.reports.core import generate_reports
-        from pkg_resources import resource_filename as pkgrf
-
-        # Generate reports phase
-        failed_reports = generate_reports(
-            config.execution.participant_label,
-            config.execution.fmriprep_dir,
-            config.execution.run_uuid,
-            config=pkgrf("fmriprep", "data/reports-spec.yml"),
-            packagename="fmriprep",
-        )
-        write_derivative_description(
-            config.execution.bids_dir, config.execution.fmriprep_dir
-        )
-        write_bidsignore(config.execution.fmriprep_dir)
-
-        if failed_reports and not config.execution.notrack:
-            sentry_sdk.capture_message(
-                "Report generation failed for %d subjects" % failed_reports,
-                level="error",
+        # Recalculating confounds leaves reports and dataset metadata untouched
+        if not config.workflow.confounds_only:
+            from fmriprep.reports.core import generate_reports
+            from pkg_resources import resource_filename as pkgrf
+
+            # Generate reports phase
+            failed_reports = generate_reports(
+                config.execution.participant_label,
+                config.execution.fmriprep_dir,
+                config.execution.run_uuid,
+                config=pkgrf("fmriprep", "data/reports-spec.yml"),
+                packagename="fmriprep",
+            )
+            write_derivative_description(
+                config.execution.bids_dir, config.execution.fmriprep_dir
             )
-        sys.exit(int((errno + failed_reports) > 0))
+            write_bidsignore(config.execution.fmriprep_dir)
+
+            if failed_reports and not config.execution.notrack:
+                sentry_sdk.capture_message(
+                    "Report generation failed for %d subjects" % failed_reports,
+                    level="error",
+                )
+            sys.exit(int((errno + failed_reports) > 0))
+
+    # Only reached if confounds were recalculated successfully
+    sys.exit(errno)
 
 
 if __name__ == "__main__":
@@ -523,6 +523,8 @@ class workflow(_Config):
     aroma_melodic_dim = None
     """Number of ICA components to be estimated by MELODIC
     (positive = exact, negative = maximum)."""
+    aroma_native = False
+    """Classify ICA-AROMA components in-process, instead of running ``ICA_AROMA.py``."""
     bold2t1w_dof = None
     """Degrees of freedom of the BOLD-to-T1w registration steps."""
     bold2t1w_init = "register"
@@ -530,6 +532,8 @@ class workflow(_Config):
     BOLD image-header ('header')."""
     cifti_output = None
     """Generate HCP Grayordinates, accepts either ``'91k'`` (default) or ``'170k'``."""
+    confounds_only = False
+    """Recalculate confounds from the derivatives of a previous run in the output directory."""
     dummy_scans = None
     """Set a number of initial scans to be considered nonsteady states."""
     fmap_bspline = None
@@ -538,14 +542,24 @@ class workflow(_Config):
     """Remove the mean from fieldmaps."""
     force_syn = None
     """Run *fieldmap-less* susceptibility-derived distortions estimation."""
+    fused_confounds = False
+    """Calculate DVARS, global signals and CompCor reading the BOLD series only once."""
+    fused_resampling = False
+    """Resample BOLD series in one shot within a single, multi-threaded process
+    (and project the aCompCor masks in a single step)."""
     hires = None
     """Run FreeSurfer ``recon-all`` with the ``-hires`` flag."""
     ignore = None
     """Ignore particular steps for *fMRIPrep*."""
+    lazy_native = False
+    """Do not resample the whole BOLD series in native space unless it is written out
+    (requires ``fused_resampling`` and ``fused_confounds``)."""
     longitudinal = False
     """Run FreeSurfer ``recon-all`` with the ``-logitudinal`` flag."""
     medial_surface_nan = None
     """Fill medial surface with :abbr:`NaNs (not-a-number)` when sampling."""
+    parallel_hmc = False
+    """Estimate head-motion running MCFLIRT concurrently on chunks of the BOLD series."""
     regressors_all_comps = None
     """Return all CompCor components."""
     regressors_dvars_th = None
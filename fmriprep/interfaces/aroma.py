@@ -0,0 +1,360 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright 2021 The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""
+In-process ICA-AROMA classification.
+
+Reimplements the classification and denoising steps of ICA-AROMA (v0.4.x)
+on top of an existing MELODIC run, computing the features of all components
+at once instead of one component (and one subprocess) at a time.
+
+"""
+import os
+from shutil import which
+import numpy as np
+import nibabel as nb
+from nipype import logging
+from nipype.interfaces.base import (
+    traits, TraitedSpec, BaseInterfaceInputSpec, File, Directory, isdefined,
+    SimpleInterface,
+)
+from nipype.interfaces.mixins import reporting
+from niworkflows.interfaces.reportlets import base as nrb
+
+LOGGER = logging.getLogger('nipype.interface')
+
+# Classification criteria of ICA-AROMA
+THR_CSF = 0.10
+THR_HFC = 0.35
+HYPERPLANE = np.array([-19.9751070082159, 9.95127547670627, 24.8333160239175])
+
+
+class _ICAAROMAInputSpec(BaseInterfaceInputSpec):
+    in_file = File(exists=True, mandatory=True, desc='volume to be denoised')
+    melodic_dir = Directory(exists=True, mandatory=True,
+                            desc='MELODIC directory, with mixture-modeled statistics')
+    motion_parameters = File(exists=True, mandatory=True, desc='motion parameters file')
+    mask = File(exists=True, mandatory=True, desc='brain mask, in MNI152 space at 2mm')
+    TR = traits.Float(mandatory=True, desc='repetition time, in seconds')
+    denoise_type = traits.Enum('nonaggr', 'aggr', 'both', 'no', usedefault=True,
+                               desc='type of denoising strategy')
+    aroma_masks_dir = Directory(exists=True,
+                                desc="directory containing ICA-AROMA's CSF, edge and "
+                                     "out-of-brain masks (default: the directory of "
+                                     "ICA_AROMA.py, searched on the PATH)")
+    out_dir = Directory('out', usedefault=True, desc='output directory')
+    n_splits = traits.Int(1000, usedefault=True,
+                          desc='random splits of time points for the motion feature')
+    random_seed = traits.Int(42, usedefault=True, desc='seed drawing the random splits')
+
+
+class _ICAAROMAOutputSpec(TraitedSpec):
+    out_dir = Directory(exists=True, desc='ICA-AROMA-like output directory')
+    aggr_denoised_file = File(exists=True, desc='if generated: aggressively denoised volume')
+    nonaggr_denoised_file = File(exists=True,
+                                 desc='if generated: non aggressively denoised volume')
+
+
+class ICAAROMA(SimpleInterface):
+    """
+    Classify MELODIC components as in ICA-AROMA, and denoise the input.
+
+    The four features of ICA-AROMA (maximum correlation with realignment
+    parameters, high-frequency content, and edge and CSF fractions) are
+    computed for all components at once, and the output directory contains
+    the same ``classified_motion_ICs.txt``, ``classification_overview.txt``
+    and ``feature_scores.txt`` files (as well as the ``melodic.ica`` link)
+    as ICA-AROMA's.
+    Denoising projects all components out of the data with a single
+    pseudoinverse of the mixing matrix, as ``fsl_regfilt`` does.
+
+    The random splits of time points underlying the motion feature are seeded,
+    so results are reproducible (ICA-AROMA draws them without a fixed seed).
+
+    """
+
+    input_spec = _ICAAROMAInputSpec
+    output_spec = _ICAAROMAOutputSpec
+
+    def _run_interface(self, runtime):
+        masks_dir = self.inputs.aroma_masks_dir
+        if not isdefined(masks_dir):
+            aroma = which('ICA_AROMA.py')
+            if aroma is None:
+                raise RuntimeError("ICA-AROMA's masks were not provided, and could not be "
+                                   "found next to ICA_AROMA.py.")
+            masks_dir = os.path.dirname(os.path.realpath(aroma))
+
+        out_dir = os.path.abspath(os.path.join(runtime.cwd, self.inputs.out_dir))
+        os.makedirs(out_dir, exist_ok=True)
+        melodic_dir = os.path.join(out_dir, 'melodic.ica')
+        if not os.path.lexists(melodic_dir):
+            os.symlink(os.path.abspath(self.inputs.melodic_dir), melodic_dir)
+
+        mix = np.loadtxt(os.path.join(melodic_dir, 'melodic_mix'), ndmin=2)
+        ft_mix = np.loadtxt(os.path.join(melodic_dir, 'melodic_FTmix'), ndmin=2)
+        zstats, mask = _thresholded_zstats(melodic_dir, mix.shape[1], self.inputs.mask)
+
+        max_rp_corr = _feature_time_series(
+            mix, np.loadtxt(self.inputs.motion_parameters, ndmin=2)[:, :6],
+            n_splits=self.inputs.n_splits, random_seed=self.inputs.random_seed)
+        hfc = _feature_frequency(ft_mix, self.inputs.TR)
+        edge_fract, csf_fract = _feature_spatial(zstats, mask, masks_dir)
+        motion_ics = _classification(out_dir, max_rp_corr, edge_fract, hfc, csf_fract)
+
+        self._results['out_dir'] = out_dir
+        for den_type in ('nonaggr', 'aggr'):
+            if self.inputs.denoise_type not in (den_type, 'both'):
+                continue
+            out_file = os.path.join(out_dir, 'denoised_func_data_%s.nii.gz' % den_type)
+            if motion_ics.size:
+                _denoising(self.inputs.in_file, mix, motion_ics, out_file,
+                           aggressive=den_type == 'aggr')
+            else:
+                LOGGER.warning('None of the components were classified as motion, '
+                               'so no denoising is applied.')
+                os.symlink(os.path.abspath(self.inputs.in_file), out_file)
+            self._results['%s_denoised_file' % den_type] = out_file
+        return runtime
+
+
+class _ICAAROMAInputSpecRPT(nrb._SVGReportCapableInputSpec, _ICAAROMAInputSpec):
+    out_report = File('ica_aroma_reportlet.svg', usedefault=True,
+                      desc='Filename for the visual report generated by Nipype.')
+    report_mask = File(desc='Mask used to draw the outline on the reportlet. '
+                            'If not set the mask will be derived from the data.')
+
+
+class _ICAAROMAOutputSpecRPT(reporting.ReportCapableOutputSpec, _ICAAROMAOutputSpec):
+    pass
+
+
+class ICAAROMARPT(reporting.ReportCapableInterface, ICAAROMA):
+    """:py:class:`ICAAROMA` with the components reportlet of ``ICA_AROMARPT``."""
+
+    input_spec = _ICAAROMAInputSpecRPT
+    output_spec = _ICAAROMAOutputSpecRPT
+
+    def _post_run_hook(self, runtime):
+        self._noise_components_file = os.path.join(
+            self._results['out_dir'], 'classified_motion_ICs.txt')
+        return super()._post_run_hook(runtime)
+
+    def _generate_report(self):
+        from niworkflows.viz.utils import plot_melodic_components
+
+        plot_melodic_components(
+            melodic_dir=self.inputs.melodic_dir,
+            in_file=self.inputs.in_file,
+            out_file=self.inputs.out_report,
+            compress=self.inputs.compress_report,
+            report_mask=self.inputs.report_mask,
+            noise_components_file=self._noise_components_file,
+        )
+
+
+def _thresholded_zstats(melodic_dir, n_components, mask_file):
+    """
+    Stack the mixture-modeled, thresholded spatial maps of all components.
+
+    As in ICA-AROMA, the last map of each ``stats/thresh_zstat<N>`` file is taken
+    (when mixture modeling did not converge, the null-hypothesis test map comes
+    second), and maps are masked.
+
+    Returns an array of shape (voxels within the mask, components), and the mask.
+
+    """
+    mask = np.asanyarray(nb.load(mask_file).dataobj) != 0
+    zstats = np.zeros((np.count_nonzero(mask), n_components), dtype='float32')
+    for i in range(n_components):
+        img = nb.load(os.path.join(melodic_dir, 'stats', 'thresh_zstat%d.nii.gz' % (i + 1)))
+        data = img.dataobj[..., -1] if len(img.shape) > 3 else img.dataobj
+        zstats[:, i] = np.asanyarray(data)[mask]
+    return zstats, mask
+
+
+def _feature_time_series(mix, rp6, n_splits=1000, random_seed=42):
+    """
+    Maximum correlation of every component with a realignment-parameters model.
+
+    The model comprises the six parameters, their derivatives, and these twelve
+    regressors shifted one time point forward and backward; correlations are
+    taken with and without squaring both the components and the model.
+    The score is the mean, over random subsets of 90% of the time points, of the
+    maximum absolute correlation of each component.
+    All splits are evaluated at once, through weighted sums of products.
+
+    >>> rng = np.random.default_rng(0)
+    >>> rp6 = rng.normal(size=(50, 6))
+    >>> mix = np.stack((rp6[:, 0], rng.normal(size=50)), axis=1)
+    >>> corr = _feature_time_series(mix, rp6, n_splits=10)
+    >>> bool(np.isclose(corr[0], 1.0)), bool(corr[1] < 0.9)
+    (True, True)
+
+    """
+    rp6_der = np.vstack((np.zeros(6), np.diff(rp6, axis=0)))
+    rp12 = np.hstack((rp6, rp6_der))
+    rp12_1fw = np.vstack((np.zeros(12), rp12[:-1]))
+    rp12_1bw = np.vstack((rp12[1:], np.zeros(12)))
+    rp_model = np.hstack((rp12, rp12_1fw, rp12_1bw))
+
+    n_rows, n_ics = mix.shape
+    # Time points are drawn from the first rows of the model, as in ICA-AROMA
+    rp_model = rp_model[:n_rows]
+    n_chosen = int(round(0.9 * n_rows))
+    rng = np.random.default_rng(random_seed)
+    weights = np.zeros((n_splits, n_rows))
+    chosen = np.argsort(rng.random((n_splits, n_rows)), axis=1)[:, :n_chosen]
+    np.put_along_axis(weights, chosen, 1.0, axis=1)
+
+    max_tc = np.zeros((n_splits, n_ics))
+    for x, y in ((mix ** 2, rp_model ** 2), (mix, rp_model)):
+        # Correlations are shift-invariant: center first for numerical stability
+        x = x - x.mean(axis=0)
+        y = y - y.mean(axis=0)
+        sx, sy = weights @ x, weights @ y
+        var_x = weights @ x ** 2 - sx ** 2 / n_chosen
+        var_y = weights @ y ** 2 - sy ** 2 / n_chosen
+        sxy = (weights @ (x[:, :, np.newaxis] * y[:, np.newaxis, :]).reshape(n_rows, -1))
+        sxy = sxy.reshape(n_splits, n_ics, -1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correl = (sxy - sx[..., np.newaxis] * sy[:, np.newaxis] / n_chosen) / np.sqrt(
+                var_x[..., np.newaxis] * var_y[:, np.newaxis])
+        max_tc = np.maximum(max_tc, np.abs(correl).max(axis=2))
+
+    return max_tc.mean(axis=0)
+
+
+def _feature_frequency(ft_mix, tr):
+    """
+    High-frequency content of every component, from MELODIC's power spectra.
+
+    The score is the frequency (above 0.01 Hz, normalized to the range up to
+    the Nyquist frequency) at which half of the cumulative power is reached.
+
+    >>> ft_mix = np.ones((100, 2))
+    >>> ft_mix[50:, 1] = 0
+    >>> _feature_frequency(ft_mix, 2.0).round(2).tolist()
+    [0.5, 0.24]
+
+    """
+    nyquist = 0.5 / tr
+    freqs = nyquist * np.arange(1, ft_mix.shape[0] + 1) / ft_mix.shape[0]
+    keep = freqs > 0.01
+    ft_mix, freqs = ft_mix[keep], freqs[keep]
+    f_norm = (freqs - 0.01) / (nyquist - 0.01)
+    fcumsum_fract = np.cumsum(ft_mix, axis=0) / np.sum(ft_mix, axis=0)
+    return f_norm[np.argmin(np.abs(fcumsum_fract - 0.5), axis=0)]
+
+
+def _feature_spatial(zstats, mask, masks_dir):
+    """
+    Edge and CSF fractions of every component's spatial map.
+
+    Sums of absolute z-values (given for the voxels within ``mask``) within
+    ICA-AROMA's CSF, edge and out-of-brain masks are calculated for all
+    components with a single product per mask.
+    As in ICA-AROMA, fractions are zero where their denominator is (e.g., the
+    edge fraction of components lying entirely within the CSF).
+
+    """
+    zstats = np.abs(zstats)
+    tot_sum = zstats.sum(axis=0)
+    sums = {}
+    for name in ('csf', 'edge', 'out'):
+        aroma_mask = nb.load(os.path.join(masks_dir, 'mask_%s.nii.gz' % name))
+        aroma_mask = np.asanyarray(aroma_mask.dataobj)[mask] > 0
+        sums[name] = aroma_mask.astype('float32') @ zstats
+
+    if not (tot_sum != 0).all():
+        LOGGER.warning('The spatial maps of components %s are empty.',
+                       ', '.join(str(i + 1) for i in np.flatnonzero(tot_sum == 0)))
+    edge_fract = _safe_fraction(sums['out'] + sums['edge'], tot_sum - sums['csf'])
+    csf_fract = _safe_fraction(sums['csf'], tot_sum)
+    return edge_fract, csf_fract
+
+
+def _safe_fraction(num, den):
+    """Divide ``num`` by ``den``, with zeros where ``den`` is zero."""
+    out = np.zeros_like(den)
+    nonzero = den != 0
+    out[nonzero] = num[nonzero] / den[nonzero]
+    return out
+
+
+def _classification(out_dir, max_rp_corr, edge_fract, hfc, csf_fract):
+    """
+    Classify components as motion or non-motion, and write ICA-AROMA's text outputs.
+
+    Returns the (zero-based) indices of motion components.
+
+    """
+    proj = HYPERPLANE[0] + np.dot(np.stack((max_rp_corr, edge_fract), axis=1),
+                                  HYPERPLANE[1:])
+    is_motion = (proj > 0) | (csf_fract > THR_CSF) | (hfc > THR_HFC)
+    motion_ics = np.flatnonzero(is_motion)
+
+    np.savetxt(os.path.join(out_dir, 'feature_scores.txt'),
+               np.vstack((max_rp_corr, edge_fract, hfc, csf_fract)).T)
+    with open(os.path.join(out_dir, 'classified_motion_ICs.txt'), 'w') as f:
+        f.write(','.join('%d' % (i + 1) for i in motion_ics))
+
+    lines = ['\t'.join(['IC', 'Motion/noise', 'maximum RP correlation', 'Edge-fraction',
+                        'High-frequency content', 'CSF-fraction'])]
+    lines += [
+        '\t'.join(['%d' % (i + 1), str(bool(is_motion[i]))]
+                  + ['%.2f' % v for v in (max_rp_corr[i], edge_fract[i], hfc[i], csf_fract[i])])
+        for i in range(len(csf_fract))
+    ]
+    with open(os.path.join(out_dir, 'classification_overview.txt'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return motion_ics
+
+
+def _denoising(in_file, mix, motion_ics, out_file, aggressive=False, chunk_size=20000):
+    """
+    Regress motion components out of a BOLD series, as ``fsl_regfilt``.
+
+    Non-aggressive denoising subtracts the motion components' share of a fit of
+    the full (demeaned) mixing matrix; aggressive denoising fits only the motion
+    components.
+    The pseudoinverse of the design is computed once, and applied to chunks of
+    voxels.
+
+    """
+    img = nb.load(in_file)
+    data = img.get_fdata(dtype='float32').reshape(-1, img.shape[-1])
+    design = mix - mix.mean(axis=0)
+    noise = design[:, motion_ics]
+    if aggressive:
+        pinv = np.linalg.pinv(noise)
+    else:
+        pinv = np.linalg.pinv(design)[motion_ics]
+
+    for start in range(0, data.shape[0], chunk_size):
+        chunk = data[start:start + chunk_size].T
+        betas = pinv @ (chunk - chunk.mean(axis=0))
+        chunk -= (noise @ betas).astype('float32')
+
+    hdr = img.header.copy()
+    hdr.set_data_dtype('float32')
+    img.__class__(data.reshape(img.shape), img.affine, hdr).to_filename(out_file)
@@ -0,0 +1,248 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright 2021 The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Building grayordinates files from samples of the BOLD series."""
+from pathlib import Path
+
+import numpy as np
+import nibabel as nb
+from nipype.utils.filemanip import split_filename
+from nipype.interfaces.base import (
+    traits, TraitedSpec, BaseInterfaceInputSpec, File, Directory, SimpleInterface,
+)
+
+
+class _CiftiFromSamplesInputSpec(BaseInterfaceInputSpec):
+    subcortical_file = File(
+        exists=True, mandatory=True,
+        desc="BOLD series sampled at the nonzero voxels of ``label_file`` (in the order of "
+             "numpy.nonzero), with shape (voxels, 1, 1, volumes)")
+    label_file = File(exists=True, mandatory=True,
+                      desc="subcortical labels of the volumetric grayordinates")
+    surface_bolds = traits.List(
+        File(exists=True), mandatory=True, minlen=2, maxlen=2,
+        desc="list of surface BOLD GIFTI files (length 2 with order [L,R])")
+    surface_density = traits.Enum("32k", "59k", mandatory=True,
+                                  desc="Surface vertices density.")
+    TR = traits.Float(mandatory=True, desc="Repetition time")
+    subjects_dir = Directory(desc="FreeSurfer SUBJECTS_DIR")
+
+
+class _CiftiFromSamplesOutputSpec(TraitedSpec):
+    out_file = File(exists=True, desc="generated CIFTI file")
+    out_metadata = File(exists=True, desc="variant metadata JSON")
+    variant = traits.Str(desc="Name of variant space")
+    density = traits.Str(desc="Total number of grayordinates")
+
+
+class CiftiFromSamples(SimpleInterface):
+    """
+    Generate an HCP-grayordinates CIFTI file from the subcortical samples of a BOLD series.
+
+    This is a replacement of *NiWorkflows*' ``GenerateCifti``, which extracts
+    the subcortical grayordinates from a full ``MNI152NLin6Asym`` series
+    (resampled onto the grid of the labels if it does not match it).
+    Here, the series is only sampled at the labelled voxels (see the
+    ``reference_mask`` input of
+    :py:class:`~fmriprep.interfaces.resampling.ResampleSeries`), so that no
+    standard-space series needs to be written for the volumetric part.
+
+    """
+
+    input_spec = _CiftiFromSamplesInputSpec
+    output_spec = _CiftiFromSamplesOutputSpec
+
+    def _run_interface(self, runtime):
+        targets = ("fsLR", "MNI152NLin6Asym")
+        annotation_files = _get_annotation_files(self.inputs.surface_density)
+        out_metadata, variant, density = _write_variant_metadata(
+            self.inputs.surface_density, newpath=runtime.cwd
+        )
+        self._results.update({
+            "out_metadata": str(out_metadata),
+            "variant": variant,
+            "density": density,
+        })
+        self._results["out_file"] = _create_cifti_image(
+            self.inputs.subcortical_file,
+            self.inputs.label_file,
+            self.inputs.surface_bolds,
+            annotation_files,
+            self.inputs.TR,
+            targets,
+            newpath=runtime.cwd,
+        )
+        return runtime
+
+
+def _get_annotation_files(density):
+    """Fetch the fsLR labels of the medial wall [L,R] at the given surface density."""
+    import templateflow.api as tf
+
+    return [
+        str(f) for f in tf.get("fsLR", density=density, desc="nomedialwall", suffix="dparc")
+    ]
+
+
+def _write_variant_metadata(density, newpath=None):
+    """Write the JSON metadata of the HCP grayordinates variant."""
+    import json
+
+    grayords = {"32k": "91k", "59k": "170k"}[density]
+    out_metadata = Path(newpath or ".") / "dtseries_variant.json"
+    out_metadata.write_text(json.dumps({
+        "space": "HCP grayordinates",
+        "surface": "fsLR",
+        "volume": "MNI152NLin6Asym",
+        "surface_density": density,
+        "grayordinates": grayords,
+    }, indent=2))
+    return out_metadata, "HCP grayordinates", grayords
+
+
+def _reorient_las(img):
+    """Reorient an image to LAS, as the voxel indices of CIFTI brain models."""
+    from nibabel.orientations import axcodes2ornt, io_orientation, ornt_transform
+
+    ornt = ornt_transform(io_orientation(img.affine), axcodes2ornt("LAS"))
+    return img.as_reoriented(ornt)
+
+
+def _create_cifti_image(samples_file, label_file, bold_surfs, annotation_files, tr,
+                        targets, newpath=None):
+    """
+    Generate a CIFTI image from surface series and subcortical samples.
+
+    The brain models are those of *NiWorkflows*' ``_create_cifti_image``:
+    the cortical surfaces without the medial wall, and the labelled voxels
+    of each subcortical structure, indexed on the label grid reoriented to LAS.
+
+    Parameters
+    ----------
+    samples_file : :obj:`str`
+        BOLD series sampled at the nonzero voxels of ``label_file``, in the
+        order of :py:func:`numpy.nonzero`
+    label_file : :obj:`str`
+        Subcortical label file
+    bold_surfs : :obj:`list`
+        BOLD surface timeseries [L,R]
+    annotation_files : :obj:`list`
+        Surface label files used to remove the medial wall
+    tr : :obj:`float`
+        BOLD repetition time
+    targets : :obj:`tuple`
+        Surface and volumetric output spaces
+    newpath : :obj:`str`, optional
+        Output directory (default: the current directory)
+
+    Returns
+    -------
+    out_file : :obj:`str`
+        BOLD data saved as CIFTI dtseries
+
+    """
+    from nibabel import cifti2 as ci
+    from niworkflows.interfaces.cifti import CIFTI_STRUCT_WITH_LABELS
+
+    samples_img = nb.load(samples_file)
+    samples = samples_img.get_fdata(dtype="float32").reshape(-1, samples_img.shape[-1])
+    label_img = nb.load(label_file)
+    label_data = np.asanyarray(label_img.dataobj)
+    if np.count_nonzero(label_data) != samples.shape[0]:
+        raise ValueError(f"<{samples_file}> does not hold a sample per labelled voxel "
+                         f"of <{label_file}>.")
+
+    # Locate each sample on the label grid reoriented to LAS, as the labels
+    index = np.full(label_img.shape[:3], -1, dtype="int32")
+    index[np.nonzero(label_data)] = np.arange(samples.shape[0])
+    index_img = nb.Nifti1Image(index, label_img.affine)
+    index_img.header.set_data_dtype("int32")
+    label_img = _reorient_las(label_img)
+    label_data = np.asanyarray(label_img.dataobj).astype("int16")
+    index = np.asanyarray(_reorient_las(index_img).dataobj)
+
+    idx_offset = 0
+    brainmodels = []
+    series = []
+    for structure, labels in CIFTI_STRUCT_WITH_LABELS.items():
+        if labels is None:  # surface model
+            right = structure.endswith("RIGHT")
+            surf_ts = nb.load(bold_surfs[right])
+            annot = nb.load(annotation_files[right])
+            # remove medial wall
+            vertices = np.nonzero(annot.darrays[0].data)[0]
+            series.append(np.array([darray.data[vertices] for darray in surf_ts.darrays]))
+            bm = ci.Cifti2BrainModel(
+                index_offset=idx_offset,
+                index_count=len(vertices),
+                model_type="CIFTI_MODEL_TYPE_SURFACE",
+                brain_structure=structure,
+                vertex_indices=ci.Cifti2VertexIndices(vertices),
+                n_surface_vertices=len(surf_ts.darrays[0].data),
+            )
+            idx_offset += len(vertices)
+        else:
+            ijk = np.hstack([np.array(np.nonzero(label_data == label)) for label in labels])
+            if not ijk.shape[1]:  # skip structures without voxels
+                continue
+            series.append(samples[index[tuple(ijk)]].T)
+            bm = ci.Cifti2BrainModel(
+                index_offset=idx_offset,
+                index_count=ijk.shape[1],
+                model_type="CIFTI_MODEL_TYPE_VOXELS",
+                brain_structure=structure,
+                voxel_indices_ijk=ci.Cifti2VoxelIndicesIJK(ijk.T.tolist()),
+            )
+            idx_offset += ijk.shape[1]
+        brainmodels.append(bm)
+
+    # add volume information
+    brainmodels.append(
+        ci.Cifti2Volume(
+            label_img.shape[:3],
+            ci.Cifti2TransformationMatrixVoxelIndicesIJKtoXYZ(-3, label_img.affine),
+        )
+    )
+    series_map = ci.Cifti2MatrixIndicesMap(
+        (0,),
+        "CIFTI_INDEX_TYPE_SERIES",
+        number_of_series_points=samples.shape[1],
+        series_exponent=0,
+        series_start=0.0,
+        series_step=tr,
+        series_unit="SECOND",
+    )
+    geometry_map = ci.Cifti2MatrixIndicesMap(
+        (1,), "CIFTI_INDEX_TYPE_BRAIN_MODELS", maps=brainmodels
+    )
+    matrix = ci.Cifti2Matrix()
+    matrix.append(series_map)
+    matrix.append(geometry_map)
+    matrix.metadata = ci.Cifti2MetaData({"surface": targets[0], "volume": targets[1]})
+    img = ci.Cifti2Image(
+        dataobj=np.hstack(series).astype("float32"), header=ci.Cifti2Header(matrix)
+    )
+    img.nifti_header.set_intent("NIFTI_INTENT_CONNECTIVITY_DENSE_SERIES")
+
+    out_file = Path(newpath or ".") / f"{split_filename(samples_file)[1]}.dtseries.nii"
+    ci.save(img, str(out_file))
+    return str(out_file)
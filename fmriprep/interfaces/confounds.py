@@ -97,7 +97,7 @@ class FilterDropped(SimpleInterface):
             newpath=runtime.cwd)
 
         metadata = pd.read_csv(self.inputs.in_file, sep='\t')
-        metadata[metadata.retained].to_csv(self._results["out_file"], sep='\t', index=False)
+        _filter_dropped(metadata).to_csv(self._results["out_file"], sep='\t', index=False)
 
         return runtime
 
@@ -136,34 +136,212 @@ class RenameACompCor(SimpleInterface):
             use_ext=True,
             newpath=runtime.cwd)
 
-        components = pd.read_csv(self.inputs.components_file, sep='\t')
-        metadata = pd.read_csv(self.inputs.metadata_file, sep='\t')
-        all_comp_cor = metadata[metadata["retained"]]
+        components, metadata = _rename_acompcor(
+            pd.read_csv(self.inputs.components_file, sep='\t'),
+            pd.read_csv(self.inputs.metadata_file, sep='\t'),
+        )
+        components.to_csv(self._results["components_file"], sep='\t', index=False)
+        metadata.to_csv(self._results["metadata_file"], sep='\t', index=False)
+
+        return runtime
+
 
-        c_comp_cor = all_comp_cor[all_comp_cor["mask"] == "CSF"]
-        w_comp_cor = all_comp_cor[all_comp_cor["mask"] == "WM"]
-        a_comp_cor = all_comp_cor[all_comp_cor["mask"] == "combined"]
+class _CollateCompCorInputSpec(BaseInterfaceInputSpec):
+    acompcor_components = File(exists=True, mandatory=True, desc='input aCompCor components')
+    acompcor_metadata = File(exists=True, mandatory=True, desc='input aCompCor metadata')
+    tcompcor_metadata = File(exists=True, mandatory=True, desc='input tCompCor metadata')
+    additional_metadata = traits.Dict(desc='further metadata entries to be merged')
 
-        c_orig = c_comp_cor["component"]
-        c_new = [f"c_comp_cor_{i:02d}" for i in range(len(c_orig))]
 
-        w_orig = w_comp_cor["component"]
-        w_new = [f"w_comp_cor_{i:02d}" for i in range(len(w_orig))]
+class _CollateCompCorOutputSpec(TraitedSpec):
+    components_file = File(desc='output aCompCor components')
+    metadata_file = File(desc='output aCompCor metadata')
+    metadata = traits.Dict(desc='merged metadata of the retained CompCor components')
 
-        a_orig = a_comp_cor["component"]
-        a_new = [f"a_comp_cor_{i:02d}" for i in range(len(a_orig))]
 
-        (components.rename(columns=dict(zip(c_orig, c_new)))
-                   .rename(columns=dict(zip(w_orig, w_new)))
-                   .rename(columns=dict(zip(a_orig, a_new)))
-         ).to_csv(self._results["components_file"], sep='\t', index=False)
+class CollateCompCor(SimpleInterface):
+    """
+    Rename aCompCor components and gather the metadata of both CompCor decompositions.
 
-        metadata.loc[c_comp_cor.index, "component"] = c_new
-        metadata.loc[w_comp_cor.index, "component"] = w_new
-        metadata.loc[a_comp_cor.index, "component"] = a_new
+    This interface is equivalent to running :py:class:`RenameACompCor` on the
+    aCompCor outputs, :py:class:`FilterDropped` and
+    :py:class:`~niworkflows.interfaces.utility.TSV2JSON` on the metadata of both
+    decompositions, and merging the resulting dictionaries (followed by
+    ``additional_metadata``), but keeps all intermediate tables in memory.
 
-        metadata.to_csv(self._results["metadata_file"], sep='\t', index=False)
+    """
+    input_spec = _CollateCompCorInputSpec
+    output_spec = _CollateCompCorOutputSpec
+
+    def _run_interface(self, runtime):
+        self._results["components_file"] = fname_presuffix(
+            self.inputs.acompcor_components,
+            suffix='_renamed',
+            use_ext=True,
+            newpath=runtime.cwd)
+        self._results["metadata_file"] = fname_presuffix(
+            self.inputs.acompcor_metadata,
+            suffix='_renamed',
+            use_ext=True,
+            newpath=runtime.cwd)
+
+        components, acc_metadata = _rename_acompcor(
+            pd.read_csv(self.inputs.acompcor_components, sep='\t'),
+            pd.read_csv(self.inputs.acompcor_metadata, sep='\t'),
+        )
+        components.to_csv(self._results["components_file"], sep='\t', index=False)
+        acc_metadata.to_csv(self._results["metadata_file"], sep='\t', index=False)
+
+        tcc_metadata = pd.read_csv(self.inputs.tcompcor_metadata, sep='\t')
+        metadata = _metadata_dict(
+            _filter_dropped(tcc_metadata).drop(columns=['mask']), 'tCompCor')
+        metadata.update(_metadata_dict(_filter_dropped(acc_metadata), 'aCompCor'))
+        if isdefined(self.inputs.additional_metadata):
+            metadata.update(self.inputs.additional_metadata)
+        self._results["metadata"] = metadata
+
+        return runtime
+
+
+def _filter_dropped(metadata):
+    """Keep the retained components of a CompCor metadata table."""
+    return metadata[metadata["retained"]].reset_index(drop=True)
+
+
+def _rename_acompcor(components, metadata):
+    """Rename the retained aCompCor components after the mask they come from."""
+    all_comp_cor = metadata[metadata["retained"]]
+    for mask, prefix in (("CSF", "c"), ("WM", "w"), ("combined", "a")):
+        comp_cor = all_comp_cor[all_comp_cor["mask"] == mask]
+        new_names = [f"{prefix}_comp_cor_{i:02d}" for i in range(len(comp_cor))]
+        components = components.rename(columns=dict(zip(comp_cor["component"], new_names)))
+        metadata.loc[comp_cor.index, "component"] = new_names
+    return components, metadata
+
+
+def _metadata_dict(metadata, method):
+    """
+    Convert a CompCor metadata table into a dictionary indexed by component.
+
+    The conversion follows *NiWorkflows*' ``TSV2JSON`` (with ``enforce_case=True``),
+    so that both produce the same dictionaries.
+
+    >>> _metadata_dict(pd.DataFrame({
+    ...     'component': ['a_comp_cor_00'], 'mask': ['combined'],
+    ...     'singular_value': [10.0], 'retained': [True],
+    ... }), 'aCompCor')  # doctest: +NORMALIZE_WHITESPACE
+    {'a_comp_cor_00': {'Mask': 'combined', 'SingularValue': 10.0, 'Retained': True,
+                       'Method': 'aCompCor'}}
+
+    """
+    import json
+
+    def camel(match):
+        return "{}{}".format(match.group(1), match.group(2).upper())
+
+    metadata = metadata.set_index('component', drop=True)
+    metadata.index = [
+        re.sub(r"(^.+?|.*?)((?<![_A-Z])[A-Z]|(?<![_0-9])[0-9]+)",
+               lambda m: "{}_{}".format(m.group(1).lower(), m.group(2).lower()),
+               ''.join(i.split()).strip('#'), 0).lower()
+        for i in metadata.index
+    ]
+    metadata.columns = [
+        re.sub(r"(.*?)_([a-zA-Z0-9])", camel, ''.join(i.split()).strip('#').title(),
+               0).replace("Csf", "CSF")
+        for i in metadata.columns
+    ]
+    out_dict = json.loads(metadata.to_json(orient="index"))
+    for values in out_dict.values():
+        values.update({'Method': method})
+    return out_dict
+
+
+class _FusedConfoundsInputSpec(BaseInterfaceInputSpec):
+    in_file = File(exists=True, mandatory=True, desc="BOLD series")
+    in_mask = File(exists=True, mandatory=True, desc="BOLD brain mask")
+    acompcor_masks = InputMultiObject(
+        File(exists=True), mandatory=True,
+        desc="binary CSF, WM and combined aCompCor masks in BOLD space")
+    skip_vols = traits.Int(0, usedefault=True, desc="number of non steady state volumes")
+    repetition_time = traits.Float(desc="repetition time (TR) in seconds")
+    components_criterion = traits.Either(
+        traits.Range(low=0.0, high=1.0, exclude_low=True, exclude_high=True),
+        traits.Enum("all"), default=0.5, usedefault=True,
+        desc="fraction of variance explained by the retained CompCor components, "
+             "or 'all' to retain all of them")
+    high_pass_cutoff = traits.Float(
+        128, usedefault=True, desc="cutoff (in seconds) of the cosine high-pass filter")
+    percentile_threshold = traits.Range(
+        low=0.0, high=1.0, value=0.02, exclude_low=True, exclude_high=True,
+        usedefault=True, desc="fraction of highest-variance voxels used for tCompCor")
+    failure_mode = traits.Enum("NaN", "error", usedefault=True,
+                               desc="action to take when a decomposition fails")
+    svd_solver = traits.Enum(
+        "gram", "randomized", usedefault=True,
+        desc="preferred SVD solver (see fmriprep.utils.confounds.compcor_svd)")
+    chunk_size = traits.Int(32, usedefault=True, nohash=True,
+                            desc="number of volumes read at a time")
+    transforms = InputMultiObject(
+        traits.Either(File(exists=True), "identity"),
+        desc="transforms (e.g., head-motion correction) applied to the volumes of "
+             "``in_file`` as they are read, resampling them onto its own grid")
+    num_threads = traits.Int(1, usedefault=True, nohash=True,
+                             desc="number of volumes resampled in parallel")
+
+
+class _FusedConfoundsOutputSpec(TraitedSpec):
+    signals = File(exists=True, desc="global, CSF, WM, CSF+WM and tCompCor mean signals")
+    dvars_std = File(exists=True, desc="standardized DVARS")
+    dvars_nstd = File(exists=True, desc="non-standardized DVARS")
+    tcompcor = File(exists=True, desc="tCompCor components")
+    tcompcor_metadata = File(exists=True, desc="tCompCor metadata")
+    tcompcor_mask = File(exists=True, desc="voxels exceeding the variance threshold")
+    acompcor = File(exists=True, desc="aCompCor components")
+    acompcor_metadata = File(exists=True, desc="aCompCor metadata")
+    cos_basis = File(exists=True, desc="cosine basis and non-steady state regressors")
+    mean_file = File(exists=True, desc="temporal average of the BOLD series")
+
+
+class FusedConfounds(SimpleInterface):
+    """
+    Calculate DVARS, global signals, tCompCor and aCompCor in one pass.
+
+    The BOLD series is read (and decompressed) only once, streaming over
+    chunks of volumes.
+    Outputs follow the format of *Nipype*'s ``ComputeDVARS``, ``TCompCor``
+    and ``ACompCor`` (with ``mask_names=['CSF', 'WM', 'combined']``), and
+    *NiWorkflows*' ``SignalExtraction``, so that they can be fed into
+    :py:class:`RenameACompCor`, :py:class:`FilterDropped` and
+    :py:class:`GatherConfounds`.
+    If ``transforms`` are given, the series is preprocessed on the fly as it
+    is streamed, so that no preprocessed series needs to be written.
+
+    """
+    input_spec = _FusedConfoundsInputSpec
+    output_spec = _FusedConfoundsOutputSpec
+
+    def _run_interface(self, runtime):
+        from ..utils.confounds import fused_confounds
 
+        self._results.update(fused_confounds(
+            self.inputs.in_file,
+            self.inputs.in_mask,
+            self.inputs.acompcor_masks,
+            skip_vols=self.inputs.skip_vols,
+            repetition_time=(self.inputs.repetition_time
+                             if isdefined(self.inputs.repetition_time) else None),
+            components_criterion=self.inputs.components_criterion,
+            period_cut=self.inputs.high_pass_cutoff,
+            percentile_threshold=self.inputs.percentile_threshold,
+            failure_mode=self.inputs.failure_mode,
+            solver=self.inputs.svd_solver,
+            chunk_size=self.inputs.chunk_size,
+            transforms=(self.inputs.transforms
+                        if isdefined(self.inputs.transforms) else None),
+            num_threads=self.inputs.num_threads,
+            newpath=runtime.cwd,
+        ))
         return runtime
 
 
@@ -182,6 +360,7 @@ class GatherConfoundsInputSpec(BaseInterfaceInputSpec):
 
 class GatherConfoundsOutputSpec(TraitedSpec):
     confounds_file = File(exists=True, desc='output confounds file')
+    confounds_npz = File(exists=True, desc='output confounds, in columnar binary format')
     confounds_list = traits.List(traits.Str, desc='list of headers')
 
 
@@ -221,7 +400,7 @@ class GatherConfounds(SimpleInterface):
     output_spec = GatherConfoundsOutputSpec
 
     def _run_interface(self, runtime):
-        combined_out, confounds_list = _gather_confounds(
+        combined_out, binary_out, confounds_list = _gather_confounds(
             signals=self.inputs.signals,
             dvars=self.inputs.dvars,
             std_dvars=self.inputs.std_dvars,
@@ -235,10 +414,104 @@ class GatherConfounds(SimpleInterface):
             newpath=runtime.cwd,
         )
         self._results['confounds_file'] = combined_out
+        self._results['confounds_npz'] = binary_out
         self._results['confounds_list'] = confounds_list
         return runtime
 
 
+class _TSV2NPZInputSpec(BaseInterfaceInputSpec):
+    in_file = File(exists=True, mandatory=True, desc='input confounds TSV file')
+    out_file = File(desc='output path (default: input file name with .npz extension)')
+
+
+class _TSV2NPZOutputSpec(TraitedSpec):
+    out_file = File(exists=True, desc='confounds, in columnar binary format')
+
+
+class TSV2NPZ(SimpleInterface):
+    """
+    Convert a confounds TSV file into its columnar binary (``.npz``) counterpart.
+
+    The output can be read back with :py:func:`fmriprep.utils.confounds.read_confounds`.
+
+    """
+    input_spec = _TSV2NPZInputSpec
+    output_spec = _TSV2NPZOutputSpec
+
+    def _run_interface(self, runtime):
+        from ..utils.confounds import read_confounds, write_confounds_npz
+
+        out_file = self.inputs.out_file
+        if not isdefined(out_file):
+            out_file = fname_presuffix(self.inputs.in_file, suffix='.npz',
+                                       use_ext=False, newpath=runtime.cwd)
+        self._results['out_file'] = write_confounds_npz(
+            read_confounds(self.inputs.in_file), out_file)
+        return runtime
+
+
+class _PreviousConfoundsInputSpec(BaseInterfaceInputSpec):
+    in_file = File(exists=True, mandatory=True, desc='confounds file of a previous run')
+    in_metadata = File(exists=True, desc='metadata of the confounds file')
+    carry_over = traits.List(
+        traits.Str, ['aroma_motion_'], usedefault=True,
+        desc='prefixes of the columns to be kept as they are')
+
+
+class _PreviousConfoundsOutputSpec(TraitedSpec):
+    movpar_file = File(exists=True, desc='motion parameters (SPM format, no header)')
+    rmsd_file = File(exists=True, desc='RMS framewise displacement (no header)')
+    skip_vols = traits.Int(desc='number of non steady state volumes')
+    carry_over_file = traits.Either(None, File(exists=True),
+                                    desc='columns to be kept as they are')
+    carry_over_metadata = traits.Dict(desc='metadata of the columns to be kept as they are')
+
+
+class PreviousConfounds(SimpleInterface):
+    """
+    Recover the inputs to confounds calculation from the confounds file of a previous run.
+
+    Head-motion estimates (``trans_*``, ``rot_*`` and ``rmsd``) and the number of
+    non-steady-state volumes are extracted so that confounds can be recalculated
+    without running head-motion correction again.
+    Columns not generated by the confounds workflow (e.g., ICA-AROMA regressors)
+    are carried over with their metadata.
+
+    """
+    input_spec = _PreviousConfoundsInputSpec
+    output_spec = _PreviousConfoundsOutputSpec
+
+    def _run_interface(self, runtime):
+        import json
+
+        confounds = pd.read_csv(self.inputs.in_file, sep='\t', na_values='n/a')
+        motion = ['trans_x', 'trans_y', 'trans_z', 'rot_x', 'rot_y', 'rot_z']
+
+        self._results['movpar_file'] = os.path.join(runtime.cwd, 'motion_params.txt')
+        np.savetxt(self._results['movpar_file'], confounds[motion].values)
+        # The first frame has no RMSD (see GatherConfounds)
+        self._results['rmsd_file'] = os.path.join(runtime.cwd, 'rmsd.txt')
+        np.savetxt(self._results['rmsd_file'], confounds['rmsd'].dropna().values)
+        self._results['skip_vols'] = sum(
+            col.startswith('non_steady_state_outlier') for col in confounds.columns)
+
+        carry_over = [col for col in confounds.columns
+                      if col.startswith(tuple(self.inputs.carry_over))]
+        self._results['carry_over_file'] = None
+        self._results['carry_over_metadata'] = {}
+        if carry_over:
+            self._results['carry_over_file'] = os.path.join(runtime.cwd, 'carry_over.tsv')
+            confounds[carry_over].to_csv(self._results['carry_over_file'], sep='\t',
+                                         index=False, na_rep='n/a')
+            if isdefined(self.inputs.in_metadata):
+                with open(self.inputs.in_metadata) as f:
+                    metadata = json.load(f)
+                self._results['carry_over_metadata'] = {
+                    key: value for key, value in metadata.items()
+                    if key.startswith(tuple(self.inputs.carry_over))}
+        return runtime
+
+
 class ICAConfoundsInputSpec(BaseInterfaceInputSpec):
     in_directory = Directory(mandatory=True, desc='directory where ICA derivatives are found')
     skip_vols = traits.Int(desc='number of non steady state volumes identified')
@@ -291,7 +564,7 @@ def _gather_confounds(signals=None, dvars=None, std_dvars=None, fdisp=None,
     >>> os.chdir(tmpdir.name)
     >>> pd.DataFrame({'Global Signal': [0.1]}).to_csv('signals.tsv', index=False, na_rep='n/a')
     >>> pd.DataFrame({'stdDVARS': [0.2]}).to_csv('dvars.tsv', index=False, na_rep='n/a')
-    >>> out_file, confound_list = _gather_confounds('signals.tsv', 'dvars.tsv')
+    >>> out_file, _, confound_list = _gather_confounds('signals.tsv', 'dvars.tsv')
     >>> confound_list
     ['Global signals', 'DVARS']
 
@@ -303,27 +576,17 @@ def _gather_confounds(signals=None, dvars=None, std_dvars=None, fdisp=None,
 
 
     """
+    from ..utils.confounds import write_confounds_npz
 
-    def less_breakable(a_string):
-        ''' hardens the string to different envs (i.e., case insensitive, no whitespace, '#' '''
-        return ''.join(a_string.split()).strip('#')
+    def less_breakable(names):
+        ''' hardens the strings to different envs (i.e., case insensitive, no whitespace, '#' '''
+        return names.str.replace(r'\s+', '', regex=True).str.strip('#')
 
     # Taken from https://stackoverflow.com/questions/1175208/
     # If we end up using it more than just here, probably worth pulling in a well-tested package
-    def camel_to_snake(name):
-        s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
-        return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
-
-    def _adjust_indices(left_df, right_df):
-        # This forces missing values to appear at the beggining of the DataFrame
-        # instead of the end
-        index_diff = len(left_df.index) - len(right_df.index)
-        if index_diff > 0:
-            right_df.index = range(index_diff,
-                                   len(right_df.index) + index_diff)
-        elif index_diff < 0:
-            left_df.index = range(-index_diff,
-                                  len(left_df.index) - index_diff)
+    def camel_to_snake(names):
+        names = names.str.replace('(.)([A-Z][a-z]+)', r'\1_\2', regex=True)
+        return names.str.replace('([a-z0-9])([A-Z])', r'\1_\2', regex=True).str.lower()
 
     all_files = []
     confounds_list = []
@@ -342,15 +605,17 @@ def _gather_confounds(signals=None, dvars=None, std_dvars=None, fdisp=None,
             if os.path.exists(confound) and os.stat(confound).st_size > 0:
                 all_files.append(confound)
 
+    # assumes they all have headings already
+    all_data = [pd.read_csv(file_name, sep="\t") for file_name in all_files]
     confounds_data = pd.DataFrame()
-    for file_name in all_files:  # assumes they all have headings already
-        new = pd.read_csv(file_name, sep="\t")
-        for column_name in new.columns:
-            new.rename(columns={column_name: camel_to_snake(less_breakable(column_name))},
-                       inplace=True)
-
-        _adjust_indices(confounds_data, new)
-        confounds_data = pd.concat((confounds_data, new), axis=1)
+    if all_data:
+        # This forces missing values to appear at the beggining of the DataFrame
+        # instead of the end
+        nvols = max(len(new.index) for new in all_data)
+        for new in all_data:
+            new.index = range(nvols - len(new.index), nvols)
+        confounds_data = pd.concat(all_data, axis=1)
+        confounds_data.columns = camel_to_snake(less_breakable(confounds_data.columns))
 
     if newpath is None:
         newpath = os.getcwd()
@@ -358,8 +623,9 @@ def _gather_confounds(signals=None, dvars=None, std_dvars=None, fdisp=None,
     combined_out = os.path.join(newpath, 'confounds.tsv')
     confounds_data.to_csv(combined_out, sep='\t', index=False,
                           na_rep='n/a')
+    binary_out = write_confounds_npz(confounds_data, os.path.join(newpath, 'confounds.npz'))
 
-    return combined_out, confounds_list
+    return combined_out, binary_out, confounds_list
 
 
 def _get_ica_confounds(ica_out_dir, skip_vols, newpath=None):
@@ -441,7 +707,7 @@ class FMRISummaryInputSpec(BaseInterfaceInputSpec):
                    desc='3D brain mask')
     in_segm = File(exists=True, desc='resampled segmentation')
     confounds_file = File(exists=True,
-                          desc="BIDS' _confounds.tsv file")
+                          desc="BIDS' _confounds.tsv file, or its binary .npz counterpart")
 
     str_or_tuple = traits.Either(
         traits.Str,
@@ -467,6 +733,7 @@ class FMRISummary(SimpleInterface):
 
     def _run_interface(self, runtime):
         from niworkflows.viz.plots import fMRIPlot
+        from ..utils.confounds import read_confounds
 
         self._results['out_file'] = fname_presuffix(
             self.inputs.in_func,
@@ -474,11 +741,6 @@ class FMRISummary(SimpleInterface):
             use_ext=False,
             newpath=runtime.cwd)
 
-        dataframe = pd.read_csv(
-            self.inputs.confounds_file,
-            sep="\t", index_col=None, dtype='float32',
-            na_filter=True, na_values='n/a')
-
         headers = []
         units = {}
         names = {}
@@ -498,7 +760,7 @@ class FMRISummary(SimpleInterface):
             data = None
             units = None
         else:
-            data = dataframe[headers]
+            data = read_confounds(self.inputs.confounds_file, columns=headers).astype('float32')
 
         colnames = data.columns.ravel().tolist()
 
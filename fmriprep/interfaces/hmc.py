@@ -0,0 +1,168 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright 2021 The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Head-motion estimation interfaces."""
+import os
+from pathlib import Path
+
+from nipype.interfaces.base import (
+    traits, TraitedSpec, BaseInterfaceInputSpec, File, SimpleInterface, OutputMultiObject,
+)
+
+
+class _ChunkedMCFLIRTInputSpec(BaseInterfaceInputSpec):
+    in_file = File(exists=True, mandatory=True, desc="BOLD series")
+    ref_file = File(exists=True, mandatory=True,
+                    desc="reference image to which all volumes are registered")
+    chunk_size = traits.Int(50, usedefault=True,
+                            desc="number of volumes registered by each MCFLIRT process")
+    num_threads = traits.Int(1, usedefault=True, nohash=True,
+                             desc="number of MCFLIRT processes run concurrently")
+
+
+class _ChunkedMCFLIRTOutputSpec(TraitedSpec):
+    mat_file = OutputMultiObject(File(exists=True), desc="transformation matrices")
+    par_file = File(exists=True, desc="text file with motion parameters")
+    rms_files = OutputMultiObject(
+        File(exists=True), desc="absolute and relative displacement parameters")
+
+
+class ChunkedMCFLIRT(SimpleInterface):
+    """
+    Run MCFLIRT concurrently on consecutive chunks of volumes of a BOLD series.
+
+    Since all volumes are registered to the same reference (``ref_file``),
+    the series is split into chunks of ``chunk_size`` volumes, which are
+    registered by as many MCFLIRT processes as ``num_threads``.
+    Each chunk but the first one starts with the last volume of the previous
+    chunk, so that the relative displacement is also measured across chunks.
+    The outputs are then stitched back in order, with the names and formats
+    of those of MCFLIRT (``save_mats``, ``save_plots`` and ``save_rms``).
+
+    Since MCFLIRT initializes the registration of each volume with the
+    estimate of its neighbour, the parameters estimated at the boundaries of
+    the chunks may slightly differ from those of a single MCFLIRT process.
+
+    """
+
+    input_spec = _ChunkedMCFLIRTInputSpec
+    output_spec = _ChunkedMCFLIRTOutputSpec
+
+    def _run_interface(self, runtime):
+        from shutil import copyfile
+        import nibabel as nb
+        from nipype.utils.filemanip import fname_presuffix
+        from ..utils.images import split_volumes
+
+        n_vols = nb.load(self.inputs.in_file).shape[3]
+        segments = _chunk_segments(n_vols, self.inputs.chunk_size)
+        chunk_files = split_volumes(self.inputs.in_file, segments, [
+            Path(runtime.cwd) / f"chunk-{i:04d}.nii" for i in range(len(segments))
+        ])
+        args = [(chunk_file, self.inputs.ref_file) for chunk_file in chunk_files]
+
+        num_threads = min(self.inputs.num_threads, len(args))
+        if num_threads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=num_threads) as pool:
+                chunk_outs = list(pool.map(_mcflirt, args))
+        else:
+            chunk_outs = [_mcflirt(arg) for arg in args]
+
+        # Drop the volume each chunk shares with the previous one
+        out_file = fname_presuffix(self.inputs.in_file, suffix="_mcf", newpath=runtime.cwd)
+        mat_dir = Path(f"{out_file}.mat")
+        mat_dir.mkdir(exist_ok=True)
+        self._results["mat_file"] = []
+        for i, mat_file in enumerate(
+            mat for k, outs in enumerate(chunk_outs) for mat in outs.mat_file[bool(k):]
+        ):
+            self._results["mat_file"].append(str(mat_dir / f"MAT_{i:04d}"))
+            copyfile(mat_file, self._results["mat_file"][-1])
+
+        self._results["par_file"] = _stitch_lines(
+            [outs.par_file for outs in chunk_outs], f"{out_file}.par")
+        self._results["rms_files"] = [
+            _stitch_lines([outs.rms_files[0] for outs in chunk_outs], f"{out_file}_abs.rms"),
+            # Relative displacements are measured with respect to the previous volume
+            _stitch_lines([outs.rms_files[1] for outs in chunk_outs], f"{out_file}_rel.rms",
+                          overlap=False),
+        ]
+
+        # The motion-corrected chunks are not used
+        for chunk_file, outs in zip(chunk_files, chunk_outs):
+            os.remove(chunk_file)
+            os.remove(outs.out_file)
+        return runtime
+
+
+def _chunk_segments(n_vols, chunk_size):
+    """
+    Split a series into chunks of volumes, overlapping by one volume.
+
+    Examples
+    --------
+    >>> _chunk_segments(10, 4)
+    [(0, 4), (3, 8), (7, 10)]
+    >>> _chunk_segments(9, 4)
+    [(0, 4), (3, 8), (7, 9)]
+    >>> _chunk_segments(8, 4)
+    [(0, 4), (3, 8)]
+    >>> _chunk_segments(3, 4)
+    [(0, 3)]
+
+    """
+    chunk_size = max(chunk_size, 1)
+    return [(max(start - 1, 0), min(start + chunk_size, n_vols))
+            for start in range(0, n_vols, chunk_size)]
+
+
+def _mcflirt(args):
+    from nipype.interfaces import fsl
+
+    in_file, ref_file = args
+    return fsl.MCFLIRT(
+        in_file=str(in_file),
+        ref_file=ref_file,
+        out_file=str(in_file).replace(".nii", "_mcf.nii"),
+        output_type="NIFTI",
+        save_mats=True,
+        save_plots=True,
+        save_rms=True,
+        resource_monitor=False,
+    ).run().outputs
+
+
+def _stitch_lines(in_files, out_file, overlap=True):
+    """
+    Concatenate the rows of text files, skipping the first row of all files but the first.
+
+    Rows are copied as they are, so that the format of the inputs is preserved.
+    Set ``overlap`` to ``False`` to keep all rows.
+
+    """
+    with open(out_file, "w") as fout:
+        for i, in_file in enumerate(in_files):
+            with open(in_file) as fin:
+                fout.writelines(fin.readlines()[bool(i and overlap):])
+    return out_file
@@ -22,27 +22,127 @@ class Clip(SimpleInterface):
 
     If no values are outside the bounds, nothing is done and the in_file is passed
     as the out_file without copying.
+
+    The image is read one volume (one slice, for 3D images) at a time, in its
+    on-disk data type, and the search for out-of-bounds values stops at the first
+    volume containing any.
+    Clipped volumes are written as they are produced, keeping the data type and
+    scaling of the input, unless the bounds cannot be represented in that data
+    type, in which case the output is stored as ``float32``.
     """
     input_spec = ClipInputSpec
     output_spec = ClipOutputSpec
 
     def _run_interface(self, runtime):
         import nibabel as nb
+        from ..utils.images import _raw_volumes, write_volumes
+
         img = nb.load(self.inputs.in_file)
-        data = img.get_fdata()
+        in_dtype = img.get_data_dtype()
+        slope, inter = img.dataobj.slope, img.dataobj.inter
+        n_vols = img.shape[-1]
+
+        def _volumes():
+            for buf in _raw_volumes(img, 0, n_vols):
+                yield np.frombuffer(buf, dtype=in_dtype).reshape(img.shape[:-1], order="F")
+
+        # Bounds in the units of the stored values
+        low, high = sorted(((self.inputs.minimum - inter) / slope,
+                            (self.inputs.maximum - inter) / slope))
+        first = next((i for i, volume in enumerate(_volumes())
+                      if np.any((volume < low) | (volume > high))), None)
 
         out_file = self.inputs.out_file
         if out_file:
             out_file = os.path.join(runtime.cwd, out_file)
 
-        if np.any((data < self.inputs.minimum) | (data > self.inputs.maximum)):
+        if first is not None:
             if not out_file:
                 out_file = fname_presuffix(self.inputs.in_file, suffix="_clipped",
                                            newpath=runtime.cwd)
-            np.clip(data, self.inputs.minimum, self.inputs.maximum, out=data)
-            img.__class__(data, img.affine, img.header).to_filename(out_file)
+
+            hdr = img.header.copy()
+            native = in_dtype.kind == "f" or all(
+                np.isinf(bound) or float(bound).is_integer() for bound in (low, high))
+            if native:
+                # Loaded headers do not keep the scaling, which is held by the data proxy
+                hdr.set_slope_inter(slope, inter)
+            else:
+                hdr.set_data_dtype("float32")
+                hdr.set_slope_inter(1.0, 0.0)
+                low, high = self.inputs.minimum, self.inputs.maximum
+
+            def _clipped():
+                for i, volume in enumerate(_volumes()):
+                    if i < first and native:
+                        yield volume.tobytes(order="F")
+                        continue
+                    if not native:
+                        volume = volume * slope + inter
+                    yield np.clip(volume, low, high)
+
+            write_volumes(_clipped(), hdr, out_file)
         elif not out_file:
             out_file = self.inputs.in_file
 
         self._results["out_file"] = out_file
         return runtime
+
+
+class SUSANStatsInputSpec(TraitedSpec):
+    in_file = File(exists=True, mandatory=True, desc="4D input imaging file")
+    mask_file = File(exists=True, mandatory=True, desc="Mask within which the median is taken")
+    brightness_factor = traits.Float(0.75, usedefault=True,
+                                     desc="Fraction of the median used as brightness threshold")
+
+
+class SUSANStatsOutputSpec(TraitedSpec):
+    mean_file = File(exists=True, desc="Temporal mean of the input")
+    median = traits.Float(desc="Median of the input within the mask, across all volumes")
+    brightness_threshold = traits.Float(desc="Brightness threshold for SUSAN")
+    usans = traits.List(traits.Tuple(File(exists=True), traits.Float),
+                        desc="USAN image and brightness threshold for SUSAN")
+
+
+class SUSANStats(SimpleInterface):
+    """ Compute the statistics required to parameterize FSL's SUSAN in a single read
+
+    The temporal mean (as ``fslmaths -Tmean``) and the masked median
+    (as ``fslstats -k <mask> -p 50``) are calculated while streaming
+    the volumes of the input series once.
+    """
+    input_spec = SUSANStatsInputSpec
+    output_spec = SUSANStatsOutputSpec
+
+    def _run_interface(self, runtime):
+        import nibabel as nb
+        from ..utils.images import iter_volumes
+
+        img = nb.load(self.inputs.in_file)
+        mask = np.asanyarray(nb.load(self.inputs.mask_file).dataobj) > 0
+        n_mask = np.count_nonzero(mask)
+        n_vols = img.shape[3]
+
+        total = np.zeros(img.shape[:3])
+        masked = np.empty(n_mask * n_vols, dtype="float32")
+        for i, volume in enumerate(iter_volumes(self.inputs.in_file)):
+            total += volume
+            masked[i * n_mask:(i + 1) * n_mask] = volume[mask]
+
+        # Same percentile definition as fslstats
+        median = 0.0
+        if masked.size:
+            index = min(masked.size // 2, masked.size - 1)
+            median = float(np.partition(masked, index)[index])
+
+        hdr = img.header.copy()
+        hdr.set_data_dtype("float32")
+        mean_file = fname_presuffix(self.inputs.in_file, suffix="_mean.nii", use_ext=False,
+                                    newpath=runtime.cwd)
+        img.__class__((total / n_vols).astype("float32"), img.affine, hdr).to_filename(mean_file)
+
+        self._results["mean_file"] = mean_file
+        self._results["median"] = median
+        self._results["brightness_threshold"] = self.inputs.brightness_factor * median
+        self._results["usans"] = [(mean_file, median)]
+        return runtime
@@ -37,7 +37,7 @@ import os
 
 from nipype import logging
 from nipype.interfaces.base import (
-    traits, TraitedSpec, File,
+    traits, TraitedSpec, File, BaseInterfaceInputSpec, SimpleInterface, isdefined,
     CommandLine, CommandLineInputSpec)
 
 LOGGER = logging.getLogger('nipype.interface')
@@ -112,3 +112,44 @@ sub-01_run-01_echo-3_bold.nii.gz -e 13.0 27.0 43.0 --fittype curvefit'
         outputs['s0_map'] = os.path.join(out_dir, 'S0map.nii.gz')
         outputs['optimal_comb'] = os.path.join(out_dir, 'desc-optcom_bold.nii.gz')
         return outputs
+
+
+class _FusedT2SMapInputSpec(BaseInterfaceInputSpec):
+    in_files = traits.List(File(exists=True), mandatory=True, minlen=3,
+                           desc='multi-echo BOLD EPIs')
+    echo_times = traits.List(traits.Float, mandatory=True, minlen=3,
+                             desc='echo times (in seconds)')
+    mask_file = File(exists=True, desc='mask file')
+    fittype = traits.Enum('curvefit', 'loglin', usedefault=True,
+                          desc='"loglin" fits a linear model to the log of the data, '
+                               '"curvefit" refines it with a monoexponential model')
+    num_threads = traits.Int(1, usedefault=True, nohash=True,
+                             desc='number of chunks of voxels fit in parallel')
+
+
+class FusedT2SMap(SimpleInterface):
+    """
+    Generate an adaptive T2* map and an optimally combined ME-EPI time series, in-process.
+
+    This is a replacement of :py:class:`T2SMap`, with the same inputs and
+    outputs, which fits the decay of all voxels at once instead of running
+    *tedana* (see :py:func:`~fmriprep.utils.multiecho.t2smap`).
+    The optimally combined series is written uncompressed.
+
+    """
+
+    input_spec = _FusedT2SMapInputSpec
+    output_spec = T2SMapOutputSpec
+
+    def _run_interface(self, runtime):
+        from ..utils.multiecho import t2smap
+
+        self._results.update(t2smap(
+            self.inputs.in_files,
+            self.inputs.echo_times,
+            mask_file=self.inputs.mask_file if isdefined(self.inputs.mask_file) else None,
+            fittype=self.inputs.fittype,
+            num_threads=self.inputs.num_threads,
+            newpath=runtime.cwd,
+        ))
+        return runtime
@@ -26,54 +26,74 @@ Temporary patches
 
 """
 
-from random import randint
-from time import sleep
+from functools import partial
+from types import FunctionType
 
-from numpy.linalg.linalg import LinAlgError
 from nipype.algorithms import confounds as nac
+from nipype.interfaces.base import traits
 
 
-class RobustACompCor(nac.ACompCor):
+class _RobustCompCor:
     """
-    Runs aCompCor several times if it suddenly fails with
-    https://github.com/nipreps/fmriprep/issues/776
+    Run *Nipype*'s ``CompCor._run_interface`` with a different decomposition.
+
+    *Nipype*'s implementation is run as it is, except that its call to
+    ``compute_noise_components`` resolves to
+    :py:func:`fmriprep.utils.confounds.compute_noise_components` (with the
+    ``svd_solver`` input).
+    Only a private copy of the function's global namespace is changed, so
+    *Nipype*'s module is left untouched, and other *CompCor* interfaces
+    running concurrently are not affected.
 
     """
 
     def _run_interface(self, runtime):
-        failures = 0
-        while True:
-            try:
-                runtime = super(RobustACompCor, self)._run_interface(runtime)
-                break
-            except LinAlgError:
-                failures += 1
-                if failures > 10:
-                    raise
-                start = (failures - 1) * 10
-                sleep(randint(start + 4, start + 10))
-
-        return runtime
-
-
-class RobustTCompCor(nac.TCompCor):
+        from ..utils.confounds import compute_noise_components
+
+        run_interface = nac.CompCor._run_interface
+        namespace = dict(
+            run_interface.__globals__,
+            compute_noise_components=partial(
+                compute_noise_components, solver=self.inputs.svd_solver
+            ),
+        )
+        return FunctionType(
+            run_interface.__code__, namespace, run_interface.__name__,
+            run_interface.__defaults__, run_interface.__closure__,
+        )(self, runtime)
+
+
+class _RobustACompCorInputSpec(nac.CompCorInputSpec):
+    svd_solver = traits.Enum(
+        "gram", "randomized", usedefault=True,
+        desc="preferred SVD solver (see fmriprep.utils.confounds.compcor_svd)")
+
+
+class _RobustTCompCorInputSpec(nac.TCompCorInputSpec):
+    svd_solver = traits.Enum(
+        "gram", "randomized", usedefault=True,
+        desc="preferred SVD solver (see fmriprep.utils.confounds.compcor_svd)")
+
+
+class RobustACompCor(_RobustCompCor, nac.ACompCor):
     """
-    Runs tCompCor several times if it suddenly fails with
-    https://github.com/nipreps/fmriprep/issues/940
+    Runs aCompCor with a deterministic SVD backend, filtering all masks at once.
+
+    Prevents random failures of the SVD, as reported in
+    https://github.com/nipreps/fmriprep/issues/776, without retrying.
 
     """
 
-    def _run_interface(self, runtime):
-        failures = 0
-        while True:
-            try:
-                runtime = super(RobustTCompCor, self)._run_interface(runtime)
-                break
-            except LinAlgError:
-                failures += 1
-                if failures > 10:
-                    raise
-                start = (failures - 1) * 10
-                sleep(randint(start + 4, start + 10))
-
-        return runtime
+    input_spec = _RobustACompCorInputSpec
+
+
+class RobustTCompCor(_RobustCompCor, nac.TCompCor):
+    """
+    Runs tCompCor with a deterministic SVD backend.
+
+    Prevents random failures of the SVD, as reported in
+    https://github.com/nipreps/fmriprep/issues/940, without retrying.
+
+    """
+
+    input_spec = _RobustTCompCorInputSpec
@@ -0,0 +1,704 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright 2021 The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""In-process resampling interfaces."""
+import numpy as np
+import nibabel as nb
+from nipype.utils.filemanip import fname_presuffix
+from nipype.interfaces.base import (
+    traits, TraitedSpec, BaseInterfaceInputSpec, File, Directory, SimpleInterface, isdefined,
+    InputMultiObject, OutputMultiObject,
+)
+
+
+class _ResampleMasksInputSpec(BaseInterfaceInputSpec):
+    in_files = InputMultiObject(File(exists=True), mandatory=True,
+                                desc="probabilistic masks, sharing the same grid")
+    transform = File(exists=True, mandatory=True,
+                     desc="ITK linear transform, mapping the reference onto the masks")
+    reference_mask = File(exists=True, mandatory=True,
+                          desc="binary mask defining the target grid and domain")
+    thresh_low = traits.Float(0.99, usedefault=True,
+                              desc="non-inclusive lower threshold for binarization")
+
+
+class _ResampleMasksOutputSpec(TraitedSpec):
+    out_files = OutputMultiObject(File(exists=True), desc="binary masks on the reference grid")
+
+
+class ResampleMasks(SimpleInterface):
+    """
+    Project probabilistic masks onto a reference grid and binarize them.
+
+    All masks are sampled at once, with Gaussian interpolation as ANTs'
+    ``antsApplyTransforms -n Gaussian``, at the voxels within the reference
+    mask (voxels outside of it are set to zero), and binarized.
+    This is equivalent to running ``ApplyTransforms``, ``ApplyMask`` and
+    ``Binarize`` in sequence on each mask.
+
+    """
+
+    input_spec = _ResampleMasksInputSpec
+    output_spec = _ResampleMasksOutputSpec
+
+    def _run_interface(self, runtime):
+        from ..utils.transforms import gaussian_interpolation, load_affine, vox2vox
+
+        ref = nb.load(self.inputs.reference_mask)
+        ref_mask = np.asanyarray(ref.dataobj) > 0.5
+        moving = [nb.load(fname) for fname in self.inputs.in_files]
+        data = np.stack([img.get_fdata(dtype=np.float32) for img in moving], axis=-1)
+
+        ijk = np.array(np.nonzero(ref_mask))
+        matrix = vox2vox(load_affine(self.inputs.transform), ref.affine, moving[0].affine)
+        coords = matrix[:3, :3] @ ijk + matrix[:3, 3:]
+        samples = gaussian_interpolation(data, coords) > self.inputs.thresh_low
+
+        hdr = ref.header.copy()
+        hdr.set_data_dtype("uint8")
+        self._results["out_files"] = []
+        for i, fname in enumerate(self.inputs.in_files):
+            out_data = np.zeros(ref_mask.shape, dtype="uint8")
+            out_data[ref_mask] = samples[:, i]
+            out_file = fname_presuffix(fname, suffix="_mask", newpath=runtime.cwd)
+            ref.__class__(out_data, ref.affine, hdr).to_filename(out_file)
+            self._results["out_files"].append(out_file)
+        return runtime
+
+
+class _ResampleLabelsInputSpec(BaseInterfaceInputSpec):
+    in_files = InputMultiObject(File(exists=True), mandatory=True,
+                                desc="label images (e.g., masks or segmentations)")
+    reference_image = File(exists=True, mandatory=True, desc="image defining the target grid")
+    transforms = InputMultiObject(
+        traits.Either(File(exists=True), "identity"), mandatory=True,
+        desc="transforms, listed as for antsApplyTransforms, shared by all inputs")
+    in_transforms = InputMultiObject(
+        traits.Either(File(exists=True), "identity"),
+        desc="a transform per input, applied after ``transforms`` (e.g., the BOLD-to-T1w "
+             "transform of a BOLD mask resampled along with anatomical segmentations)")
+    interpolation = traits.Enum("MultiLabel", "NearestNeighbor", usedefault=True,
+                                desc="interpolation method")
+
+
+class _ResampleLabelsOutputSpec(TraitedSpec):
+    out_files = OutputMultiObject(File(exists=True), desc="label images on the reference grid")
+
+
+class ResampleLabels(SimpleInterface):
+    """
+    Resample several label images onto a reference grid at once.
+
+    The coordinates of the reference grid are mapped through the shared
+    transforms once, and the images that also share their grid and input
+    transform are interpolated together, with ANTs' ``MultiLabel`` voting
+    (see :py:func:`~fmriprep.utils.transforms.multilabel_interpolation`).
+    Outputs keep the data type of the inputs.
+    This is equivalent to running ``ApplyTransforms`` on each image.
+
+    """
+
+    input_spec = _ResampleLabelsInputSpec
+    output_spec = _ResampleLabelsOutputSpec
+
+    def _run_interface(self, runtime):
+        from ..utils import transforms as tfm
+
+        interpolate = {
+            "MultiLabel": tfm.multilabel_interpolation,
+            "NearestNeighbor": tfm.nearest_interpolation,
+        }[self.inputs.interpolation]
+
+        in_files = self.inputs.in_files
+        in_xfms = self.inputs.in_transforms \
+            if isdefined(self.inputs.in_transforms) else ["identity"] * len(in_files)
+        if len(in_xfms) != len(in_files):
+            raise ValueError("A transform (or 'identity') must be given for each input.")
+
+        ref = nb.load(self.inputs.reference_image)
+        points = tfm.map_points(
+            [ref.affine] + tfm.load_transforms(self.inputs.transforms),
+            np.indices(ref.shape[:3]).reshape(3, -1),
+        )
+
+        # Inputs on the same grid, with the same transform, are sampled together
+        groups = {}
+        for i, (fname, xfm) in enumerate(zip(in_files, in_xfms)):
+            img = nb.load(fname)
+            key = (str(xfm), img.shape[:3], img.affine.tobytes())
+            groups.setdefault(key, []).append((i, img))
+
+        hdr = ref.header.copy()
+        hdr.set_data_shape(ref.shape[:3])
+        hdr.set_slope_inter(1.0, 0.0)
+        out_files = [None] * len(in_files)
+        for (xfm, _, _), members in groups.items():
+            data = [np.asanyarray(img.dataobj).reshape(img.shape[:3]) for _, img in members]
+            coords = tfm.map_points(
+                tfm.load_transforms([xfm]) + [np.linalg.inv(members[0][1].affine)], points
+            )
+            samples = interpolate(np.stack(data, axis=-1), coords)
+            for (i, _), in_data, out_data in zip(members, data, samples.T):
+                hdr.set_data_dtype(in_data.dtype)
+                out_files[i] = fname_presuffix(in_files[i], suffix="_trans",
+                                               newpath=runtime.cwd)
+                nb.Nifti1Image(
+                    out_data.reshape(ref.shape[:3]).astype(in_data.dtype), ref.affine, hdr
+                ).to_filename(out_files[i])
+
+        self._results["out_files"] = out_files
+        return runtime
+
+
+class _ResampleSeriesInputSpec(BaseInterfaceInputSpec):
+    in_files = InputMultiObject(File(exists=True), mandatory=True,
+                                desc="a 4D series, or its individual 3D volumes")
+    transforms = InputMultiObject(
+        traits.Either(File(exists=True), "identity"), mandatory=True,
+        desc="transforms, listed as for antsApplyTransforms, mapping the reference onto "
+             "the series; files with a transform per volume are applied volume-wise")
+    reference_image = InputMultiObject(
+        File(exists=True), mandatory=True,
+        desc="images defining the target grids, each producing one output")
+    target_transforms = InputMultiObject(
+        traits.Either(File(exists=True), "identity"),
+        desc="a transform per reference, mapping it onto the space of ``transforms`` "
+             "(e.g., the anatomical-to-standard transform of each target space)")
+    reference_mask = InputMultiObject(
+        traits.Either(File(exists=True), "none"),
+        desc="a mask per reference (or 'none'): only voxels within the mask are resampled, "
+             "and written, in the order of numpy.nonzero, as a series of shape "
+             "(voxels, 1, 1, volumes)")
+    interpolation = traits.Enum("LanczosWindowedSinc", "Linear", "NearestNeighbor",
+                                usedefault=True, desc="interpolation method")
+    num_volumes = traits.Int(desc="resample only the first volumes of the series")
+    header_source = File(exists=True, desc="copy the repetition time from this image")
+    compress = traits.Bool(True, usedefault=True, desc="write compressed files")
+    joint = traits.Bool(
+        False, usedefault=True,
+        desc="``in_files`` are 4D series sharing their grid and transforms (e.g., the "
+             "echoes of a multi-echo run), resampled together computing the sampling "
+             "coordinates of each volume once")
+    num_threads = traits.Int(1, usedefault=True, nohash=True,
+                             desc="number of volumes resampled in parallel")
+
+
+class _ResampleSeriesOutputSpec(TraitedSpec):
+    out_file = OutputMultiObject(
+        File(exists=True),
+        desc="series resampled on each of the reference grids (if ``joint``, for each "
+             "series in turn)")
+
+
+class ResampleSeries(SimpleInterface):
+    """
+    Resample a BOLD series onto one or several reference grids in one shot.
+
+    All transforms are composed once into a mapping of each reference grid
+    onto the series, and only the volume-wise transforms (i.e., head-motion
+    correction) are applied for each volume, which are interpolated in
+    parallel threads as they are read from the series, and written as they
+    are ready.
+    The series is thus read only once, whatever the number of targets.
+    Interpolations follow ANTs' (see
+    :py:func:`~fmriprep.utils.transforms.lanczos_interpolation`), and negative
+    values (an artifact of the Lanczos interpolation) are clipped to zero.
+    This is equivalent to splitting the series into volumes and running
+    ``MultiApplyTransforms``, ``Clip`` and ``Merge`` in sequence, for each
+    target.
+    When only some voxels of a target are of interest (e.g., the subcortical
+    grayordinates), a ``reference_mask`` restricts the resampling to them.
+    With ``joint``, several series sharing the same transforms (i.e., the
+    echoes of a multi-echo run) are read in lockstep and resampled together.
+
+    """
+
+    input_spec = _ResampleSeriesInputSpec
+    output_spec = _ResampleSeriesOutputSpec
+
+    # Maximum number of samples interpolated at once, bounding memory usage
+    _chunk_size = 2 ** 18
+
+    def _run_interface(self, runtime):
+        from contextlib import ExitStack
+        from itertools import product
+        from ..utils.images import series_writer
+        from ..utils.transforms import resample_series
+
+        refs = [nb.load(fname) for fname in self.inputs.reference_image]
+        masks = self.inputs.reference_mask \
+            if isdefined(self.inputs.reference_mask) else ["none"] * len(refs)
+        n_vols, shapes, volumes = resample_series(
+            self.inputs.in_files,
+            self.inputs.transforms,
+            refs,
+            target_transforms=self.inputs.target_transforms
+            if isdefined(self.inputs.target_transforms) else None,
+            masks=masks,
+            interpolation=self.inputs.interpolation,
+            num_volumes=self.inputs.num_volumes
+            if isdefined(self.inputs.num_volumes) else None,
+            num_threads=self.inputs.num_threads,
+            chunk_size=self._chunk_size,
+            joint=self.inputs.joint,
+        )
+
+        moving = nb.load(self.inputs.in_files[0])
+        src_hdr = nb.load(self.inputs.header_source).header \
+            if isdefined(self.inputs.header_source) else moving.header
+        repetition_time = src_hdr.get_zooms()[3] if len(src_hdr.get_zooms()) > 3 else 1.0
+        ext = ".nii.gz" if self.inputs.compress else ".nii"
+        in_files = self.inputs.in_files if self.inputs.joint else self.inputs.in_files[:1]
+        self._results["out_file"] = []
+        with ExitStack() as stack:
+            writers = []
+            for in_file, (i, (ref, mask)) in product(in_files, enumerate(zip(refs, masks))):
+                hdr = ref.header.copy() if mask == "none" else nb.Nifti1Header()
+                zooms = ref.header.get_zooms()[:3] if mask == "none" else (1.0, 1.0, 1.0)
+                hdr.set_data_shape(shapes[i] + (n_vols,))
+                hdr.set_data_dtype("float32")
+                hdr.set_slope_inter(1.0, 0.0)
+                hdr.set_zooms(zooms + (repetition_time,))
+                hdr.set_xyzt_units(xyz=ref.header.get_xyzt_units()[0],
+                                   t=src_hdr.get_xyzt_units()[-1])
+                suffix = "_resampled" if len(refs) == 1 else f"_resampled{i}"
+                out_file = fname_presuffix(in_file, suffix=suffix + ext,
+                                           newpath=runtime.cwd, use_ext=False)
+                writers.append(stack.enter_context(series_writer(hdr, out_file)))
+                self._results["out_file"].append(out_file)
+
+            for resampled in volumes:
+                if self.inputs.joint:
+                    # Split the series, in the order of the writers
+                    resampled = [volume[..., j] for j in range(len(in_files))
+                                 for volume in resampled]
+                for write, volume in zip(writers, resampled):
+                    write(volume)
+        return runtime
+
+
+class _MergeSeriesInputSpec(BaseInterfaceInputSpec):
+    in_files = InputMultiObject(File(exists=True), mandatory=True,
+                                desc="3D volumes, sharing the same grid, in order")
+    header_source = File(exists=True, desc="copy the repetition time from this image")
+    compress = traits.Bool(True, usedefault=True, desc="write a compressed file")
+
+
+class _MergeSeriesOutputSpec(TraitedSpec):
+    out_file = File(exists=True, desc="the merged 4D series")
+
+
+class MergeSeries(SimpleInterface):
+    """
+    Merge 3D volumes into a 4D series, streaming them into the output.
+
+    Volumes are read and written one at a time (and compressed on the fly,
+    if required), so that only one of them is held in memory.
+    This is a replacement of *NiWorkflows*' ``Merge``, which stacks all of
+    them in memory before writing: as there, the output keeps the on-disk
+    data type of the first volume, and integer types are scaled to fit the
+    range of the whole series (which is found beforehand, reading the volumes
+    once more).
+
+    """
+
+    input_spec = _MergeSeriesInputSpec
+    output_spec = _MergeSeriesOutputSpec
+
+    def _run_interface(self, runtime):
+        from nibabel.arraywriters import get_slope_inter, make_array_writer
+        from ..utils.images import write_volumes
+
+        first = nb.load(self.inputs.in_files[0])
+        shape = first.shape[:3]
+        for fname in self.inputs.in_files[1:]:
+            if nb.load(fname).shape[:3] != shape:
+                raise ValueError(f"<{fname}> does not match the grid of the first volume.")
+
+        def _volumes():
+            for fname in self.inputs.in_files:
+                yield nb.load(fname).get_fdata(dtype=np.float32).reshape(shape)
+
+        hdr = first.header.copy()
+        hdr.set_data_shape(shape + (len(self.inputs.in_files),))
+        out_dtype = hdr.get_data_dtype()
+        slope, inter = 1.0, 0.0
+        if np.issubdtype(out_dtype, np.integer):
+            limits = np.array([[vol.min(), vol.max()] for vol in _volumes()], dtype=float)
+            writer = make_array_writer(
+                np.array([limits[:, 0].min(), limits[:, 1].max()]), out_dtype
+            )
+            slope, inter = (1.0 if v is None else float(v) for v in get_slope_inter(writer))
+        hdr.set_slope_inter(slope, inter)
+        if isdefined(self.inputs.header_source):
+            src_hdr = nb.load(self.inputs.header_source).header
+            hdr.set_xyzt_units(xyz=first.header.get_xyzt_units()[0],
+                               t=src_hdr.get_xyzt_units()[-1])
+            hdr.set_zooms(first.header.get_zooms()[:3] + (src_hdr.get_zooms()[3],))
+
+        def _scaled():
+            info = np.iinfo(out_dtype) if np.issubdtype(out_dtype, np.integer) else None
+            for volume in _volumes():
+                if info is not None:
+                    volume = np.clip(np.rint((volume - inter) / slope), info.min, info.max)
+                yield volume
+
+        ext = ".nii.gz" if self.inputs.compress else ".nii"
+        out_file = fname_presuffix(self.inputs.in_files[0], suffix="_merged" + ext,
+                                   newpath=runtime.cwd, use_ext=False)
+        self._results["out_file"] = write_volumes(_scaled(), hdr, out_file)
+        return runtime
+
+
+class _ComposeDisplacementsInputSpec(BaseInterfaceInputSpec):
+    transforms = InputMultiObject(
+        traits.Either(File(exists=True), "identity"), mandatory=True,
+        desc="transforms, listed as for antsApplyTransforms, mapping the reference onto "
+             "the moving space")
+    reference_image = File(exists=True, mandatory=True, desc="image defining the target grid")
+    cache_dir = Directory(desc="directory where fields are kept and looked up, keyed by "
+                               "the contents of the inputs")
+
+
+class _ComposeDisplacementsOutputSpec(TraitedSpec):
+    out_file = File(exists=True, desc="displacements field in ITK format")
+
+
+class ComposeDisplacements(SimpleInterface):
+    """
+    Evaluate a chain of transforms on a reference grid, as a dense displacements field.
+
+    Evaluating a nonlinear composite (e.g., the anatomical-to-template ``.h5``
+    file) is expensive, and the same evaluation is otherwise repeated by every
+    BOLD run resampled onto that template grid.
+    When a ``cache_dir`` is given, fields are stored there under a hash of the
+    contents of the transforms and the reference grid, so that all runs
+    sharing them (across sessions and workflow executions) evaluate the chain
+    only once.
+
+    """
+
+    input_spec = _ComposeDisplacementsInputSpec
+    output_spec = _ComposeDisplacementsOutputSpec
+
+    def _run_interface(self, runtime):
+        import os
+        from hashlib import sha256
+        from pathlib import Path
+        from tempfile import NamedTemporaryFile
+        from ..utils.transforms import dense_displacements, load_transforms
+
+        ref = nb.load(self.inputs.reference_image)
+        digest = sha256()
+        digest.update(repr(ref.shape[:3]).encode())
+        digest.update(np.asanyarray(ref.affine, dtype="float64").tobytes())
+        for xfm in self.inputs.transforms:
+            if xfm == "identity":
+                digest.update(b"identity")
+                continue
+            _hash_file(digest, xfm)
+
+        out_dir = Path(self.inputs.cache_dir if isdefined(self.inputs.cache_dir)
+                       else runtime.cwd)
+        out_file = out_dir / f"{digest.hexdigest()}_xfm.nii"
+        self._results["out_file"] = str(out_file)
+        if out_file.exists():
+            return runtime
+
+        out_dir.mkdir(parents=True, exist_ok=True)
+        field = dense_displacements(
+            load_transforms(self.inputs.transforms), ref.shape, ref.affine
+        )
+        # Write atomically, as several runs may populate the cache concurrently
+        with NamedTemporaryFile(dir=out_dir, suffix=".nii", delete=False) as tmp:
+            pass
+        field.to_filename(tmp.name)
+        os.replace(tmp.name, out_file)
+        return runtime
+
+
+class _MCFLIRT2StackInputSpec(BaseInterfaceInputSpec):
+    in_files = InputMultiObject(File(exists=True), mandatory=True,
+                                desc="MCFLIRT matrices, one per volume, in order")
+    in_reference = File(exists=True, mandatory=True, desc="reference image of MCFLIRT")
+    in_source = File(exists=True, mandatory=True, desc="the BOLD series (or its reference)")
+    write_itk = traits.Bool(False, usedefault=True,
+                            desc="also write the transforms as an ITK transform file")
+
+
+class _MCFLIRT2StackOutputSpec(TraitedSpec):
+    out_file = File(exists=True, desc="stack of RAS matrices, of shape (N, 4, 4)")
+    itk_file = File(desc="the transforms in ITK format (only if ``write_itk``)")
+
+
+class MCFLIRT2Stack(SimpleInterface):
+    """
+    Convert the matrices of MCFLIRT into a single stack of RAS affines.
+
+    This is a replacement of *NiWorkflows*' ``MCFLIRT2ITK``, which runs
+    ``c3d_affine_tool`` on each matrix and collates the resulting text
+    transforms into an ITK file.
+    Here, all matrices are converted at once (see
+    :py:func:`~fmriprep.utils.transforms.fsl_to_ras`) and stored as a
+    ``.npy`` array, which the in-process resamplers read directly (see
+    :py:func:`~fmriprep.utils.transforms.load_transforms`).
+    The ITK file is only written for tools that require it (e.g., ANTs).
+
+    """
+
+    input_spec = _MCFLIRT2StackInputSpec
+    output_spec = _MCFLIRT2StackOutputSpec
+
+    def _run_interface(self, runtime):
+        from pathlib import Path
+        from nitransforms.io.itk import ITKLinearTransformArray
+        from ..utils.transforms import fsl_to_ras
+
+        matrices = fsl_to_ras(
+            np.array([np.loadtxt(fname) for fname in self.inputs.in_files]),
+            nb.load(self.inputs.in_reference),
+            nb.load(self.inputs.in_source),
+        )
+        self._results["out_file"] = str(Path(runtime.cwd) / "hmc_xforms.npy")
+        np.save(self._results["out_file"], matrices)
+        if self.inputs.write_itk:
+            self._results["itk_file"] = str(Path(runtime.cwd) / "mat2itk.txt")
+            Path(self._results["itk_file"]).write_text(
+                ITKLinearTransformArray.from_ras(matrices).to_string()
+            )
+        return runtime
+
+
+class _VolumeToSurfaceInputSpec(BaseInterfaceInputSpec):
+    source_file = File(exists=True, mandatory=True, desc="BOLD series in T1w space")
+    subjects_dir = Directory(exists=True, mandatory=True, desc="FreeSurfer SUBJECTS_DIR")
+    subject_id = traits.Str(mandatory=True, desc="FreeSurfer subject ID")
+    target_subject = traits.Str(mandatory=True,
+                                desc="subject whose surfaces are sampled (e.g., fsaverage5)")
+    t1w2fsnative_xfm = File(exists=True, mandatory=True,
+                            desc="affine transform from T1w to FreeSurfer-conformed space")
+    medial_surface_nan = traits.Bool(False, usedefault=True,
+                                     desc="set values on the medial wall of fsaverage to NaN")
+    cache_dir = Directory(desc="directory where sampling matrices are kept and looked up, "
+                               "keyed by the contents of the inputs")
+
+
+class _VolumeToSurfaceOutputSpec(TraitedSpec):
+    out_files = OutputMultiObject(File(exists=True),
+                                  desc="GIFTI files of the left and right hemispheres")
+
+
+class VolumeToSurface(SimpleInterface):
+    """
+    Sample a BOLD series onto the surfaces of a FreeSurfer subject.
+
+    The result is that of FreeSurfer's ``mri_vol2surf``, as run by
+    :py:func:`~fmriprep.workflows.bold.resampling.init_bold_surf_wf` (see
+    :py:func:`~fmriprep.utils.surfaces.vol2surf_matrix`), but the projection of
+    voxels onto vertices is calculated once, as a sparse matrix, and the
+    whole series is sampled by multiplying its volumes by that matrix.
+    When a ``cache_dir`` is given, matrices are stored there under a hash of
+    the surfaces, the transform and the BOLD grid, so that all runs sharing
+    them only calculate the projection once.
+    Outputs are GIFTI files with their anatomical structure set.
+
+    """
+
+    input_spec = _VolumeToSurfaceInputSpec
+    output_spec = _VolumeToSurfaceOutputSpec
+
+    def _run_interface(self, runtime):
+        import os
+        from hashlib import sha256
+        from pathlib import Path
+        from tempfile import NamedTemporaryFile
+        import nitransforms as nt
+        from scipy import sparse
+        from ..utils.images import iter_volumes
+        from ..utils.surfaces import vol2surf_matrix
+
+        src = nb.load(self.inputs.source_file)
+        subjects_dir = Path(self.inputs.subjects_dir)
+        subject_dir = subjects_dir / self.inputs.subject_id
+        target_subject = self.inputs.target_subject
+
+        # Surface (tkr) coordinates to scanner coordinates of the conformed T1,
+        # then to T1w coordinates, and finally to voxels of the BOLD series
+        t1 = nb.load(str(subject_dir / "mri" / "T1.mgz"))
+        xfm = self.inputs.t1w2fsnative_xfm
+        t1w2fsnative = nt.linear.load(xfm, fmt="fs" if xfm.endswith(".lta") else "itk")
+        ras2vox = (np.linalg.inv(src.affine) @ t1w2fsnative.matrix @ t1.affine
+                   @ np.linalg.inv(t1.header.get_vox2ras_tkr()))
+
+        out_dir = Path(self.inputs.cache_dir if isdefined(self.inputs.cache_dir)
+                       else runtime.cwd)
+        matrices = []
+        for hemi in ("lh", "rh"):
+            digest = sha256()
+            digest.update(repr((src.shape[:3], hemi, target_subject)).encode())
+            digest.update(np.asanyarray(ras2vox, dtype="float64").tobytes())
+            surf_files = [subject_dir / "surf" / f"{hemi}.white",
+                          subject_dir / "surf" / f"{hemi}.thickness",
+                          subject_dir / "label" / f"{hemi}.cortex.label"]
+            if target_subject != self.inputs.subject_id:
+                surf_files += [subject_dir / "surf" / f"{hemi}.sphere.reg",
+                               subjects_dir / target_subject / "surf" / f"{hemi}.sphere.reg"]
+            for surf_file in surf_files:
+                _hash_file(digest, surf_file)
+
+            matrix_file = out_dir / f"{digest.hexdigest()}_{hemi}.npz"
+            if matrix_file.exists():
+                matrices.append(sparse.load_npz(str(matrix_file)))
+                continue
+
+            matrix = vol2surf_matrix(subjects_dir, self.inputs.subject_id, target_subject,
+                                     hemi, src.shape[:3], ras2vox)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            # Write atomically, as several runs may populate the cache concurrently
+            with NamedTemporaryFile(dir=out_dir, suffix=".npz", delete=False) as tmp:
+                pass
+            sparse.save_npz(tmp.name, matrix)
+            os.replace(tmp.name, matrix_file)
+            matrices.append(matrix)
+
+        # Sample all volumes, onto both hemispheres at once
+        n_vertices = [matrix.shape[0] for matrix in matrices]
+        matrix = sparse.vstack(matrices, format="csr")
+        samples = np.zeros((matrix.shape[0], src.shape[3]), dtype="float32")
+        for i, volume in enumerate(iter_volumes(self.inputs.source_file)):
+            samples[:, i] = matrix @ volume.ravel(order="F")
+
+        self._results["out_files"] = []
+        for hemi, hemi_samples, structure in zip(
+            ("lh", "rh"), np.split(samples, n_vertices[:1]), ("CortexLeft", "CortexRight")
+        ):
+            if self.inputs.medial_surface_nan and target_subject.startswith("fsaverage"):
+                medial = np.ones(len(hemi_samples), dtype=bool)
+                medial[nb.freesurfer.read_label(
+                    str(subjects_dir / target_subject / "label" / f"{hemi}.cortex.label")
+                )] = False
+                hemi_samples[medial] = np.nan
+
+            img = nb.gifti.GiftiImage(
+                meta=nb.gifti.GiftiMetaData.from_dict({"AnatomicalStructurePrimary": structure}),
+                darrays=[
+                    nb.gifti.GiftiDataArray(
+                        np.ascontiguousarray(column),
+                        intent="NIFTI_INTENT_TIME_SERIES",
+                        datatype="NIFTI_TYPE_FLOAT32",
+                    )
+                    for column in hemi_samples.T
+                ],
+            )
+            out_file = os.path.join(runtime.cwd, f"{hemi}.{target_subject}.gii")
+            img.to_filename(out_file)
+            self._results["out_files"].append(out_file)
+        return runtime
+
+
+class _ResampleSurfaceSeriesInputSpec(BaseInterfaceInputSpec):
+    in_file = File(exists=True, mandatory=True, desc="GIFTI series on the current sphere")
+    current_sphere = File(exists=True, mandatory=True, desc="sphere of the input")
+    current_area = File(exists=True, mandatory=True,
+                        desc="vertex areas of the input surface, as a metric")
+    new_sphere = File(exists=True, mandatory=True, desc="sphere resampled onto, registered "
+                                                        "to the current sphere")
+    new_area = File(exists=True, mandatory=True,
+                    desc="vertex areas of the output surface, as a metric")
+    out_file = File(mandatory=True, desc="name of the output GIFTI file")
+    cache_dir = Directory(desc="directory where resampling matrices are kept and looked up, "
+                               "keyed by the contents of the spheres and areas")
+
+
+class _ResampleSurfaceSeriesOutputSpec(TraitedSpec):
+    out_file = File(exists=True, desc="the resampled GIFTI series")
+
+
+class ResampleSurfaceSeries(SimpleInterface):
+    """
+    Resample a series between spheres, as ``wb_command -metric-resample`` with ``ADAP_BARY_AREA``.
+
+    The weights (see :py:func:`~fmriprep.utils.surfaces.adap_bary_area_matrix`)
+    only depend on the spheres and the vertex areas, which, when resampling from
+    ``fsaverage`` onto ``fsLR``, are the same for all subjects and runs.
+    They are calculated once, as a sparse matrix, and all the frames of the
+    series are resampled by multiplying them by that matrix.
+    When a ``cache_dir`` is given, matrices are stored there under a hash of
+    the spheres and areas, for all other runs to reuse.
+
+    """
+
+    input_spec = _ResampleSurfaceSeriesInputSpec
+    output_spec = _ResampleSurfaceSeriesOutputSpec
+
+    def _run_interface(self, runtime):
+        import os
+        from hashlib import sha256
+        from pathlib import Path
+        from tempfile import NamedTemporaryFile
+        from scipy import sparse
+        from ..utils.surfaces import adap_bary_area_matrix
+
+        digest = sha256()
+        inputs = ("current_sphere", "new_sphere", "current_area", "new_area")
+        for name in inputs:
+            _hash_file(digest, getattr(self.inputs, name))
+
+        out_dir = Path(self.inputs.cache_dir if isdefined(self.inputs.cache_dir)
+                       else runtime.cwd)
+        matrix_file = out_dir / f"{digest.hexdigest()}_adap_bary_area.npz"
+        if matrix_file.exists():
+            matrix = sparse.load_npz(str(matrix_file))
+        else:
+            current_sphere, new_sphere, current_area, new_area = [
+                nb.load(getattr(self.inputs, name)).agg_data() for name in inputs
+            ]
+            matrix = adap_bary_area_matrix(current_sphere, new_sphere, current_area, new_area)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            # Write atomically, as several runs may populate the cache concurrently
+            with NamedTemporaryFile(dir=out_dir, suffix=".npz", delete=False) as tmp:
+                pass
+            sparse.save_npz(tmp.name, matrix)
+            os.replace(tmp.name, matrix_file)
+
+        img = nb.load(self.inputs.in_file)
+        darrays = [
+            nb.gifti.GiftiDataArray(
+                (matrix @ darray.data.astype("float32")).astype("float32"),
+                intent=darray.intent,
+                datatype="NIFTI_TYPE_FLOAT32",
+                meta=darray.meta,
+            )
+            for darray in img.darrays
+        ]
+
+        out_file = os.path.join(runtime.cwd, self.inputs.out_file)
+        nb.gifti.GiftiImage(meta=img.meta, darrays=darrays).to_filename(out_file)
+        self._results["out_file"] = out_file
+        return runtime
+
+
+def _hash_file(digest, filename):
+    """Update a hash object with the contents of a file, read in blocks."""
+    with open(filename, "rb") as fobj:
+        for block in iter(lambda: fobj.read(2 ** 20), b""):
+            digest.update(block)
@@ -0,0 +1,109 @@
+import nibabel as nb
+import numpy as np
+import pandas as pd
+from nipype.pipeline import engine as pe
+from fmriprep.interfaces import aroma
+from fmriprep.interfaces.confounds import _get_ica_confounds
+
+
+def _cross_correlation(a, b):
+    """Loop-based reference, as in ICA-AROMA."""
+    return np.corrcoef(np.hstack((a, b)).T)[:a.shape[1], a.shape[1]:]
+
+
+def test_feature_time_series():
+    rng = np.random.default_rng(1234)
+    rp6 = rng.normal(size=(40, 6)).cumsum(axis=0)
+    mix = rng.normal(size=(40, 5))
+    mix[:, 0] += rp6[:, 2]
+
+    # Draw the same splits as the vectorized implementation
+    n_splits = 20
+    draws = np.random.default_rng(0).random((n_splits, 40))
+    chosen = np.argsort(draws, axis=1)[:, :36]
+
+    rp6_der = np.vstack((np.zeros(6), np.diff(rp6, axis=0)))
+    rp12 = np.hstack((rp6, rp6_der))
+    rp_model = np.hstack((rp12, np.vstack((np.zeros(12), rp12[:-1])),
+                          np.vstack((rp12[1:], np.zeros(12)))))
+    expected = np.zeros((n_splits, 5))
+    for i, rows in enumerate(chosen):
+        rows = np.sort(rows)
+        correl = np.hstack((_cross_correlation(mix[rows] ** 2, rp_model[rows] ** 2),
+                            _cross_correlation(mix[rows], rp_model[rows])))
+        expected[i] = np.abs(correl).max(axis=1)
+
+    result = aroma._feature_time_series(mix, rp6, n_splits=n_splits, random_seed=0)
+    assert np.allclose(result, expected.mean(axis=0))
+
+
+def test_ICAAROMA(tmp_path):
+    rng = np.random.default_rng(1234)
+    shape, n_vols, n_ics = (6, 7, 8), 50, 3
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+
+    # ICA-AROMA's masks: CSF in the center, edge and out-of-brain along the borders
+    masks_dir = tmp_path / "aroma"
+    masks_dir.mkdir()
+    masks = {name: np.zeros(shape, dtype="uint8") for name in ("csf", "edge", "out")}
+    masks["csf"][2:4, 3:4, 3:5] = 1
+    masks["edge"][1, 1:-1, 1:-1] = 1
+    masks["out"][0] = 1
+    for name, data in masks.items():
+        nb.Nifti1Image(data, affine).to_filename(str(masks_dir / f"mask_{name}.nii.gz"))
+    brain_mask = str(tmp_path / "brain_mask.nii.gz")
+    nb.Nifti1Image(np.ones(shape, dtype="uint8"), affine).to_filename(brain_mask)
+
+    # Components: motion-like, confined to the CSF, and a clean one
+    motion = rng.normal(size=(n_vols, 6))
+    mix = np.stack((motion[:, 0], np.sin(np.arange(n_vols) / 5),
+                    np.cos(np.arange(n_vols) / 7)), axis=1)
+    ft_mix = np.ones((25, n_ics))
+    ft_mix[5:, 1:] = 0.01
+    zmaps = np.zeros(shape + (n_ics,), dtype="float32")
+    zmaps[4:6, 2:5, 2:6, 0] = 3.0
+    zmaps[2:4, 3:4, 3:5, 1] = 3.0
+    zmaps[4:6, 2:5, 2:6, 2] = -3.0
+
+    melodic_dir = tmp_path / "melodic"
+    (melodic_dir / "stats").mkdir(parents=True)
+    np.savetxt(str(melodic_dir / "melodic_mix"), mix)
+    np.savetxt(str(melodic_dir / "melodic_FTmix"), ft_mix)
+    np.savetxt(str(melodic_dir / "melodic_ICstats"), np.full((n_ics, 2), 10.0), delimiter="  ")
+    for i in range(n_ics):
+        nb.Nifti1Image(zmaps[..., i], affine).to_filename(
+            str(melodic_dir / "stats" / f"thresh_zstat{i + 1}.nii.gz"))
+    movpar = str(tmp_path / "motion.txt")
+    np.savetxt(movpar, motion)
+
+    spatial = rng.normal(size=shape + (1,))
+    data = (100 + spatial * (mix @ [1.0, 0.5, 2.0])).astype("float32")
+    in_file = str(tmp_path / "bold.nii.gz")
+    nb.Nifti1Image(data, affine).to_filename(in_file)
+
+    classifier = pe.Node(aroma.ICAAROMA(
+        in_file=in_file, melodic_dir=str(melodic_dir), motion_parameters=movpar,
+        mask=brain_mask, TR=2.0, aroma_masks_dir=str(masks_dir), n_splits=50),
+        name="classifier", base_dir=str(tmp_path))
+    ret = classifier.run()
+
+    overview = pd.read_csv(ret.outputs.out_dir + "/classification_overview.txt", sep="\t")
+    assert overview["Motion/noise"].tolist() == [True, True, False]
+    assert overview["CSF-fraction"].tolist() == [0.0, 1.0, 0.0]
+    # The second component lies entirely within the CSF: its edge fraction is zero
+    assert not overview.isna().any(axis=None)
+    assert overview["Edge-fraction"][1] == 0.0
+    with open(ret.outputs.out_dir + "/classified_motion_ICs.txt") as f:
+        assert f.read() == "1,2"
+
+    # Non-aggressive denoising removes the motion components' contribution only
+    denoised = nb.load(ret.outputs.nonaggr_denoised_file).get_fdata()
+    clean = 100 + spatial * (mix.mean(axis=0) @ [1.0, 0.5, 0.0] + 2.0 * mix[:, 2])
+    assert np.allclose(denoised, clean, atol=1e-3)
+
+    # The output directory can be parsed by ICAConfounds
+    aroma_confounds, _, _, metadata = _get_ica_confounds(
+        ret.outputs.out_dir, skip_vols=2, newpath=str(tmp_path))
+    assert pd.read_csv(aroma_confounds, sep="\t").shape == (n_vols + 2, 2)
+    assert pd.read_csv(metadata, sep="\t")["IC"].tolist() == [
+        "aroma_motion_1", "aroma_motion_2", "aroma_motion_3"]
@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+
+import nibabel as nb
+import numpy as np
+from nibabel import cifti2 as ci
+from niworkflows.interfaces import cifti as nwcifti
+from fmriprep.interfaces.cifti import _create_cifti_image, _write_variant_metadata
+
+
+def test_create_cifti_image(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(1234)
+    n_vols = 4
+
+    # Labels in RAS orientation, which are reoriented to LAS, with a few voxels per
+    # structure and others not part of the grayordinates
+    structures = [v[-1] for v in nwcifti.CIFTI_STRUCT_WITH_LABELS.values() if v]
+    labels = np.zeros(5 * 6 * 7, dtype="int16")
+    voxels = rng.permutation(labels.size)
+    for i, label in enumerate(structures + [2]):
+        labels[voxels[3 * i:3 * i + 3 + i % 2]] = label
+    labels = labels.reshape((5, 6, 7))
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    affine[:3, 3] = -5
+    label_file = str(tmp_path / "labels.nii.gz")
+    nb.Nifti1Image(labels, affine).to_filename(label_file)
+
+    bold = rng.normal(100.0, 5.0, size=labels.shape + (n_vols,)).astype("float32")
+    bold_file = str(tmp_path / "bold.nii.gz")
+    nb.Nifti1Image(bold, affine).to_filename(bold_file)
+    samples_file = str(tmp_path / "samples.nii.gz")
+    nb.Nifti1Image(bold[labels > 0][:, None, None], np.eye(4)).to_filename(samples_file)
+
+    bold_surfs, annotation_files = [], []
+    for hemi in "LR":
+        bold_surfs.append(str(tmp_path / f"hemi-{hemi}_bold.func.gii"))
+        nb.GiftiImage(darrays=[
+            nb.gifti.GiftiDataArray(rng.normal(size=8).astype("float32"))
+            for _ in range(n_vols)
+        ]).to_filename(bold_surfs[-1])
+        annotation_files.append(str(tmp_path / f"hemi-{hemi}_dparc.label.gii"))
+        nb.GiftiImage(darrays=[
+            nb.gifti.GiftiDataArray(np.array([0, 1, 1, 0, 1, 1, 1, 0], dtype="int32"))
+        ]).to_filename(annotation_files[-1])
+
+    targets = ("fsLR", "MNI152NLin6Asym")
+    out_file = _create_cifti_image(
+        samples_file, label_file, bold_surfs, annotation_files, 2.0, targets
+    )
+    expected_file = nwcifti._create_cifti_image(
+        bold_file, label_file, bold_surfs, annotation_files, 2.0, targets
+    )
+
+    out_img, expected = ci.load(out_file), ci.load(str(expected_file))
+    n_voxels = np.count_nonzero(np.isin(labels, structures))
+    assert out_img.shape == expected.shape == (n_vols, 2 * 5 + n_voxels)
+    assert np.allclose(out_img.get_fdata(), expected.get_fdata())
+    out_models = list(out_img.header.get_index_map(1).brain_models)
+    expected_models = list(expected.header.get_index_map(1).brain_models)
+    for model, expected_model in zip(out_models, expected_models):
+        assert model.brain_structure == expected_model.brain_structure
+        assert (model.index_offset, model.index_count) == (
+            expected_model.index_offset, expected_model.index_count)
+        if model.model_type == "CIFTI_MODEL_TYPE_VOXELS":
+            assert np.array_equal(model.voxel_indices_ijk, expected_model.voxel_indices_ijk)
+    volume = out_img.header.get_index_map(1).volume
+    assert np.allclose(volume.transformation_matrix_voxel_indices_ijk_to_xyz.matrix,
+                       expected.header.get_index_map(1).volume
+                       .transformation_matrix_voxel_indices_ijk_to_xyz.matrix)
+
+
+def test_write_variant_metadata(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for density in ("32k", "59k"):
+        out_metadata, variant, grayords = _write_variant_metadata(density, newpath=tmp_path)
+        metadata = json.loads(Path(out_metadata).read_text())
+        expected_file, expected_variant, expected_grayords = nwcifti._get_cifti_variant(
+            "fsLR", "MNI152NLin6Asym", density)
+        assert (variant, grayords) == (expected_variant, expected_grayords)
+        assert metadata == json.loads(Path(expected_file).read_text())
@@ -1,5 +1,11 @@
+import numpy as np
+import nibabel as nb
+import pandas as pd
+from nipype.algorithms import confounds as nac
 from nipype.pipeline import engine as pe
+from niworkflows.interfaces.images import SignalExtraction
 from fmriprep.interfaces import confounds
+from fmriprep.interfaces.resampling import ResampleSeries
 from pathlib import Path
 
 
@@ -28,3 +34,184 @@ def test_FilterDropped(tmp_path, data_dir):
     target_meta = Path.read_text(data_dir / "component_metadata_filtered.tsv")
     filtered_meta = Path(res.outputs.out_file).read_text()
     assert filtered_meta == target_meta
+
+
+def test_CollateCompCor(tmp_path, data_dir):
+    from niworkflows.interfaces.utility import TSV2JSON
+
+    collate = pe.Node(confounds.CollateCompCor(
+        acompcor_components=data_dir / "acompcor_truncated.tsv",
+        acompcor_metadata=data_dir / "component_metadata_truncated.tsv",
+        tcompcor_metadata=data_dir / "component_metadata_truncated.tsv",
+        additional_metadata={'global_signal': {'Method': 'Mean'}}),
+        name="collate", base_dir=str(tmp_path))
+    res = collate.run()
+
+    target_components = Path.read_text(data_dir / "acompcor_renamed.tsv")
+    target_meta = Path.read_text(data_dir / "component_metadata_renamed.tsv")
+    assert Path(res.outputs.components_file).read_text() == target_components
+    assert Path(res.outputs.metadata_file).read_text() == target_meta
+
+    # Same metadata as FilterDropped + TSV2JSON + DictMerge
+    tcc_filtered = pe.Node(
+        confounds.FilterDropped(in_file=data_dir / "component_metadata_truncated.tsv"),
+        name="tcc_filter", base_dir=str(tmp_path)).run().outputs.out_file
+    acc_filtered = pe.Node(
+        confounds.FilterDropped(in_file=data_dir / "component_metadata_renamed.tsv"),
+        name="acc_filter", base_dir=str(tmp_path)).run().outputs.out_file
+    expected = TSV2JSON(
+        in_file=tcc_filtered, index_column='component', drop_columns=['mask'], output=None,
+        additional_metadata={'Method': 'tCompCor'}, enforce_case=True).run().outputs.output
+    expected.update(TSV2JSON(
+        in_file=acc_filtered, index_column='component', output=None,
+        additional_metadata={'Method': 'aCompCor'}, enforce_case=True).run().outputs.output)
+    expected['global_signal'] = {'Method': 'Mean'}
+    assert res.outputs.metadata == expected
+    assert list(res.outputs.metadata) == list(expected)
+
+
+def test_FusedConfounds(tmp_path):
+    rng = np.random.default_rng(1234)
+    affine = np.diag([3.0, 3.0, 3.5, 1.0])
+    shape = (12, 13, 10)
+    data = 500 + 20 * rng.standard_normal(shape + (60,)) + np.linspace(0, 30, 60)
+    nb.Nifti1Image(data.astype("float32"), affine).to_filename(tmp_path / "bold.nii.gz")
+
+    mask_files = []
+    for i, roi in enumerate((np.s_[2:10, 2:11, 2:8], np.s_[2:5, 2:5, 2:5],
+                             np.s_[6:10, 6:11, 4:8], np.s_[2:10, 2:6, 2:8])):
+        mask = np.zeros(shape, dtype="uint8")
+        mask[roi] = 1
+        mask_files.append(str(tmp_path / f"mask{i}.nii.gz"))
+        nb.Nifti1Image(mask, affine).to_filename(mask_files[-1])
+
+    compcor_args = dict(pre_filter="cosine", save_pre_filter=True, save_metadata=True,
+                        failure_mode="NaN", variance_threshold=0.5, repetition_time=2.0,
+                        ignore_initial_volumes=3, realigned_file=str(tmp_path / "bold.nii.gz"))
+    dvars = pe.Node(nac.ComputeDVARS(save_nstd=True, save_std=True, remove_zerovariance=True,
+                                     in_file=str(tmp_path / "bold.nii.gz"),
+                                     in_mask=mask_files[0]),
+                    name="dvars", base_dir=str(tmp_path)).run().outputs
+    tcompcor = pe.Node(nac.TCompCor(components_file="tcompcor.tsv", header_prefix="t_comp_cor_",
+                                    percentile_threshold=.02, mask_files=mask_files[:1],
+                                    **compcor_args),
+                       name="tcompcor", base_dir=str(tmp_path)).run().outputs
+    acompcor = pe.Node(nac.ACompCor(components_file="acompcor.tsv", header_prefix="a_comp_cor_",
+                                    mask_names=["CSF", "WM", "combined"], merge_method="none",
+                                    mask_files=mask_files[1:], **compcor_args),
+                       name="acompcor", base_dir=str(tmp_path)).run().outputs
+    signals = pe.Node(SignalExtraction(
+        in_file=str(tmp_path / "bold.nii.gz"),
+        label_files=mask_files + [tcompcor.high_variance_masks],
+        class_labels=["global_signal", "csf", "white_matter", "csf_wm", "tcompcor"],
+    ), name="signals", base_dir=str(tmp_path)).run().outputs
+
+    fused = pe.Node(confounds.FusedConfounds(
+        in_file=str(tmp_path / "bold.nii.gz"), in_mask=mask_files[0],
+        acompcor_masks=mask_files[1:], skip_vols=3, repetition_time=2.0, chunk_size=7,
+    ), name="fused", base_dir=str(tmp_path)).run().outputs
+
+    for ref, test in (
+        (dvars.out_std, fused.dvars_std),
+        (dvars.out_nstd, fused.dvars_nstd),
+        (tcompcor.pre_filter_file, fused.cos_basis),
+        (tcompcor.metadata_file, fused.tcompcor_metadata),
+        (acompcor.metadata_file, fused.acompcor_metadata),
+        (signals.out_file, fused.signals),
+    ):
+        assert Path(test).read_text() == Path(ref).read_text()
+
+    # Components are defined up to their sign
+    for ref, test in ((tcompcor.components_file, fused.tcompcor),
+                      (acompcor.components_file, fused.acompcor)):
+        ref, test = pd.read_table(ref), pd.read_table(test)
+        assert list(ref.columns) == list(test.columns)
+        assert np.allclose(ref.abs(), test.abs(), atol=1e-8)
+
+    assert np.all(
+        np.asanyarray(nb.load(tcompcor.high_variance_masks).dataobj)
+        == np.asanyarray(nb.load(fused.tcompcor_mask).dataobj)
+    )
+
+    # Head-motion correction applied on the fly, instead of reading a corrected series
+    hmc = tmp_path / "hmc.txt"
+    hmc.write_text("#Insight Transform File V1.0\n" + "".join(
+        f"#Transform {i}\nTransform: AffineTransform_float_3_3\n"
+        f"Parameters: 1 0 0 0 1 0 0 0 1 {0.1 * (i % 3)} {-0.05 * (i % 4)} 0\n"
+        "FixedParameters: 0 0 0\n" for i in range(60)))
+    corrected = pe.Node(ResampleSeries(
+        in_files=[str(tmp_path / "bold.nii.gz")], transforms=[str(hmc)],
+        reference_image=str(tmp_path / "bold.nii.gz")),
+        name="corrected", base_dir=str(tmp_path)).run().outputs
+    inputs = dict(in_mask=mask_files[0], acompcor_masks=mask_files[1:], skip_vols=3,
+                  repetition_time=2.0)
+    ref = pe.Node(confounds.FusedConfounds(in_file=corrected.out_file, **inputs),
+                  name="ref", base_dir=str(tmp_path)).run().outputs
+    streamed = pe.Node(confounds.FusedConfounds(
+        in_file=str(tmp_path / "bold.nii.gz"), transforms=[str(hmc)], num_threads=2, **inputs,
+    ), name="streamed", base_dir=str(tmp_path)).run().outputs
+    for key in ("dvars_std", "signals", "tcompcor", "acompcor", "acompcor_metadata"):
+        assert Path(getattr(streamed, key)).read_text() == Path(getattr(ref, key)).read_text()
+    assert np.allclose(nb.load(streamed.mean_file).get_fdata(),
+                       nb.load(ref.mean_file).get_fdata())
+
+
+def test_GatherConfounds(tmp_path):
+    from fmriprep.utils.confounds import read_confounds
+
+    pd.DataFrame({'GlobalSignal': [1.0, 2.0, 3.0], '# WhiteMatter': [4.0, 5.0, 6.0]}).to_csv(
+        tmp_path / 'signals.tsv', sep='\t', index=False)
+    pd.DataFrame({'stdDVARS': [0.5, 0.6]}).to_csv(
+        tmp_path / 'dvars.tsv', sep='\t', index=False)
+
+    gather = pe.Node(
+        confounds.GatherConfounds(signals=str(tmp_path / 'signals.tsv'),
+                                  std_dvars=str(tmp_path / 'dvars.tsv')),
+        name='gather', base_dir=str(tmp_path))
+    res = gather.run()
+
+    expected = pd.DataFrame({
+        'global_signal': [1.0, 2.0, 3.0],
+        'white_matter': [4.0, 5.0, 6.0],
+        'std_dvars': [np.nan, 0.5, 0.6],
+    })
+    pd.testing.assert_frame_equal(read_confounds(res.outputs.confounds_file), expected)
+    pd.testing.assert_frame_equal(read_confounds(res.outputs.confounds_npz), expected)
+
+    to_npz = pe.Node(confounds.TSV2NPZ(in_file=res.outputs.confounds_file),
+                     name='to_npz', base_dir=str(tmp_path))
+    res = to_npz.run()
+    assert res.outputs.out_file.endswith('confounds.npz')
+    pd.testing.assert_frame_equal(read_confounds(res.outputs.out_file), expected)
+
+
+def test_PreviousConfounds(tmp_path):
+    import json
+
+    previous = pd.DataFrame({
+        'global_signal': [1.0, 2.0, 3.0],
+        'non_steady_state_outlier00': [1, 0, 0],
+        'trans_x': [0.0, 0.1, 0.2], 'trans_y': [0.0] * 3, 'trans_z': [0.0] * 3,
+        'rot_x': [0.0] * 3, 'rot_y': [0.0] * 3, 'rot_z': [0.0, 0.01, 0.02],
+        'rmsd': [np.nan, 0.1, 0.1],
+        'aroma_motion_02': [0.5, 0.4, 0.3],
+    })
+    previous.to_csv(tmp_path / 'confounds.tsv', sep='\t', index=False, na_rep='n/a')
+    (tmp_path / 'confounds.json').write_text(json.dumps({
+        'a_comp_cor_00': {'Method': 'aCompCor'},
+        'aroma_motion_02': {'MotionNoise': True},
+    }))
+
+    prev = pe.Node(confounds.PreviousConfounds(
+        in_file=str(tmp_path / 'confounds.tsv'),
+        in_metadata=str(tmp_path / 'confounds.json')),
+        name='prev', base_dir=str(tmp_path))
+    res = prev.run()
+
+    assert res.outputs.skip_vols == 1
+    assert np.allclose(np.loadtxt(res.outputs.movpar_file)[:, [0, 5]],
+                       previous[['trans_x', 'rot_z']].values)
+    assert np.allclose(np.loadtxt(res.outputs.rmsd_file), [0.1, 0.1])
+    assert pd.read_csv(res.outputs.carry_over_file, sep='\t').columns.tolist() == [
+        'aroma_motion_02']
+    assert res.outputs.carry_over_metadata == {'aroma_motion_02': {'MotionNoise': True}}
@@ -0,0 +1,49 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import nibabel as nb
+import numpy as np
+from fmriprep.interfaces import hmc
+
+
+def _fake_mcflirt(args):
+    """Write MCFLIRT-like outputs holding the value of each volume."""
+    in_file, _ = args
+    values = nb.load(in_file).get_fdata()[0, 0, 0]
+    out_file = str(in_file).replace(".nii", "_mcf.nii")
+    nb.load(in_file).to_filename(out_file)
+    Path(f"{out_file}.mat").mkdir(exist_ok=True)
+    mat_files = []
+    for i, value in enumerate(values):
+        mat_files.append(f"{out_file}.mat/MAT_{i:04d}")
+        np.savetxt(mat_files[-1], np.eye(4) * value)
+    np.savetxt(f"{out_file}.par", np.tile(values[:, None], (1, 6)), fmt="%.6f")
+    np.savetxt(f"{out_file}_abs.rms", values, fmt="%.6f")
+    np.savetxt(f"{out_file}_rel.rms", np.diff(values), fmt="%.6f")
+    return SimpleNamespace(
+        out_file=out_file, mat_file=mat_files, par_file=f"{out_file}.par",
+        rms_files=[f"{out_file}_abs.rms", f"{out_file}_rel.rms"],
+    )
+
+
+def test_ChunkedMCFLIRT(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hmc, "_mcflirt", _fake_mcflirt)
+    values = np.arange(11, dtype="float32") ** 2
+    nb.Nifti1Image(np.tile(values, (2, 2, 2, 1)), np.eye(4)).to_filename("bold.nii.gz")
+    nb.Nifti1Image(np.zeros((2, 2, 2), dtype="float32"), np.eye(4)).to_filename("ref.nii")
+
+    for num_threads in (1, 3):
+        outputs = hmc.ChunkedMCFLIRT(
+            in_file="bold.nii.gz", ref_file="ref.nii", chunk_size=4, num_threads=num_threads,
+        ).run().outputs
+
+        assert outputs.mat_file == [
+            str(tmp_path / f"bold_mcf.nii.gz.mat/MAT_{i:04d}") for i in range(11)
+        ]
+        assert np.allclose([np.loadtxt(f)[0, 0] for f in outputs.mat_file], values)
+        assert outputs.par_file == str(tmp_path / "bold_mcf.nii.gz.par")
+        assert np.allclose(np.loadtxt(outputs.par_file), np.tile(values[:, None], (1, 6)))
+        assert np.allclose(np.loadtxt(outputs.rms_files[0]), values)
+        assert np.allclose(np.loadtxt(outputs.rms_files[1]), np.diff(values))
+        assert not list(tmp_path.glob("chunk-*.nii"))
@@ -1,7 +1,7 @@
 import nibabel as nb
 import numpy as np
 from nipype.pipeline import engine as pe
-from fmriprep.interfaces.maths import Clip
+from fmriprep.interfaces.maths import Clip, SUSANStats
 
 
 def test_Clip(tmp_path):
@@ -49,3 +49,52 @@ def test_Clip(tmp_path):
     assert ret.outputs.out_file == str(tmp_path / "nonpositive/input_clipped.nii")
     out_img = nb.load(ret.outputs.out_file)
     assert np.allclose(out_img.get_fdata(), [[[-1., 0.], [-2., 0.]]])
+
+
+def test_Clip_scaled(tmp_path):
+    in_file = str(tmp_path / "input.nii.gz")
+    data = np.arange(-12, 12, dtype="int16").reshape((2, 2, 2, 3))
+    img = nb.Nifti1Image(data, np.eye(4))
+    img.header.set_slope_inter(0.5, 1.0)
+    img.to_filename(in_file)
+    scaled = nb.load(in_file).get_fdata()
+
+    # Bounds falling on stored values keep the data type and scaling
+    ret = pe.Node(Clip(in_file=in_file, minimum=0, maximum=5),
+                  name="clip", base_dir=tmp_path).run()
+    out_img = nb.load(ret.outputs.out_file)
+    assert out_img.get_data_dtype() == np.int16
+    assert (out_img.dataobj.slope, out_img.dataobj.inter) == (0.5, 1.0)
+    assert np.array_equal(out_img.get_fdata(), np.clip(scaled, 0, 5))
+
+    # Other bounds are applied to the scaled values
+    ret = pe.Node(Clip(in_file=in_file, minimum=0.2),
+                  name="clip2", base_dir=tmp_path).run()
+    out_img = nb.load(ret.outputs.out_file)
+    assert out_img.get_data_dtype() == np.float32
+    assert np.allclose(out_img.get_fdata(), np.clip(scaled, 0.2, None))
+
+
+def test_SUSANStats(tmp_path):
+    in_file = str(tmp_path / "input.nii.gz")
+    mask_file = str(tmp_path / "mask.nii.gz")
+    rng = np.random.default_rng(1234)
+    data = rng.normal(100, 10, size=(5, 6, 7, 9)).astype("float32")
+    mask = np.zeros((5, 6, 7), dtype="uint8")
+    mask[1:4, 2:5, 3:6] = 1
+    nb.Nifti1Image(data, np.eye(4)).to_filename(in_file)
+    nb.Nifti1Image(mask, np.eye(4)).to_filename(mask_file)
+
+    stats = pe.Node(SUSANStats(in_file=in_file, mask_file=mask_file),
+                    name="stats", base_dir=tmp_path)
+    ret = stats.run()
+
+    # fslstats -p takes the value at index floor(p / 100 * N) of the sorted samples
+    masked = np.sort(data[mask > 0].ravel())
+    assert ret.outputs.median == masked[masked.size // 2]
+    assert np.isclose(ret.outputs.brightness_threshold, 0.75 * ret.outputs.median)
+
+    mean_img = nb.load(ret.outputs.mean_file)
+    assert mean_img.shape == (5, 6, 7)
+    assert np.allclose(mean_img.get_fdata(), data.mean(axis=-1), atol=1e-4)
+    assert ret.outputs.usans == [(ret.outputs.mean_file, ret.outputs.median)]
@@ -0,0 +1,47 @@
+import nibabel as nb
+import numpy as np
+import pytest
+from fmriprep.interfaces.multiecho import FusedT2SMap
+
+
+@pytest.mark.parametrize("fittype", ["curvefit", "loglin"])
+def test_FusedT2SMap(tmp_path, monkeypatch, fittype):
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(1234)
+    echo_times = [0.015, 0.030, 0.045]
+    mask = np.zeros((5, 6, 7), dtype="uint8")
+    mask[1:4, 1:5, 1:6] = 1
+    t2s = np.where(mask, rng.uniform(20, 60, size=mask.shape), 0)
+    s0 = mask[..., np.newaxis] * rng.normal(1000, 50, size=mask.shape + (15,))
+
+    in_files = []
+    for i, te in enumerate(echo_times):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            data = np.nan_to_num(s0 * np.exp(-1000 * te / t2s)[..., np.newaxis])
+        in_files.append(f"echo-{i + 1}.nii.gz")
+        nb.Nifti1Image(data.astype("float32"), np.eye(4)).to_filename(in_files[-1])
+    nb.Nifti1Image(mask, np.eye(4)).to_filename("mask.nii.gz")
+
+    outputs = FusedT2SMap(
+        in_files=in_files, echo_times=echo_times, mask_file="mask.nii.gz", fittype=fittype,
+        num_threads=2,
+    ).run().outputs
+
+    t2s_map = nb.load(outputs.t2star_map).get_fdata()
+    # The log-linear fit is biased by the offset of log(|S| + 1)
+    assert np.allclose(t2s_map[mask > 0], t2s[mask > 0],
+                       rtol=1e-3 if fittype == "curvefit" else 1e-2)
+    assert np.all(t2s_map[mask == 0] == 0)
+    s0_map = nb.load(outputs.s0_map).get_fdata()
+    assert np.allclose(s0_map[mask > 0], s0.mean(axis=-1)[mask > 0],
+                       rtol=1e-3 if fittype == "curvefit" else 1e-2)
+
+    tes = 1000 * np.array(echo_times)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.nan_to_num(tes * np.exp(-tes / t2s_map[..., np.newaxis]))
+        weights = np.nan_to_num(weights / weights.sum(axis=-1, keepdims=True))
+    expected = sum(weights[..., i, np.newaxis] * nb.load(fname).get_fdata()
+                   for i, fname in enumerate(in_files))
+    optcom = nb.load(outputs.optimal_comb)
+    assert optcom.shape == mask.shape + (15,)
+    assert np.allclose(optcom.get_fdata(), expected, rtol=1e-5, atol=1e-3)
@@ -0,0 +1,105 @@
+import numpy as np
+import nibabel as nb
+import pandas as pd
+import pytest
+from nipype.algorithms import confounds as nac
+from nipype.pipeline import engine as pe
+from fmriprep.interfaces import patches
+from fmriprep.utils import confounds
+from fmriprep.utils.confounds import compute_noise_components
+
+
+@pytest.mark.parametrize("svd_solver", ["gram", "randomized"])
+def test_RobustACompCor(tmp_path, svd_solver):
+    rng = np.random.default_rng(1234)
+    affine = np.diag([3.0, 3.0, 3.0, 1.0])
+    shape = (16, 16, 12)
+    # Low-rank signal plus noise, so few components explain most variance
+    data = 500 + 20 * rng.standard_normal(shape + (40,))
+    data += 50 * (rng.standard_normal(shape + (3,)) @ rng.standard_normal((3, 40)))
+    nb.Nifti1Image(data.astype("float32"), affine).to_filename(tmp_path / "bold.nii.gz")
+
+    mask_files = []
+    for i, roi in enumerate((np.s_[:8], np.s_[8:], np.s_[:])):
+        mask = np.zeros(shape, dtype="uint8")
+        mask[roi] = 1
+        mask_files.append(str(tmp_path / f"mask{i}.nii.gz"))
+        nb.Nifti1Image(mask, affine).to_filename(mask_files[-1])
+
+    kwargs = dict(realigned_file=str(tmp_path / "bold.nii.gz"), mask_files=mask_files,
+                  components_file="acompcor.tsv", pre_filter="cosine", save_pre_filter=True,
+                  save_metadata=True, mask_names=["CSF", "WM", "combined"],
+                  merge_method="none", variance_threshold=0.5, repetition_time=2.0,
+                  ignore_initial_volumes=2)
+    ref = pe.Node(nac.ACompCor(**kwargs), name="ref", base_dir=str(tmp_path)).run().outputs
+    test = pe.Node(patches.RobustACompCor(svd_solver=svd_solver, **kwargs),
+                   name="test", base_dir=str(tmp_path)).run().outputs
+
+    ref_comps, test_comps = pd.read_table(ref.components_file), pd.read_table(test.components_file)
+    assert list(ref_comps.columns) == list(test_comps.columns)
+    assert np.allclose(ref_comps.abs(), test_comps.abs(), atol=1e-6)
+    # Signs are deterministic
+    assert np.all(test_comps.values[
+        np.abs(test_comps.values).argmax(axis=0), np.arange(test_comps.shape[1])
+    ] > 0)
+
+    ref_meta, test_meta = pd.read_table(ref.metadata_file), pd.read_table(test.metadata_file)
+    ref_meta, test_meta = (meta[meta.retained].reset_index(drop=True)
+                           for meta in (ref_meta, test_meta))
+    assert ref_meta[["component", "mask"]].equals(test_meta[["component", "mask"]])
+    assert np.allclose(ref_meta.select_dtypes("number"), test_meta.select_dtypes("number"),
+                       atol=1e-6)
+
+    assert (pd.read_table(ref.pre_filter_file).values
+            == pd.read_table(test.pre_filter_file).values).all()
+
+
+@pytest.mark.parametrize("svd_solver", ["gram", "randomized"])
+def test_RobustTCompCor(tmp_path, monkeypatch, svd_solver):
+    rng = np.random.default_rng(1234)
+    affine = np.diag([3.0, 3.0, 3.0, 1.0])
+    shape = (16, 16, 12)
+    data = 500 + 20 * rng.standard_normal(shape + (40,))
+    data += 50 * (rng.standard_normal(shape + (3,)) @ rng.standard_normal((3, 40)))
+    nb.Nifti1Image(data.astype("float32"), affine).to_filename(tmp_path / "bold.nii.gz")
+
+    mask = np.zeros(shape, dtype="uint8")
+    mask[2:-2, 2:-2, 2:-2] = 1
+    nb.Nifti1Image(mask, affine).to_filename(tmp_path / "mask.nii.gz")
+
+    kwargs = dict(realigned_file=str(tmp_path / "bold.nii.gz"),
+                  mask_files=[str(tmp_path / "mask.nii.gz")],
+                  components_file="tcompcor.tsv", header_prefix="t_comp_cor_",
+                  pre_filter="cosine", save_pre_filter=True, save_metadata=True,
+                  percentile_threshold=0.02, variance_threshold=0.5, repetition_time=2.0,
+                  ignore_initial_volumes=2)
+    solvers = []
+
+    def _compute_noise_components(*args, solver, **kw):
+        solvers.append(solver)
+        return compute_noise_components(*args, solver=solver, **kw)
+
+    monkeypatch.setattr(confounds, "compute_noise_components", _compute_noise_components)
+    original = nac.compute_noise_components
+    ref = pe.Node(nac.TCompCor(**kwargs), name="ref", base_dir=str(tmp_path)).run().outputs
+    test = pe.Node(patches.RobustTCompCor(svd_solver=svd_solver, **kwargs),
+                   name="test", base_dir=str(tmp_path)).run().outputs
+    # The decomposition is replaced for the patched interface only
+    assert solvers == [svd_solver]
+    assert nac.compute_noise_components is original
+
+    ref_comps, test_comps = pd.read_table(ref.components_file), pd.read_table(test.components_file)
+    assert list(ref_comps.columns) == list(test_comps.columns)
+    assert np.allclose(ref_comps.abs(), test_comps.abs(), atol=1e-6)
+    assert np.allclose(ref_comps.values[:2], 0)
+
+    assert np.array_equal(nb.load(ref.high_variance_masks).dataobj,
+                          nb.load(test.high_variance_masks).dataobj)
+
+    ref_meta, test_meta = pd.read_table(ref.metadata_file), pd.read_table(test.metadata_file)
+    ref_meta, test_meta = (meta[meta.retained].reset_index(drop=True)
+                           for meta in (ref_meta, test_meta))
+    assert ref_meta[["component", "mask"]].equals(test_meta[["component", "mask"]])
+
+    assert (pd.read_table(ref.pre_filter_file).values
+            == pd.read_table(test.pre_filter_file).values).all()
@@ -0,0 +1,553 @@
+import os
+import nibabel as nb
+import numpy as np
+from nipype.pipeline import engine as pe
+from fmriprep.interfaces.resampling import (
+    ComposeDisplacements, MCFLIRT2Stack, MergeSeries, ResampleLabels, ResampleMasks,
+    ResampleSeries, ResampleSurfaceSeries, VolumeToSurface,
+)
+from fmriprep.utils.transforms import load_transforms, multilabel_interpolation
+
+ITK_AFFINE = """\
+#Insight Transform File V1.0
+#Transform 0
+Transform: AffineTransform_float_3_3
+Parameters: 1 0 0 0 1 0 0 0 1 {} {} {}
+FixedParameters: 0 0 0
+"""
+
+
+def test_ResampleMasks(tmp_path):
+    # Two probabilistic masks on a 1mm grid
+    full = np.ones((10, 10, 10), dtype="float32")
+    half = np.zeros((10, 10, 10), dtype="float32")
+    half[5:] = 1.0
+    in_files = []
+    for name, data in (("full", full), ("half", half)):
+        in_files.append(str(tmp_path / f"{name}.nii.gz"))
+        nb.Nifti1Image(data, np.eye(4)).to_filename(in_files[-1])
+
+    # Reference mask on a 2mm grid, covering only part of the FoV
+    ref_data = np.zeros((5, 5, 5), dtype="uint8")
+    ref_data[1:4, 1:4, 1:4] = 1
+    ref_affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    reference_mask = str(tmp_path / "reference.nii.gz")
+    nb.Nifti1Image(ref_data, ref_affine).to_filename(reference_mask)
+
+    identity = tmp_path / "identity.txt"
+    identity.write_text(ITK_AFFINE.format(0, 0, 0))
+
+    resample = pe.Node(
+        ResampleMasks(in_files=in_files, transform=str(identity),
+                      reference_mask=reference_mask),
+        name="resample", base_dir=str(tmp_path))
+    ret = resample.run()
+
+    out_full, out_half = [nb.load(fname) for fname in ret.outputs.out_files]
+    assert out_full.get_data_dtype() == np.uint8
+    assert np.allclose(out_full.affine, ref_affine)
+    assert np.array_equal(out_full.dataobj, ref_data)
+
+    # The Gaussian kernel blurs the edge of the half mask away
+    expected = ref_data.copy()
+    expected[:3] = 0
+    assert np.array_equal(out_half.dataobj, expected)
+
+    # A shift of the whole FoV along the first axis leaves no overlap
+    shift = tmp_path / "shift.txt"
+    shift.write_text(ITK_AFFINE.format(-20, 0, 0))
+    resample_shift = pe.Node(
+        ResampleMasks(in_files=in_files, transform=str(shift),
+                      reference_mask=reference_mask),
+        name="resample_shift", base_dir=str(tmp_path))
+    ret = resample_shift.run()
+    for fname in ret.outputs.out_files:
+        assert not np.any(nb.load(fname).dataobj)
+
+
+def test_ResampleLabels(tmp_path):
+    from scipy import ndimage
+
+    # Segmentations on a 1mm grid, and a mask on a 2mm grid
+    rng = np.random.default_rng(1234)
+    aseg = ndimage.zoom(rng.integers(0, 5, (4, 4, 4)), 4, order=0).astype("int16")
+    aparc = (aseg * 1000 + 3 * (np.arange(16) > 7)[:, None, None]).astype("int16")
+    mask = np.zeros((8, 8, 8), dtype="uint8")
+    mask[2:6, 1:7, 3:7] = 1
+    in_files = []
+    for name, data, zoom in (("mask", mask, 2.0), ("aseg", aseg, 1.0), ("aparc", aparc, 1.0)):
+        in_files.append(str(tmp_path / f"{name}.nii.gz"))
+        nb.Nifti1Image(data, np.diag([zoom, zoom, zoom, 1.0])).to_filename(in_files[-1])
+
+    reference = str(tmp_path / "reference.nii.gz")
+    ref_affine = np.diag([2.5, 2.5, 2.5, 1.0])
+    nb.Nifti1Image(np.zeros((6, 6, 6), dtype="float32"), ref_affine).to_filename(reference)
+    shift = tmp_path / "shift.txt"
+    shift.write_text(ITK_AFFINE.format(-1.5, 0.5, 0))
+    bold2t1w = tmp_path / "bold2t1w.txt"
+    bold2t1w.write_text(ITK_AFFINE.format(0, -2, 0))
+
+    resample = pe.Node(
+        ResampleLabels(in_files=in_files, reference_image=reference, transforms=[str(shift)],
+                       in_transforms=[str(bold2t1w), "identity", "identity"]),
+        name="resample", base_dir=str(tmp_path))
+    out_files = resample.run().outputs.out_files
+    assert [os.path.basename(f) for f in out_files] == [
+        "mask_trans.nii.gz", "aseg_trans.nii.gz", "aparc_trans.nii.gz"]
+
+    # ITK's translations are in LPS coordinates
+    ras = np.indices((6, 6, 6)).reshape(3, -1) * 2.5 + np.array([[1.5], [-0.5], [0.0]])
+    for out_file, data, coords in zip(out_files, (mask, aseg, aparc),
+                                      ((ras + [[0], [2], [0]]) / 2, ras, ras)):
+        out_img = nb.load(out_file)
+        assert out_img.get_data_dtype() == data.dtype
+        assert np.allclose(out_img.affine, ref_affine)
+        expected = multilabel_interpolation(data, coords).reshape((6, 6, 6))
+        assert np.array_equal(np.asanyarray(out_img.dataobj), expected)
+
+    # Labels on the same grid are left untouched by nearest-neighbor interpolation
+    same = pe.Node(
+        ResampleLabels(in_files=in_files[1:], reference_image=in_files[1],
+                       transforms=["identity"], interpolation="NearestNeighbor"),
+        name="same", base_dir=str(tmp_path))
+    out_files = same.run().outputs.out_files
+    assert np.array_equal(nb.load(out_files[0]).dataobj, aseg)
+    assert np.array_equal(nb.load(out_files[1]).dataobj, aparc)
+
+
+def test_ResampleSeries(tmp_path):
+    rng = np.random.default_rng(1234)
+    data = rng.normal(10.0, 5.0, size=(8, 9, 10, 3)).astype("float32")
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    in_file = str(tmp_path / "bold.nii.gz")
+    img = nb.Nifti1Image(data, affine)
+    img.header.set_zooms((2.0, 2.0, 2.0, 1.5))
+    img.header.set_xyzt_units("mm", "sec")
+    img.to_filename(in_file)
+    in_files = []
+    for i in range(data.shape[-1]):
+        in_files.append(str(tmp_path / f"vol{i}.nii.gz"))
+        nb.Nifti1Image(data[..., i], affine).to_filename(in_files[-1])
+
+    # Shared shift of one voxel along x, then volume-wise shifts along y
+    shift = tmp_path / "shift.txt"
+    shift.write_text(ITK_AFFINE.format(-2, 0, 0))
+    hmc = tmp_path / "hmc.txt"
+    hmc.write_text("\n".join(
+        ITK_AFFINE.format(0, -2 * i, 0).replace("#Transform 0", f"#Transform {i}")
+        for i in range(data.shape[-1])).replace("\n#Insight Transform File V1.0", ""))
+
+    resample = pe.Node(
+        ResampleSeries(in_files=[in_file], transforms=[str(shift), "identity", str(hmc)],
+                       reference_image=in_files[0], header_source=in_file, num_threads=2),
+        name="resample", base_dir=str(tmp_path))
+    out_img = nb.load(resample.run().outputs.out_file)
+    assert out_img.shape == data.shape
+    assert out_img.get_data_dtype() == np.float32
+    assert out_img.header.get_zooms()[3] == 1.5
+    assert out_img.header.get_xyzt_units()[1] == "sec"
+
+    out_data = out_img.get_fdata()
+    for i in range(data.shape[-1]):
+        expected = np.clip(data[1:, i:, :, i], 0, None)
+        assert np.allclose(out_data[:-1, :data.shape[1] - i, :, i], expected, atol=1e-4)
+        assert np.all(out_data[-1, ..., i] == 0)
+
+    # Splitting the series gives the same result
+    split = pe.Node(
+        ResampleSeries(in_files=in_files, transforms=[str(shift), "identity", str(hmc)],
+                       reference_image=in_files[0], interpolation="Linear"),
+        name="split", base_dir=str(tmp_path))
+    split_data = nb.load(split.run().outputs.out_file).get_fdata()
+    assert np.allclose(split_data, out_data, atol=1e-4)
+
+    # Only the first volumes may be resampled
+    first = pe.Node(
+        ResampleSeries(in_files=[in_file], transforms=[str(shift), "identity", str(hmc)],
+                       reference_image=in_files[0], num_volumes=2),
+        name="first", base_dir=str(tmp_path))
+    first_data = nb.load(first.run().outputs.out_file).get_fdata()
+    assert first_data.shape == data.shape[:3] + (2,)
+    assert np.array_equal(first_data, out_data[..., :2])
+
+
+def test_ResampleSeries_linear(tmp_path):
+    """Non-integer affines and displacements fields, against scipy's linear interpolation."""
+    from scipy import ndimage
+
+    rng = np.random.default_rng(1234)
+    data = rng.uniform(50.0, 150.0, size=(8, 9, 10, 2)).astype("float32")
+    affine = np.array([[2.0, 0, 0, -7], [0, 2.5, 0, -9], [0, 0, 3.0, -12], [0, 0, 0, 1]])
+    in_file = str(tmp_path / "bold.nii.gz")
+    nb.Nifti1Image(data, affine).to_filename(in_file)
+
+    ijk = np.indices(data.shape[:3]).reshape(3, -1)
+    ras = affine[:3, :3] @ ijk + affine[:3, 3:]
+    lps = np.diag([-1.0, -1.0, 1.0])
+
+    # A small rotation about z and a non-integer translation, in ITK's LPS convention
+    theta = 0.1
+    matrix = np.array([[np.cos(theta), -np.sin(theta), 0],
+                       [np.sin(theta), np.cos(theta), 0],
+                       [0, 0, 1]])
+    translation = np.array([0.7, -1.3, 0.4])
+    xfm = tmp_path / "affine.txt"
+    xfm.write_text(ITK_AFFINE.replace("1 0 0 0 1 0 0 0 1 {} {} {}", " ".join(
+        "%.10g" % v for v in np.hstack((matrix.ravel(), translation)))))
+    moved_affine = lps @ (matrix @ (lps @ ras) + translation[:, np.newaxis])
+
+    # A smooth displacements field on the grid of the series, stored in LPS
+    disp = np.stack((0.8 * np.sin(ras[1] / 5), 0.6 * np.cos(ras[0] / 7), 0.5 + 0 * ras[2]))
+    field = (lps @ disp).T.reshape(data.shape[:3] + (1, 3))
+    field_file = str(tmp_path / "field.nii.gz")
+    field_img = nb.Nifti1Image(field.astype("float32"), affine)
+    field_img.header.set_intent("vector")
+    field_img.to_filename(field_file)
+    moved_field = ras + disp
+
+    for name, transform, moved in (("affine", str(xfm), moved_affine),
+                                   ("field", field_file, moved_field)):
+        resample = pe.Node(
+            ResampleSeries(in_files=[in_file], transforms=[transform],
+                           reference_image=in_file, interpolation="Linear"),
+            name=f"resample_{name}", base_dir=str(tmp_path))
+        out_data = nb.load(resample.run().outputs.out_file).get_fdata().reshape(-1, 2)
+
+        coords = np.linalg.inv(affine)[:3, :3] @ moved + np.linalg.inv(affine)[:3, 3:]
+        # Compare only where the mapped points fall within the grid of the series
+        inside = np.all((coords >= 0) & (coords <= np.array(data.shape[:3])[:, None] - 1),
+                        axis=0)
+        assert inside.sum() > 100
+        for i in range(data.shape[-1]):
+            expected = ndimage.map_coordinates(data[..., i], coords, order=1)
+            assert np.allclose(out_data[inside, i], expected[inside], atol=1e-3)
+
+
+def test_ComposeDisplacements(tmp_path):
+    rng = np.random.default_rng(1234)
+    data = rng.normal(10.0, 5.0, size=(8, 9, 10, 2)).astype("float32")
+    in_file = str(tmp_path / "bold.nii.gz")
+    nb.Nifti1Image(data, np.diag([2.0, 2.0, 2.0, 1.0])).to_filename(in_file)
+    reference = str(tmp_path / "reference.nii.gz")
+    nb.Nifti1Image(np.zeros((6, 7, 8), dtype="uint8"),
+                   np.diag([2.5, 2.5, 2.5, 1.0])).to_filename(reference)
+    xfm = tmp_path / "xfm.txt"
+    xfm.write_text(ITK_AFFINE.format(-1.5, 0.5, 2))
+
+    cache_dir = tmp_path / "cache"
+    compose = pe.Node(
+        ComposeDisplacements(transforms=[str(xfm), "identity"], reference_image=reference,
+                             cache_dir=str(cache_dir)),
+        name="compose", base_dir=str(tmp_path))
+    field_file = compose.run().outputs.out_file
+    assert field_file.startswith(str(cache_dir))
+
+    # Resampling through the dense field is the same as through the affine
+    resampled = []
+    for transforms in ([str(xfm)], [field_file]):
+        resample = pe.Node(
+            ResampleSeries(in_files=[in_file], transforms=transforms,
+                           reference_image=reference),
+            name="resample", base_dir=str(tmp_path / str(len(resampled))))
+        resampled.append(nb.load(resample.run().outputs.out_file).get_fdata())
+    assert np.allclose(resampled[0], resampled[1], atol=1e-4)
+
+    # The field is reused from the cache by another node
+    mtime = os.stat(field_file).st_mtime_ns
+    compose = pe.Node(
+        ComposeDisplacements(transforms=[str(xfm), "identity"], reference_image=reference,
+                             cache_dir=str(cache_dir)),
+        name="compose_again", base_dir=str(tmp_path))
+    assert compose.run().outputs.out_file == field_file
+    assert os.stat(field_file).st_mtime_ns == mtime
+
+
+def test_ResampleSeries_targets(tmp_path):
+    rng = np.random.default_rng(1234)
+    data = rng.normal(10.0, 5.0, size=(8, 9, 10, 3)).astype("float32")
+    in_file = str(tmp_path / "bold.nii.gz")
+    nb.Nifti1Image(data, np.diag([2.0, 2.0, 2.0, 1.0])).to_filename(in_file)
+    references = []
+    for i, zoom in enumerate((2.5, 3.0)):
+        references.append(str(tmp_path / f"reference{i}.nii.gz"))
+        nb.Nifti1Image(np.zeros((6, 7, 8), dtype="uint8"),
+                       np.diag([zoom, zoom, zoom, 1.0])).to_filename(references[-1])
+    xfm = tmp_path / "xfm.txt"
+    xfm.write_text(ITK_AFFINE.format(-1.5, 0.5, 2))
+
+    # All targets in one pass
+    resample = pe.Node(
+        ResampleSeries(in_files=[in_file], transforms=["identity"],
+                       reference_image=references, target_transforms=["identity", str(xfm)],
+                       interpolation="Linear"),
+        name="resample", base_dir=str(tmp_path))
+    out_files = resample.run().outputs.out_file
+    assert len(out_files) == 2
+
+    # Each target on its own
+    for i, (reference, transform) in enumerate(zip(references, ("identity", str(xfm)))):
+        single = pe.Node(
+            ResampleSeries(in_files=[in_file], transforms=[transform],
+                           reference_image=reference, interpolation="Linear"),
+            name=f"single{i}", base_dir=str(tmp_path))
+        expected = nb.load(single.run().outputs.out_file)
+        out_img = nb.load(out_files[i])
+        assert out_img.shape == (6, 7, 8, 3)
+        assert np.allclose(out_img.affine, expected.affine)
+        assert np.allclose(out_img.get_fdata(), expected.get_fdata())
+
+    # Only the voxels within a mask, in the order of numpy.nonzero
+    mask = np.zeros((6, 7, 8), dtype="uint8")
+    mask[1:3, 2:5, 4] = [[10, 0, 11], [12, 13, 0]]
+    mask_file = str(tmp_path / "mask.nii.gz")
+    nb.Nifti1Image(mask, np.diag([3.0, 3.0, 3.0, 1.0])).to_filename(mask_file)
+    masked = pe.Node(
+        ResampleSeries(in_files=[in_file], transforms=["identity"],
+                       reference_image=references, target_transforms=["identity", str(xfm)],
+                       reference_mask=["none", mask_file], interpolation="Linear"),
+        name="masked", base_dir=str(tmp_path))
+    out_files = masked.run().outputs.out_file
+    assert np.allclose(nb.load(out_files[0]).get_fdata(),
+                       nb.load(resample.result.outputs.out_file[0]).get_fdata())
+    samples = nb.load(out_files[1])
+    assert samples.shape == (4, 1, 1, 3)
+    assert np.allclose(samples.get_fdata()[:, 0, 0], expected.get_fdata()[mask > 0])
+
+
+def test_ResampleSeries_joint(tmp_path):
+    rng = np.random.default_rng(1234)
+    in_files = []
+    for echo in range(3):
+        in_files.append(str(tmp_path / f"echo-{echo + 1}_bold.nii.gz"))
+        nb.Nifti1Image(rng.normal(10.0, 5.0, size=(8, 9, 10, 3)).astype("float32"),
+                       np.diag([2.0, 2.0, 2.0, 1.0])).to_filename(in_files[-1])
+    xfm = tmp_path / "xfm.txt"
+    xfm.write_text(ITK_AFFINE.format(-1.5, 0.5, 2))
+    hmc = tmp_path / "hmc.txt"
+    hmc.write_text("\n".join(
+        ITK_AFFINE.format(0, -0.7 * i, 0).replace("#Transform 0", f"#Transform {i}")
+        for i in range(3)).replace("\n#Insight Transform File V1.0", ""))
+
+    # All echoes in one pass
+    joint = pe.Node(
+        ResampleSeries(in_files=in_files, transforms=[str(xfm), str(hmc)],
+                       reference_image=in_files[0], joint=True, num_threads=2),
+        name="joint", base_dir=str(tmp_path))
+    out_files = joint.run().outputs.out_file
+    assert [os.path.basename(f) for f in out_files] == [
+        f"echo-{echo + 1}_bold_resampled.nii.gz" for echo in range(3)
+    ]
+
+    # Each echo on its own
+    for echo, in_file in enumerate(in_files):
+        single = pe.Node(
+            ResampleSeries(in_files=[in_file], transforms=[str(xfm), str(hmc)],
+                           reference_image=in_files[0]),
+            name=f"single{echo}", base_dir=str(tmp_path))
+        expected = nb.load(single.run().outputs.out_file)
+        out_img = nb.load(out_files[echo])
+        assert out_img.shape == expected.shape
+        assert np.allclose(out_img.get_fdata(), expected.get_fdata(), atol=1e-4)
+
+
+def test_MCFLIRT2Stack(tmp_path):
+    from nitransforms.linear import Affine
+
+    rng = np.random.default_rng(1234)
+    affine = np.diag([2.0, 2.0, 2.5, 1.0])
+    affine[:3, 3] = [-9.0, -11.0, -6.0]
+    reference = str(tmp_path / "boldref.nii.gz")
+    nb.Nifti1Image(np.zeros((10, 12, 8), dtype="float32"), affine).to_filename(reference)
+    mat_files = []
+    for i in range(4):
+        mat = np.eye(4)
+        mat[:3, :3] += rng.normal(0.0, 0.02, size=(3, 3))
+        mat[:3, 3] = rng.normal(0.0, 1.0, size=3)
+        mat_files.append(str(tmp_path / f"MAT_{i:04d}"))
+        np.savetxt(mat_files[-1], mat)
+
+    stack = pe.Node(MCFLIRT2Stack(in_files=mat_files, in_reference=reference,
+                                  in_source=reference, write_itk=True),
+                    name="stack", base_dir=str(tmp_path)).run().outputs
+    matrices = np.load(stack.out_file)
+    assert matrices.shape == (4, 4, 4)
+    for mat_file, matrix in zip(mat_files, matrices):
+        expected = Affine.from_filename(mat_file, fmt="fsl", reference=reference,
+                                        moving=reference).matrix
+        assert np.allclose(matrix, expected)
+
+    # Both formats are read as the same volume-wise transforms
+    assert np.array_equal(load_transforms([stack.out_file])[0], matrices)
+    assert np.allclose(load_transforms([stack.itk_file])[0], matrices, atol=1e-5)
+
+
+def test_MergeSeries(tmp_path):
+    from niworkflows.interfaces.nilearn import Merge
+
+    rng = np.random.default_rng(1234)
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    in_files = []
+    for i in range(4):
+        in_files.append(str(tmp_path / f"vol{i}.nii.gz"))
+        img = nb.Nifti1Image(rng.integers(0, 100, size=(5, 6, 7)).astype("int16"), affine)
+        img.header.set_slope_inter(0.5, 1.0)
+        img.to_filename(in_files[-1])
+    header_source = str(tmp_path / "bold.nii.gz")
+    img = nb.Nifti1Image(np.zeros((5, 6, 7, 4), dtype="int16"), affine)
+    img.header.set_zooms((2.0, 2.0, 2.0, 1.5))
+    img.header.set_xyzt_units("mm", "sec")
+    img.to_filename(header_source)
+
+    results = []
+    for interface in (MergeSeries, Merge):
+        merge = pe.Node(interface(in_files=in_files, header_source=header_source),
+                        name=f"merge_{interface.__name__}", base_dir=str(tmp_path))
+        results.append(nb.load(merge.run().outputs.out_file))
+
+    merged, expected = results
+    assert merged.get_data_dtype() == expected.get_data_dtype()
+    assert merged.header.get_zooms() == expected.header.get_zooms()
+    assert merged.header.get_xyzt_units()[1] == "sec"
+    assert np.allclose(merged.affine, expected.affine)
+    assert np.array_equal(merged.get_fdata(), expected.get_fdata())
+
+
+def _write_subject(subject_dir, vertices, faces, cortex):
+    """Write the FreeSurfer files sampled by VolumeToSurface."""
+    for subdir in ("mri", "surf", "label"):
+        (subject_dir / subdir).mkdir(parents=True)
+    t1_affine = np.array([[-1.0, 0, 0, 18], [0, 0, 1, -19], [0, -1, 0, 17], [0, 0, 0, 1]])
+    nb.MGHImage(np.zeros((32, 32, 32), dtype="uint8"), t1_affine).to_filename(
+        str(subject_dir / "mri" / "T1.mgz"))
+    for hemi in ("lh", "rh"):
+        nb.freesurfer.write_geometry(str(subject_dir / "surf" / f"{hemi}.white"),
+                                     vertices, faces)
+        nb.freesurfer.write_geometry(str(subject_dir / "surf" / f"{hemi}.sphere.reg"),
+                                     vertices, faces)
+        nb.freesurfer.write_morph_data(str(subject_dir / "surf" / f"{hemi}.thickness"),
+                                       np.full(len(vertices), 2.0, dtype="float32"))
+        (subject_dir / "label" / f"{hemi}.cortex.label").write_text(
+            f"#!ascii label\n{len(cortex)}\n"
+            + "".join(f"{v} 0 0 0 0\n" for v in cortex))
+
+
+def test_VolumeToSurface(tmp_path):
+    from scipy.spatial import ConvexHull
+    from fmriprep.utils.surfaces import vertex_normals
+
+    # A sphere of radius 6mm, with outward-facing triangles
+    rng = np.random.default_rng(1234)
+    vertices = rng.normal(size=(200, 3))
+    vertices *= 6.0 / np.linalg.norm(vertices, axis=1, keepdims=True)
+    faces = ConvexHull(vertices).simplices
+    inward = np.einsum("ij,ij->i", np.cross(vertices[faces[:, 1]] - vertices[faces[:, 0]],
+                                            vertices[faces[:, 2]] - vertices[faces[:, 0]]),
+                       vertices[faces[:, 0]]) < 0
+    faces[inward] = faces[inward][:, ::-1]
+    cortex = np.arange(150)
+    subjects_dir = tmp_path / "subjects"
+    _write_subject(subjects_dir / "sub-01", vertices, faces, cortex)
+    _write_subject(subjects_dir / "fsaverage5", vertices, faces, np.arange(100))
+
+    # A linear BOLD series in T1w space, sampled exactly by trilinear interpolation
+    bold_affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    bold_affine[:3, 3] = [-20, -20, -20]
+    ijk = np.indices((20, 20, 20)).reshape((3, -1))
+    xyz = (bold_affine[:3, :3] @ ijk + bold_affine[:3, 3:]).T
+    gradients = np.array([[1.0, 2.0, -0.5], [0.0, -1.0, 3.0]])
+    data = (xyz @ gradients.T + 100).reshape((20, 20, 20, 2))
+    source_file = str(tmp_path / "bold.nii.gz")
+    nb.Nifti1Image(data.astype("float32"), bold_affine).to_filename(source_file)
+    xfm = tmp_path / "xfm.txt"
+    xfm.write_text(ITK_AFFINE.format(1.0, -2.0, 0.5))
+
+    # Mid-ribbon points of vertices, in T1w space
+    t1 = nb.load(str(subjects_dir / "sub-01" / "mri" / "T1.mgz"))
+    tkr2ras = t1.affine @ np.linalg.inv(t1.header.get_vox2ras_tkr())
+    mid = vertices + vertex_normals(vertices, faces)
+    mid = mid @ tkr2ras[:3, :3].T + tkr2ras[:3, 3] + [-1.0, 2.0, 0.5]
+    expected = mid @ gradients.T + 100
+    expected[cortex.size:] = 0
+
+    cache_dir = tmp_path / "cache"
+    for target, medial_nan in (("sub-01", False), ("fsaverage5", True)):
+        sampler = pe.Node(
+            VolumeToSurface(source_file=source_file, subjects_dir=str(subjects_dir),
+                            subject_id="sub-01", target_subject=target,
+                            t1w2fsnative_xfm=str(xfm), medial_surface_nan=medial_nan,
+                            cache_dir=str(cache_dir)),
+            name=f"sampler_{target}", base_dir=str(tmp_path))
+        out_files = sampler.run().outputs.out_files
+        assert [os.path.basename(f) for f in out_files] == [
+            f"lh.{target}.gii", f"rh.{target}.gii"]
+        for out_file, structure in zip(out_files, ("CortexLeft", "CortexRight")):
+            img = nb.load(out_file)
+            assert img.meta.metadata["AnatomicalStructurePrimary"] == structure
+            samples = np.stack([darray.data for darray in img.darrays], axis=1)
+            if medial_nan:
+                assert np.isnan(samples[100:]).all()
+                samples = samples[:100]
+            assert np.allclose(samples, expected[:len(samples)], atol=1e-3)
+
+    # Matrices are cached for both hemispheres and targets
+    assert len(os.listdir(cache_dir)) == 4
+
+
+def _sphere(n_vertices, seed):
+    """A random unit sphere with outward-facing triangles, and its vertex areas."""
+    from scipy.spatial import ConvexHull
+
+    rng = np.random.default_rng(seed)
+    vertices = rng.normal(size=(n_vertices, 3))
+    vertices /= np.linalg.norm(vertices, axis=1, keepdims=True)
+    faces = ConvexHull(vertices).simplices
+    normals = np.cross(vertices[faces[:, 1]] - vertices[faces[:, 0]],
+                       vertices[faces[:, 2]] - vertices[faces[:, 0]])
+    inward = np.einsum("ij,ij->i", normals, vertices[faces[:, 0]]) < 0
+    faces[inward] = faces[inward][:, ::-1]
+    areas = np.zeros(n_vertices)
+    for i in range(3):
+        np.add.at(areas, faces[:, i], np.linalg.norm(normals, axis=1) / 6)
+    return vertices.astype("float32"), faces.astype("int32"), areas.astype("float32")
+
+
+def test_ResampleSurfaceSeries(tmp_path):
+    spheres = {}
+    for name, n_vertices, seed in (("coarse", 500, 1), ("fine", 2000, 2)):
+        vertices, faces, areas = _sphere(n_vertices, seed)
+        spheres[name] = (str(tmp_path / f"{name}.surf.gii"), str(tmp_path / f"{name}.shape.gii"),
+                         vertices)
+        nb.GiftiImage(darrays=[
+            nb.gifti.GiftiDataArray(vertices, intent="NIFTI_INTENT_POINTSET"),
+            nb.gifti.GiftiDataArray(faces, intent="NIFTI_INTENT_TRIANGLE"),
+        ]).to_filename(spheres[name][0])
+        nb.GiftiImage(darrays=[nb.gifti.GiftiDataArray(areas)]).to_filename(spheres[name][1])
+
+    cache_dir = tmp_path / "cache"
+    for current, new in (("fine", "coarse"), ("coarse", "fine"), ("coarse", "coarse")):
+        # A constant and a smooth frame
+        vertices = spheres[current][2]
+        in_file = str(tmp_path / f"{current}.func.gii")
+        nb.GiftiImage(darrays=[
+            nb.gifti.GiftiDataArray(np.full(len(vertices), 3.0, dtype="float32"),
+                                    intent="NIFTI_INTENT_TIME_SERIES"),
+            nb.gifti.GiftiDataArray(vertices[:, 2].copy(), intent="NIFTI_INTENT_TIME_SERIES"),
+        ]).to_filename(in_file)
+
+        for i in range(2):
+            resample = pe.Node(
+                ResampleSurfaceSeries(
+                    in_file=in_file, current_sphere=spheres[current][0],
+                    current_area=spheres[current][1], new_sphere=spheres[new][0],
+                    new_area=spheres[new][1], out_file="resampled.func.gii",
+                    cache_dir=str(cache_dir)),
+                name=f"resample_{current}_{i}", base_dir=str(tmp_path))
+            out_img = nb.load(resample.run().outputs.out_file)
+            assert len(out_img.darrays) == 2
+            assert np.allclose(out_img.darrays[0].data, 3.0)
+            # Resampling onto the same sphere changes nothing
+            atol = 1e-5 if current == new else 0.2
+            assert np.allclose(out_img.darrays[1].data, spheres[new][2][:, 2], atol=atol)
+
+    # One matrix per pair of spheres
+    assert len(os.listdir(cache_dir)) == 3
@@ -0,0 +1,80 @@
+import nibabel as nb
+import numpy as np
+import pytest
+from fmriprep.interfaces.stc import SliceTimingCorrection
+
+
+@pytest.mark.parametrize("direction", ["k", "k-", "j"])
+@pytest.mark.parametrize("dtype", ["float32", "int16"])
+def test_SliceTimingCorrection(tmp_path, monkeypatch, direction, dtype):
+    monkeypatch.chdir(tmp_path)
+    tr, n_vols, ignore = 2.0, 40, 3
+    slice_timing = np.array([0.0, 1.0, 0.5, 1.5])
+    axis = "ijk".index(direction[0])
+    # Slice times of the slices, in the order of the axis
+    times = slice_timing[::-1] if direction.endswith("-") else slice_timing
+
+    def _signal(t):
+        return 1000 + 100 * np.sin(2 * np.pi * t / 30.0)
+
+    shape = [3, 3, 3]
+    shape[axis] = len(times)
+    acquired = _signal(np.arange(n_vols) * tr + times[:, np.newaxis])
+    data = np.moveaxis(
+        np.tile(acquired, tuple(shape[:axis] + shape[axis + 1:]) + (1, 1)), -2, axis
+    )
+    data[..., :ignore] = 0
+    affine = np.diag([2.0, 3.0, 4.0, 1.0])
+    img = nb.Nifti1Image(data.astype(dtype), affine)
+    img.header.set_zooms((2.0, 3.0, 4.0, tr))
+    img.to_filename("bold.nii.gz")
+
+    out_file = SliceTimingCorrection(
+        in_file="bold.nii.gz", tr=tr, slice_timing=list(slice_timing),
+        slice_encoding_direction=direction, tzero=0.75, ignore=ignore, chunk_size=9,
+    ).run().outputs.out_file
+
+    out_img = nb.load(out_file)
+    assert out_file.endswith("bold_tshift.nii")
+    assert not list(tmp_path.glob("shifted*"))
+    assert out_img.get_data_dtype() == dtype
+    assert np.allclose(out_img.affine, affine)
+    assert out_img.header.get_zooms() == img.header.get_zooms()
+    out_data = out_img.get_fdata()
+    assert np.allclose(out_data[..., :ignore], 0)
+    # The extended series is not smooth at its ends: check its central part only
+    expected = _signal(np.arange(n_vols) * tr + 0.75)
+    # (integer inputs are also rounded)
+    assert np.allclose(out_data[..., ignore + 5:-5], expected[ignore + 5:-5],
+                       atol=0.1 if dtype == "float32" else 1.5)
+
+    with pytest.raises(RuntimeError):
+        SliceTimingCorrection(
+            in_file="bold.nii.gz", tr=tr, slice_timing=list(slice_timing), tzero=0.75,
+            slice_encoding_direction=direction, ignore=n_vols - 4,
+        ).run()
+
+
+@pytest.mark.parametrize("direction", ["k", "i-"])
+def test_SliceTimingCorrection_slabs(tmp_path, monkeypatch, direction):
+    """Long series are split in several slabs (or blocks of rows) with the same output."""
+    monkeypatch.chdir(tmp_path)
+    n_vols, shape = 300, (8, 8, 6)
+    n_slices = shape["ijk".index(direction[0])]
+    data = np.random.default_rng(1234).standard_normal(shape + (n_vols,))
+    nb.Nifti1Image(data.astype("float32"), np.eye(4)).to_filename("bold.nii")
+    slice_samples = 2 * n_vols * int(np.prod(shape)) // n_slices
+
+    outputs = []
+    # A single slab, slabs of two slices, and slices split into blocks of rows
+    for chunk_size in (slice_samples * n_slices, slice_samples * 2, slice_samples // 3):
+        out_file = SliceTimingCorrection(
+            in_file="bold.nii", tr=2.0, slice_timing=list(np.linspace(0, 1.8, n_slices)),
+            slice_encoding_direction=direction, tzero=0.9, chunk_size=chunk_size,
+        ).run().outputs.out_file
+        outputs.append(np.asanyarray(nb.load(out_file).dataobj).copy())
+
+    assert not list(tmp_path.glob("shifted*"))
+    assert not np.allclose(outputs[0], data)
+    assert np.allclose(outputs[1], outputs[0])
+    assert np.allclose(outputs[2], outputs[0])
@@ -175,3 +175,70 @@ def validate_input_dir(exec_env, bids_dir, participant_label):
             subprocess.check_call(['bids-validator', str(bids_dir), '-c', temp.name])
         except FileNotFoundError:
             print("bids-validator does not appear to be installed", file=sys.stderr)
+
+
+def collect_confounds_derivatives(derivatives_dir, bold_file):
+    """
+    Gather the derivatives of a previous run required to recalculate confounds.
+
+    Parameters
+    ----------
+    derivatives_dir : :obj:`os.PathLike`
+        The *fMRIPrep* output directory of the previous run.
+    bold_file : :obj:`str` or :obj:`list`
+        The original BOLD series (one file per echo for multi-echo data).
+
+    Returns
+    -------
+    derivatives : :obj:`dict` or ``None``
+        Paths to the native-space preprocessed BOLD series (``bold``) and its mask
+        (``bold_mask``), the T1w-to-BOLD transform (``t1_bold_xform``), the previous
+        confounds table (``confounds``) and its metadata (``confounds_metadata``),
+        and the T1w tissue probability maps (``t1w_tpms``).
+        ``None`` is returned if any of these is missing.
+
+    Examples
+    --------
+    >>> from tempfile import TemporaryDirectory
+    >>> tmpdir = TemporaryDirectory()
+    >>> collect_confounds_derivatives(
+    ...     tmpdir.name, '/data/sub-01/func/sub-01_task-rest_bold.nii.gz') is None
+    True
+    >>> tmpdir.cleanup()
+
+    """
+    from bids.layout import parse_file_entities
+    from bids.layout.writing import build_path
+    from niworkflows.interfaces.bids import BIDS_DERIV_PATTERNS
+    from smriprep.utils.bids import collect_derivatives
+
+    derivatives_dir = Path(derivatives_dir)
+    if isinstance(bold_file, (list, tuple)):
+        bold_file = bold_file[0]
+
+    entities = parse_file_entities(str(bold_file))
+    for dismissed in ('echo', 'suffix', 'extension'):
+        entities.pop(dismissed, None)
+
+    queries = {
+        'bold': {'desc': 'preproc', 'suffix': 'bold', 'extension': '.nii.gz'},
+        'bold_mask': {'desc': 'brain', 'suffix': 'mask', 'extension': '.nii.gz'},
+        't1_bold_xform': {'from': 'T1w', 'to': 'scanner', 'mode': 'image',
+                          'suffix': 'xfm', 'extension': '.txt'},
+        'confounds': {'desc': 'confounds', 'suffix': 'timeseries', 'extension': '.tsv'},
+        'confounds_metadata': {'desc': 'confounds', 'suffix': 'timeseries',
+                               'extension': '.json'},
+    }
+
+    derivatives = {}
+    for key, query in queries.items():
+        path = build_path({**entities, **query}, BIDS_DERIV_PATTERNS)
+        if not path or not (derivatives_dir / path).exists():
+            return None
+        derivatives[key] = str(derivatives_dir / path)
+
+    anat = collect_derivatives(derivatives_dir, entities['subject'], [], False)
+    if anat is None:
+        return None
+    derivatives['t1w_tpms'] = anat['t1w_tpms']
+    return derivatives
@@ -57,6 +57,41 @@ def mask2vf(in_file, zooms=None, out_file=None):
     return out_file
 
 
+def dilate_ball(mask, radius=3):
+    """
+    Dilate a binary mask with a ball-shaped structuring element.
+
+    Equivalent to :py:func:`scipy.ndimage.binary_dilation` with
+    ``structure=skimage.morphology.ball(radius)``, but calculated with an
+    Euclidean distance transform, restricted to the bounding box of the mask
+    (grown by ``radius``).
+
+    >>> import numpy as np
+    >>> mask = np.zeros((9, 9, 9), dtype=bool)
+    >>> mask[4, 4, 4] = True
+    >>> dilated = dilate_ball(mask, radius=2)
+    >>> int(dilated.sum()), bool(dilated[4, 4, 2]), bool(dilated[4, 3, 2])
+    (33, True, False)
+
+    """
+    import numpy as np
+    from scipy.ndimage import distance_transform_edt
+
+    out = np.zeros(mask.shape, dtype=bool)
+    if not mask.any():
+        return out
+
+    bbox = tuple(
+        slice(max(idx.min() - radius, 0), idx.max() + radius + 1)
+        for idx in (
+            np.flatnonzero(mask.any(axis=tuple(set(range(mask.ndim)) - {axis})))
+            for axis in range(mask.ndim)
+        )
+    )
+    out[bbox] = distance_transform_edt(~mask[bbox]) <= radius
+    return out
+
+
 def acompcor_masks(in_files, is_aseg=False, zooms=None):
     """
     Generate aCompCor masks.
@@ -109,8 +144,6 @@ def acompcor_masks(in_files, is_aseg=False, zooms=None):
     from pathlib import Path
     import numpy as np
     import nibabel as nb
-    from scipy.ndimage import binary_dilation
-    from skimage.morphology import ball
 
     csf_file = in_files[2]  # BIDS labeling (CSF=2; last of list)
     # Load PV maps (fast) or segments (recon-all)
@@ -125,23 +158,23 @@ def acompcor_masks(in_files, is_aseg=False, zooms=None):
     zooms = np.array(zooms, dtype=float)
 
     if not is_aseg:
-        gm_data = gm_vf.get_fdata() > 0.05
-        wm_data = wm_vf.get_fdata()
-        csf_data = csf_vf.get_fdata()
+        gm_data = gm_vf.get_fdata(dtype=np.float32) > 0.05
+        wm_data = wm_vf.get_fdata(dtype=np.float32)
+        csf_data = csf_vf.get_fdata(dtype=np.float32)
     else:
         csf_file = mask2vf(
             csf_file,
             zooms=zooms,
             out_file=str(Path("acompcor_csf.nii.gz").absolute()),
         )
-        csf_data = nb.load(csf_file).get_fdata()
+        csf_data = nb.load(csf_file).get_fdata(dtype=np.float32)
         wm_data = mask2vf(in_files[1], zooms=zooms)
 
         # We do not have partial volume maps (recon-all route)
         gm_data = np.asanyarray(gm_vf.dataobj, np.uint8) > 0
 
     # Dilate the GM mask
-    gm_data = binary_dilation(gm_data, structure=ball(3))
+    gm_data = dilate_ball(gm_data, radius=3)
 
     # Output filenames
     wm_file = str(Path("acompcor_wm.nii.gz").absolute())
@@ -156,3 +189,670 @@ def acompcor_masks(in_files, is_aseg=False, zooms=None):
     comb_data[gm_data] = 0  # Make sure voxel does not contain GM
     nb.Nifti1Image(comb_data, gm_vf.affine, gm_vf.header).to_filename(combined_file)
     return [csf_file, wm_file, combined_file]
+
+
+def load_masked_series(in_file, masks, chunk_size=32, transforms=None, num_threads=1):
+    """
+    Read a 4D series once, streaming over time chunks, and keep the masked voxels.
+
+    The series is decompressed sequentially (the file handle is kept open, so
+    gzip streams are never rewound) and only the voxels within the union of
+    ``masks`` are kept, as a single precision matrix.
+    The whole-volume temporal mean is accumulated on the fly, so that
+    reportlets need not read the series again.
+    If ``transforms`` are given, each volume is resampled onto the grid of the
+    series as it is read (see :py:func:`~fmriprep.utils.transforms.resample_series`),
+    so that the preprocessed series needs not be written.
+
+    Parameters
+    ----------
+    in_file : :obj:`str`
+        Path to a 4D NIfTI file.
+    masks : :obj:`list` of :obj:`numpy.ndarray`
+        Boolean 3D arrays, with the same spatial shape as the series.
+    chunk_size : :obj:`int`
+        Number of volumes decompressed at a time.
+    transforms : :obj:`list` or None
+        Transforms (e.g., head-motion correction) mapping the grid of the series
+        onto each of its volumes, listed as for ``antsApplyTransforms``.
+    num_threads : :obj:`int`
+        Number of volumes resampled in parallel (only if ``transforms`` are given).
+
+    Returns
+    -------
+    series : :obj:`numpy.ndarray`
+        Array of shape (V, T) holding the time series of the V voxels
+        within the union of ``masks``.
+    indices : :obj:`list` of :obj:`numpy.ndarray`
+        For each mask in ``masks``, the rows of ``series`` corresponding to
+        its voxels.
+    mean : :obj:`numpy.ndarray`
+        The temporal average of the series, for every voxel of the volume.
+
+    """
+    import numpy as np
+    import nibabel as nb
+
+    img = nb.load(in_file, keep_file_open=True)
+    if img.ndim != 4:
+        raise ValueError(
+            f"Expected a 4D NIfTI file, but <{in_file}> has shape {img.shape}."
+        )
+    if any(mask.shape != img.shape[:3] for mask in masks):
+        raise ValueError(
+            "Inputs do not have matching spatial dimensions "
+            f"({img.shape[:3]} and {[mask.shape for mask in masks]}, respectively)."
+        )
+
+    roi = np.logical_or.reduce(masks)
+    ntimepoints = img.shape[-1]
+    series = np.zeros((roi.sum(), ntimepoints), dtype=np.float32)
+    total = np.zeros(img.shape[:3], dtype=np.float64)
+    if transforms:
+        from .transforms import resample_series
+
+        _, _, volumes = resample_series(
+            [in_file], transforms, [img], num_threads=num_threads
+        )
+        for index, (volume,) in enumerate(volumes):
+            series[:, index] = volume[roi]
+            total += volume
+    else:
+        for start in range(0, ntimepoints, chunk_size):
+            end = min(start + chunk_size, ntimepoints)
+            chunk = np.asanyarray(img.dataobj[..., start:end], dtype=np.float32)
+            series[:, start:end] = chunk[roi]
+            total += chunk.sum(axis=-1, dtype=np.float64)
+
+    # Map each mask onto the rows of the compressed matrix
+    rows = np.full(img.shape[:3], -1, dtype=np.int64)
+    rows[roi] = np.arange(series.shape[0])
+    indices = [rows[mask] for mask in masks]
+    return series, indices, (total / ntimepoints).astype(np.float32)
+
+
+def dvars(series, intensity_normalization=1000, variance_tol=1e-7):
+    """
+    Compute standardized and non-standardized DVARS from a (V, T) matrix.
+
+    This is a vectorized reimplementation of
+    :py:func:`nipype.algorithms.confounds.compute_dvars` (with
+    ``remove_zerovariance=True``), where the lag-1 autocorrelation is
+    calculated with the Yule-Walker estimator for all voxels at once.
+
+    Returns
+    -------
+    dvars_stdz : :obj:`numpy.ndarray`
+        Standardized DVARS (T - 1 values).
+    dvars_nstd : :obj:`numpy.ndarray`
+        Non-standardized DVARS (T - 1 values).
+
+    """
+    import numpy as np
+
+    mfunc = series
+    if intensity_normalization != 0:
+        mfunc = (mfunc / np.median(mfunc)) * intensity_normalization
+
+    # Robust standard deviation (we are using "lower" interpolation
+    # because this is what FSL is doing
+    try:
+        func_sd = (
+            np.percentile(mfunc, 75, axis=1, method="lower")
+            - np.percentile(mfunc, 25, axis=1, method="lower")
+        ) / 1.349
+    except TypeError:  # NP < 1.22
+        func_sd = (
+            np.percentile(mfunc, 75, axis=1, interpolation="lower")
+            - np.percentile(mfunc, 25, axis=1, interpolation="lower")
+        ) / 1.349
+
+    nonzero = func_sd > variance_tol
+    mfunc = mfunc[nonzero]
+    func_sd = func_sd[nonzero]
+
+    # Lag-1 autocorrelation (Yule-Walker, order 1) of the demeaned series
+    demeaned = (mfunc - mfunc.mean(axis=1, keepdims=True)).astype(np.float32)
+    ar1 = (
+        np.einsum("ij,ij->i", demeaned[:, :-1], demeaned[:, 1:], dtype=np.float64)
+        / np.einsum("ij,ij->i", demeaned, demeaned, dtype=np.float64)
+    )
+    del demeaned
+
+    diff_sd_mean = (np.sqrt((1 - ar1) * 2) * func_sd).mean()
+    dvars_nstd = np.sqrt(np.square(np.diff(mfunc, axis=1)).mean(axis=0))
+    return dvars_nstd / diff_sd_mean, dvars_nstd
+
+
+def compcor_svd(M, solver="gram", variance_threshold=None, random_state=0):
+    """
+    Calculate a deterministic, thin SVD of a CompCor (T, V) matrix.
+
+    The decomposition is tried in order with the following solvers, moving
+    on to the next one whenever a solver fails (i.e., it raises or returns
+    non-finite values):
+
+      #. a randomized, truncated SVD (only if ``solver="randomized"`` and
+         ``variance_threshold`` is set), which only calculates the components
+         necessary to explain that fraction of the variance;
+      #. the eigendecomposition of the (T, T) Gram matrix :math:`MM^T`, which is
+         much smaller than :math:`M` because typically T ≪ V (skipped when T > V);
+      #. LAPACK's divide-and-conquer SVD (``gesdd``) on :math:`M`; and
+      #. LAPACK's standard SVD (``gesvd``) on :math:`M`.
+
+    The sign of each left singular vector is fixed so that its largest
+    absolute entry is positive, so that results do not depend on the solver.
+
+    Parameters
+    ----------
+    M : :obj:`numpy.ndarray`
+        Array of shape (T, V).
+    solver : :obj:`str`
+        Either ``"gram"`` (default) or ``"randomized"``.
+    variance_threshold : :obj:`float`
+        Fraction of variance to be explained by the components (for the
+        randomized solver).
+    random_state : :obj:`int`
+        Seed of the randomized solver.
+
+    Returns
+    -------
+    u : :obj:`numpy.ndarray`
+        Left singular vectors, one per column.
+    s : :obj:`numpy.ndarray`
+        Singular values, in descending order.
+    total_variance : :obj:`float`
+        Sum of all squared singular values (which may not all be in ``s``
+        when the randomized solver succeeded).
+
+    """
+    import numpy as np
+    from scipy import linalg
+    from nipype import logging
+
+    def _randomized(M):
+        ntimepoints, nvoxels = M.shape
+        total = np.sum(M ** 2)
+        rng = np.random.default_rng(random_state)
+        rank = 16
+        while rank + 10 < min(M.shape):
+            Q = linalg.qr(M @ rng.standard_normal((nvoxels, rank + 10)), mode="economic")[0]
+            for _ in range(4):  # Power iterations
+                Q = linalg.qr(M @ (M.T @ Q), mode="economic")[0]
+            u, s, _ = linalg.svd(Q.T @ M, full_matrices=False)
+            if np.sum(s[:rank] ** 2) / total >= variance_threshold:
+                return Q @ u, s, total
+            rank *= 2
+        raise np.linalg.LinAlgError("Randomized SVD did not reach the variance threshold")
+
+    def _gram(M):
+        w, v = linalg.eigh(M @ M.T)
+        w, v = w[::-1], v[:, ::-1]
+        # Eigenvalues at the level of round-off error correspond to null singular values
+        w[w < w[0] * len(w) * np.finfo(w.dtype).eps] = 0
+        s = np.sqrt(w)
+        return v, s, np.sum(s ** 2)
+
+    def _svd(driver):
+        def _solver(M):
+            u, s, _ = linalg.svd(M, full_matrices=False, lapack_driver=driver)
+            return u, s, np.sum(s ** 2)
+        return _solver
+
+    solvers = [("gesdd", _svd("gesdd")), ("gesvd", _svd("gesvd"))]
+    if M.shape[0] <= M.shape[1]:  # Otherwise, the Gram matrix is larger than M
+        solvers.insert(0, ("gram", _gram))
+    if solver == "randomized" and variance_threshold is not None:
+        solvers.insert(0, ("randomized", _randomized))
+
+    M = np.asarray(M, dtype=np.float64)
+    for name, func in solvers:
+        try:
+            u, s, total = func(M)
+        except (np.linalg.LinAlgError, ValueError) as exc:
+            logging.getLogger("nipype.interface").warning(
+                "CompCor SVD solver <%s> failed (%s).", name, exc)
+            continue
+        if np.all(np.isfinite(u)) and np.all(np.isfinite(s)):
+            break
+        logging.getLogger("nipype.interface").warning(
+            "CompCor SVD solver <%s> returned non-finite values.", name)
+    else:
+        raise np.linalg.LinAlgError("All SVD solvers failed")
+
+    # Deterministic signs
+    signs = np.sign(u[np.abs(u).argmax(axis=0), np.arange(u.shape[1])])
+    signs[signs == 0] = 1
+    return u * signs, s, total
+
+
+def compcor_design(ntimepoints, filter_type="cosine", degree=0, period_cut=128,
+                   repetition_time=None):
+    """
+    Generate the design matrix of the CompCor high-pass filter.
+
+    Returns
+    -------
+    X : :obj:`numpy.ndarray`
+        The (T, K) design matrix, including the constant term.
+    basis : :obj:`numpy.ndarray`
+        The filter regressors, as reported by *Nipype*.
+
+    """
+    import numpy as np
+    from numpy.polynomial import Legendre
+    from nipype.algorithms.confounds import _cosine_drift, _full_rank
+
+    if filter_type == "cosine":
+        if repetition_time is None:
+            raise ValueError("Repetition time must be provided for cosine filter")
+        X = _full_rank(_cosine_drift(period_cut, repetition_time * np.arange(ntimepoints)))[0]
+    else:
+        X = np.ones((ntimepoints, 1))
+        for i in range(degree):
+            X = np.hstack((
+                X, Legendre.basis(i + 1)(np.linspace(-1, 1, ntimepoints))[:, np.newaxis]
+            ))
+    return X, X[:, :-1] if X.shape[1] > 1 else np.array([])
+
+
+def compcor_components(timecourses, mask_rows, design, components_criterion=0.5,
+                       failure_mode="error", mask_names=None, solver="gram"):
+    """
+    Extract CompCor components from a (V, T) matrix of voxel time series.
+
+    This is the core of :py:func:`compute_noise_components`.
+    Time series are filtered only once, regardless of how many (possibly
+    overlapping) masks are decomposed, and each mask is decomposed with
+    :py:func:`compcor_svd`.
+
+    Parameters
+    ----------
+    timecourses : :obj:`numpy.ndarray`
+        Array of shape (V, T).
+    mask_rows : :obj:`list` of :obj:`numpy.ndarray`
+        For each mask, the rows of ``timecourses`` it contains.
+    design : :obj:`numpy.ndarray`
+        Design matrix of the filter (see :py:func:`compcor_design`).
+
+    Returns
+    -------
+    components : :obj:`numpy.ndarray`
+        The retained components, shape (T, k).
+    metadata : :obj:`collections.OrderedDict`
+        Metadata of the decomposition, as reported by *Nipype*.
+
+    """
+    from collections import OrderedDict
+    import numpy as np
+    from nipype.algorithms.confounds import _compute_tSTD
+
+    if components_criterion == "all":
+        components_criterion = -1
+    mask_names = mask_names or range(len(mask_rows))
+    ntimepoints = timecourses.shape[1]
+
+    # Filter all voxels involved at once
+    roi = np.unique(np.hstack(mask_rows)) if mask_rows else np.array([], dtype=int)
+    lookup = np.full(timecourses.shape[0], -1, dtype=np.int64)
+    lookup[roi] = np.arange(len(roi))
+    filtered = timecourses[roi].astype(np.float64)
+    # Zero-out any bad values
+    filtered[np.isnan(filtered.sum(axis=1))] = 0
+    filtered -= (filtered @ np.linalg.pinv(design).T) @ design.T
+
+    components = []
+    metadata = OrderedDict([
+        ("mask", []),
+        ("singular_value", []),
+        ("variance_explained", []),
+        ("cumulative_variance_explained", []),
+        ("retained", []),
+    ])
+    for name, rows in zip(mask_names, mask_rows):
+        M = filtered[lookup[rows]].T
+        M /= _compute_tSTD(M, 1.0)
+        try:
+            if M.size == 0:
+                raise ValueError("Empty mask")
+            u, s, total = compcor_svd(
+                M, solver=solver,
+                variance_threshold=(components_criterion
+                                    if 0 < components_criterion < 1 else None),
+            )
+        except (np.linalg.LinAlgError, ValueError):
+            if failure_mode == "error":
+                raise
+            s = np.full(ntimepoints, np.nan, dtype=np.float32)
+            u = np.full((ntimepoints, max(int(components_criterion), 1)), np.nan,
+                        dtype=np.float32)
+            total = np.nan
+
+        variance_explained = (s ** 2) / total
+        cumulative_variance_explained = np.cumsum(variance_explained)
+
+        num_components = int(components_criterion)
+        if 0 < components_criterion < 1:
+            num_components = int(
+                np.searchsorted(cumulative_variance_explained, components_criterion) + 1
+            )
+        elif components_criterion == -1:
+            num_components = len(s)
+
+        if num_components == 0:
+            break
+
+        components.append(u[:, :num_components])
+        metadata["mask"] += [name] * len(s)
+        metadata["singular_value"].append(s)
+        metadata["variance_explained"].append(variance_explained)
+        metadata["cumulative_variance_explained"].append(cumulative_variance_explained)
+        metadata["retained"] += [i < num_components for i in range(len(s))]
+
+    if components:
+        components = np.hstack(components)
+    else:
+        if failure_mode == "error":
+            raise ValueError("No components found")
+        components = np.full((ntimepoints, num_components), np.nan, dtype=np.float32)
+
+    for key in ("singular_value", "variance_explained", "cumulative_variance_explained"):
+        metadata[key] = np.hstack(metadata[key]) if metadata[key] else np.array([])
+    return components, metadata
+
+
+def compute_noise_components(
+    imgseries,
+    mask_images,
+    components_criterion=0.5,
+    filter_type=False,
+    degree=0,
+    period_cut=128,
+    repetition_time=None,
+    failure_mode="error",
+    mask_names=None,
+    solver="gram",
+):
+    """
+    Compute the noise components from the image series for each mask.
+
+    Drop-in replacement of
+    :py:func:`nipype.algorithms.confounds.compute_noise_components`,
+    (see :py:func:`compcor_components`), which filters the data of all masks at
+    once and decomposes them with a deterministic SVD backend
+    (see :py:func:`compcor_svd`).
+
+    """
+    import numpy as np
+    import nibabel as nb
+
+    masks = []
+    for img in mask_images:
+        mask = np.asanyarray(nb.squeeze_image(img).dataobj).astype(bool)
+        if imgseries.shape[:3] != mask.shape:
+            raise ValueError(
+                "Inputs for CompCor, timeseries and mask, do not have "
+                "matching spatial dimensions ({} and {}, respectively)".format(
+                    imgseries.shape[:3], mask.shape
+                )
+            )
+        masks.append(mask)
+
+    roi = np.logical_or.reduce(masks) if masks else np.zeros(imgseries.shape[:3], dtype=bool)
+    rows = np.full(roi.shape, -1, dtype=np.int64)
+    rows[roi] = np.arange(roi.sum())
+
+    design, basis = compcor_design(
+        imgseries.shape[-1],
+        filter_type="cosine" if filter_type == "cosine" else "polynomial",
+        degree=degree,
+        period_cut=period_cut,
+        repetition_time=repetition_time,
+    )
+    components, metadata = compcor_components(
+        imgseries[roi],
+        [rows[mask] for mask in masks],
+        design,
+        components_criterion=components_criterion,
+        failure_mode=failure_mode,
+        mask_names=mask_names,
+        solver=solver,
+    )
+    return components, basis, metadata
+
+
+def fused_confounds(
+    in_file,
+    in_mask,
+    acompcor_masks,
+    skip_vols=0,
+    repetition_time=None,
+    components_criterion=0.5,
+    period_cut=128,
+    percentile_threshold=0.02,
+    failure_mode="NaN",
+    solver="gram",
+    chunk_size=32,
+    transforms=None,
+    num_threads=1,
+    newpath=None,
+):
+    """
+    Calculate the BOLD confounds reading the series only once.
+
+    This function is a single-pass replacement of the ``ComputeDVARS``,
+    ``TCompCor``, ``ACompCor`` and ``SignalExtraction`` nodes of
+    :py:func:`~fmriprep.workflows.bold.confounds.init_bold_confs_wf`.
+    The series is streamed over time chunks (see :py:func:`load_masked_series`)
+    and all estimates are computed from the resulting in-memory matrix.
+    Outputs are written with the same layout the original nodes generate.
+
+    Parameters
+    ----------
+    in_file : :obj:`str`
+        The BOLD series.
+    in_mask : :obj:`str`
+        The BOLD brain mask.
+    acompcor_masks : :obj:`list` of :obj:`str`
+        Binary CSF, WM and combined masks in BOLD space, respectively.
+    skip_vols : :obj:`int`
+        Number of non-steady-state volumes, ignored for CompCor.
+    repetition_time : :obj:`float`
+        Repetition time in seconds; read from the header if not given.
+    components_criterion : :obj:`float` or ``"all"``
+        Fraction of variance explained by the retained CompCor components.
+    period_cut : :obj:`float`
+        Cut-off period (in seconds) of the discrete cosine high-pass filter.
+    percentile_threshold : :obj:`float`
+        Fraction of voxels with highest temporal standard deviation
+        within the brain mask that are used for tCompCor.
+    failure_mode : :obj:`str`
+        Action on a failed decomposition (``"error"`` or ``"NaN"``).
+    solver : :obj:`str`
+        Preferred CompCor SVD solver (see :py:func:`compcor_svd`).
+    chunk_size : :obj:`int`
+        Number of volumes decompressed at a time.
+    transforms : :obj:`list` or None
+        If given, ``in_file`` is not preprocessed yet, and these transforms
+        (e.g., head-motion correction) are applied to its volumes as they are read.
+    num_threads : :obj:`int`
+        Number of volumes resampled in parallel (only if ``transforms`` are given).
+    newpath : :obj:`str`
+        Directory where outputs are written (default: current directory).
+
+    Returns
+    -------
+    out_files : :obj:`dict`
+        Paths to the output files.
+
+    """
+    from pathlib import Path
+    import numpy as np
+    import nibabel as nb
+    from nipype.algorithms.confounds import _compute_tSTD, regress_poly
+
+    newpath = Path(newpath or ".").absolute()
+    mask_img = nb.load(in_mask)
+    masks = [
+        np.asanyarray(nb.load(fname).dataobj).astype(bool)
+        for fname in [in_mask] + list(acompcor_masks)
+    ]
+    series, indices, mean = load_masked_series(
+        in_file, masks, chunk_size=chunk_size, transforms=transforms, num_threads=num_threads
+    )
+    ntimepoints = series.shape[1]
+    out_files = {}
+
+    if not repetition_time:
+        header = nb.load(in_file).header
+        repetition_time = float(header.get_zooms()[3])
+        if header.get_xyzt_units()[1] == "msec":
+            repetition_time /= 1000
+        if repetition_time == 0:
+            raise ValueError(
+                "Cannot detect repetition time from image - "
+                "Set the repetition_time input"
+            )
+
+    # DVARS
+    dvars_std, dvars_nstd = dvars(series[indices[0]])
+    out_files["dvars_std"] = str(newpath / "dvars_std.tsv")
+    np.savetxt(out_files["dvars_std"], dvars_std, fmt="%0.6f")
+    out_files["dvars_nstd"] = str(newpath / "dvars_nstd.tsv")
+    np.savetxt(out_files["dvars_nstd"], dvars_nstd, fmt="%0.6f")
+
+    # tCompCor mask: top-variance voxels within the brain mask
+    brain_ts = regress_poly(2, series[indices[0], skip_vols:])[0]
+    tstd = _compute_tSTD(brain_ts, 0, axis=-1)
+    del brain_ts
+    threshold_std = np.percentile(
+        tstd, np.round(100. * (1. - percentile_threshold)).astype(int)
+    )
+    high_variance = tstd >= threshold_std
+    tcc_rows = indices[0][high_variance]
+    tcc_mask = np.zeros(mask_img.shape[:3], dtype=np.uint8)
+    tcc_mask[masks[0]] = high_variance
+    hdr = mask_img.header.copy()
+    hdr.set_data_dtype(np.uint8)
+    out_files["tcompcor_mask"] = str(newpath / "mask_000.nii.gz")
+    nb.Nifti1Image(tcc_mask, mask_img.affine, hdr).to_filename(out_files["tcompcor_mask"])
+
+    # Global signals (all time points, as SignalExtraction)
+    labels = ["global_signal", "csf", "white_matter", "csf_wm", "tcompcor"]
+    signals = np.array([
+        series[rows].mean(axis=0, dtype=np.float64)
+        for rows in indices + [tcc_rows]
+    ]).T
+    out_files["signals"] = str(newpath / "signals.tsv")
+    np.savetxt(out_files["signals"], np.vstack((labels, signals.astype(str))),
+               fmt="%s", delimiter="\t")
+
+    # CompCor: cosine basis over steady-state volumes
+    nsteady = ntimepoints - skip_vols
+    design, cosine = compcor_design(
+        nsteady, period_cut=period_cut, repetition_time=repetition_time
+    )
+    cosine = cosine.reshape((nsteady, -1))
+
+    cos_header = [f"Cosine{i:02d}" for i in range(cosine.shape[1])]
+    cos_data = np.zeros((ntimepoints, cosine.shape[1] + skip_vols))
+    cos_data[skip_vols:, :cosine.shape[1]] = cosine
+    cos_data[:skip_vols, cosine.shape[1]:] = np.eye(skip_vols)
+    cos_header += [f"NonSteadyStateOutlier{i:02d}" for i in range(skip_vols)]
+    out_files["cos_basis"] = str(newpath / "pre_filter.tsv")
+    np.savetxt(out_files["cos_basis"], cos_data, fmt="%.10f", delimiter="\t",
+               header="\t".join(cos_header), comments="")
+
+    for key, prefix, names, rows_list in (
+        ("tcompcor", "t_comp_cor_", None, [tcc_rows]),
+        ("acompcor", "a_comp_cor_", ["CSF", "WM", "combined"], indices[1:]),
+    ):
+        components, metadata = compcor_components(
+            series[:, skip_vols:], rows_list, design,
+            components_criterion=components_criterion,
+            failure_mode=failure_mode,
+            mask_names=names,
+            solver=solver,
+        )
+
+        comp_data = np.zeros((ntimepoints, components.shape[1]), dtype=components.dtype)
+        comp_data[skip_vols:] = components
+        comp_header = [f"{prefix}{i:02d}" for i in range(components.shape[1])]
+        out_files[key] = str(newpath / f"{key}.tsv")
+        np.savetxt(out_files[key], comp_data, fmt="%.10f", delimiter="\t",
+                   header="\t".join(comp_header), comments="")
+
+        retained = iter(comp_header)
+        dropped = iter(range(len(metadata["retained"])))
+        lines = ["\t".join(["component"] + list(metadata.keys()))] + [
+            f"{next(retained) if keep else 'dropped%d' % next(dropped)}\t{name}\t"
+            f"{sval:.10f}\t{var:.10f}\t{cumvar:.10f}\t{keep}"
+            for name, sval, var, cumvar, keep in zip(*metadata.values())
+        ]
+        out_files[f"{key}_metadata"] = str(newpath / f"{key}_metadata.tsv")
+        Path(out_files[f"{key}_metadata"]).write_text("\n".join(lines) + "\n")
+
+    # Temporal mean, for reportlets
+    bold_img = nb.load(in_file)
+    hdr = bold_img.header.copy()
+    hdr.set_data_shape(mean.shape)
+    hdr.set_data_dtype(np.float32)
+    out_files["mean_file"] = str(newpath / "bold_average.nii.gz")
+    nb.Nifti1Image(mean, bold_img.affine, hdr).to_filename(out_files["mean_file"])
+    return out_files
+
+
+def write_confounds_npz(confounds, out_file):
+    """
+    Write a table of confounds in a columnar, binary format.
+
+    Each column is stored as a separate, typed array of a NumPy ``.npz``
+    archive (with keys ``"0"``, ``"1"``, etc.), and the ``"columns"`` array
+    indexes the column names.
+    Since members of an ``.npz`` archive are read only on access, a subset
+    of columns (or only the names) can be retrieved without parsing the
+    whole table.
+
+    """
+    import numpy as np
+
+    arrays = {str(i): confounds.iloc[:, i].to_numpy() for i in range(confounds.shape[1])}
+    np.savez(out_file, columns=np.array(confounds.columns, dtype=str), **arrays)
+    return out_file
+
+
+def read_confounds(in_file, columns=None):
+    """
+    Read a table of confounds from a TSV file or its binary ``.npz`` counterpart.
+
+    Examples
+    --------
+    >>> import os
+    >>> import pandas as pd
+    >>> from tempfile import TemporaryDirectory
+    >>> tmpdir = TemporaryDirectory()
+    >>> table = pd.DataFrame({"global_signal": [0.1, 0.2], "motion_outlier00": [1, 0]})
+    >>> npz = write_confounds_npz(table, os.path.join(tmpdir.name, "confounds.npz"))
+    >>> read_confounds(npz).dtypes.tolist()
+    [dtype('float64'), dtype('int64')]
+    >>> read_confounds(npz, columns=["motion_outlier00"])
+       motion_outlier00
+    0                 1
+    1                 0
+    >>> tmpdir.cleanup()
+
+    """
+    import numpy as np
+    import pandas as pd
+
+    if not str(in_file).endswith(".npz"):
+        confounds = pd.read_csv(in_file, sep="\t", index_col=None, usecols=columns,
+                                na_values="n/a")
+        return confounds if columns is None else confounds[columns]
+
+    with np.load(in_file) as npz:
+        names = npz["columns"].tolist()
+        if columns is None:
+            columns = names
+        return pd.DataFrame({name: npz[str(names.index(name))] for name in columns},
+                            columns=columns)
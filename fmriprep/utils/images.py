@@ -0,0 +1,238 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright 2021 The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Utilities for reading and writing NIfTI images without loading them whole."""
+from contextlib import contextmanager
+
+
+def concat_volumes(segments, out_file):
+    """
+    Write ranges of volumes from 4D NIfTI files into a single uncompressed file.
+
+    Volumes are streamed one at a time, so that at most one volume is held in
+    memory, and input files (compressed or not) are read sequentially, once.
+    The header of the first image is used for the output.
+    If all inputs share the same on-disk data type and scaling, the raw data
+    are copied as they are; otherwise, the output is stored as unscaled
+    ``float32``.
+
+    Parameters
+    ----------
+    segments : :obj:`list` of :obj:`tuple`
+        Tuples ``(in_file, start, stop)``, selecting volumes ``start`` to
+        ``stop`` (excluded, ``None`` meaning the last volume) of ``in_file``.
+    out_file : :obj:`os.PathLike`
+        Path of the output, which should have a ``.nii`` extension.
+
+    Returns
+    -------
+    out_file : :obj:`str`
+        Path of the output.
+
+    """
+    import numpy as np
+    import nibabel as nb
+
+    imgs = []
+    for in_file, start, stop in segments:
+        img = nb.load(in_file)
+        start, stop, _ = slice(start, stop).indices(img.shape[3])
+        imgs.append((img, start, max(stop, start)))
+
+    ref = imgs[0][0]
+    if any(img.shape[:3] != ref.shape[:3] for img, _, _ in imgs):
+        raise ValueError("All images must share the same spatial dimensions.")
+
+    def _scaling(img):
+        return (img.get_data_dtype(), img.dataobj.slope, img.dataobj.inter)
+
+    raw = all(_scaling(img) == _scaling(ref) for img, _, _ in imgs)
+    hdr = ref.header.copy()
+    hdr.set_data_shape(ref.shape[:3] + (sum(stop - start for _, start, stop in imgs),))
+    if raw:
+        # Loaded headers do not keep the scaling, which is held by the data proxy
+        hdr.set_slope_inter(ref.dataobj.slope, ref.dataobj.inter)
+    else:
+        hdr.set_data_dtype("float32")
+        hdr.set_slope_inter(1.0, 0.0)
+
+    def _volumes():
+        for img, start, stop in imgs:
+            in_dtype, slope, inter = _scaling(img)
+            for buf in _raw_volumes(img, start, stop):
+                yield buf if raw else np.frombuffer(buf, dtype=in_dtype) * slope + inter
+
+    return write_volumes(_volumes(), hdr, out_file)
+
+
+def split_volumes(in_file, segments, out_files):
+    """
+    Write ranges of volumes of a 4D NIfTI file into several files, reading it once.
+
+    The input is read sequentially, one volume at a time, and each volume is
+    copied (as raw data) into all the outputs whose range contains it, so that
+    ranges may overlap.
+
+    Parameters
+    ----------
+    in_file : :obj:`os.PathLike`
+        Path of a 4D NIfTI file.
+    segments : :obj:`list` of :obj:`tuple`
+        Tuples ``(start, stop)``, selecting volumes ``start`` to ``stop``
+        (excluded, ``None`` meaning the last volume) for each output.
+    out_files : :obj:`list` of :obj:`os.PathLike`
+        Paths of the outputs, one per segment.
+
+    Returns
+    -------
+    out_files : :obj:`list` of :obj:`str`
+        Paths of the outputs.
+
+    """
+    from contextlib import ExitStack
+    import nibabel as nb
+
+    img = nb.load(in_file)
+    bounds = [slice(start, stop).indices(img.shape[3])[:2] for start, stop in segments]
+    hdr = img.header.copy()
+    # Loaded headers do not keep the scaling, which is held by the data proxy
+    hdr.set_slope_inter(img.dataobj.slope, img.dataobj.inter)
+
+    # Outputs are opened at their first volume and closed after their last one
+    opened, writers = {}, {}
+    with ExitStack() as stack:
+        for index, buf in enumerate(_raw_volumes(img, 0, img.shape[3])):
+            for i, (start, stop) in enumerate(bounds):
+                if index == start < stop:
+                    out_hdr = hdr.copy()
+                    out_hdr.set_data_shape(img.shape[:3] + (stop - start,))
+                    opened[i] = stack.enter_context(ExitStack())
+                    writers[i] = opened[i].enter_context(series_writer(out_hdr, out_files[i]))
+                if start <= index < stop:
+                    writers[i](buf)
+                if index == stop - 1:
+                    opened.pop(i).close()
+    return [str(out_file) for out_file in out_files]
+
+
+def write_volumes(volumes, header, out_file):
+    """
+    Write a 4D NIfTI file volume by volume, as the volumes are produced.
+
+    Parameters
+    ----------
+    volumes : iterable
+        The 3D volumes, either as arrays (cast to the data type of ``header``
+        and stored unscaled) or as raw bytes, which are written as they are.
+    header : :obj:`nibabel.nifti1.Nifti1Header`
+        Header of the output, with its final shape (including the number of
+        volumes) and data type.
+    out_file : :obj:`os.PathLike`
+        Path of the output, compressed if the extension is ``.nii.gz``.
+
+    Returns
+    -------
+    out_file : :obj:`str`
+        Path of the output.
+
+    """
+    with series_writer(header, out_file) as write:
+        for volume in volumes:
+            write(volume)
+    return str(out_file)
+
+
+@contextmanager
+def series_writer(header, out_file):
+    """
+    Open a 4D NIfTI file for writing, and provide a function appending volumes to it.
+
+    This allows writing several series at once, e.g., as each input volume
+    is resampled onto several targets (see :py:func:`write_volumes` for the
+    parameters).
+
+    """
+    import numpy as np
+    from nibabel.openers import ImageOpener
+
+    hdr = header.copy()
+    hdr["magic"] = hdr.single_magic
+    hdr["vox_offset"] = 0
+    out_dtype = hdr.get_data_dtype()
+
+    with ImageOpener(str(out_file), "wb") as fobj:
+        hdr.write_to(fobj)
+        fobj.write(b"\x00" * (int(hdr.get_data_offset()) - fobj.tell()))
+
+        def _write(volume):
+            if not isinstance(volume, bytes):
+                volume = np.asanyarray(volume).astype(out_dtype).tobytes(order="F")
+            fobj.write(volume)
+
+        yield _write
+
+
+def iter_volumes(in_file, dtype="float32"):
+    """
+    Iterate over the volumes of a 4D NIfTI file, reading it sequentially, once.
+
+    Unlike slicing the image's data proxy volume by volume, this does not seek
+    back to the beginning of compressed files for every volume.
+
+    Parameters
+    ----------
+    in_file : :obj:`os.PathLike`
+        Path of a 4D NIfTI file.
+    dtype : :obj:`str`
+        Data type of the scaled volumes.
+
+    Yields
+    ------
+    volume : :obj:`numpy.ndarray`
+        The next 3D volume.
+
+    """
+    import numpy as np
+    import nibabel as nb
+
+    img = nb.load(in_file)
+    in_dtype = img.get_data_dtype()
+    slope, inter = img.dataobj.slope, img.dataobj.inter
+    for buf in _raw_volumes(img, 0, img.shape[3]):
+        data = np.frombuffer(buf, dtype=in_dtype).reshape(img.shape[:3], order="F")
+        yield (data * slope + inter).astype(dtype)
+
+
+def _raw_volumes(img, start, stop):
+    """
+    Yield the on-disk bytes of volumes ``start`` to ``stop`` of a NIfTI image.
+
+    Volumes are taken along the last axis, i.e., they are the slices of 3D images.
+    """
+    import numpy as np
+    from nibabel.openers import ImageOpener
+
+    vol_bytes = int(np.prod(img.shape[:-1])) * img.get_data_dtype().itemsize
+    with ImageOpener(img.get_filename(), "rb") as src:
+        src.seek(img.dataobj.offset + start * vol_bytes)
+        for _ in range(start, stop):
+            yield src.read(vol_bytes)
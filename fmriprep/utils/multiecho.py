@@ -0,0 +1,364 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright 2021 The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Fitting the T2* decay of multi-echo BOLD series and combining their echoes."""
+import numpy as np
+
+
+def adaptive_mask(echo_means, mask=None):
+    """
+    Count the echoes with reliable signal at each voxel, as *tedana*'s ``make_adaptive_mask``.
+
+    The signal of an echo is deemed reliable where its temporal mean exceeds a
+    third of the mean of that echo at a reference voxel, whose first echo lies
+    at the 33rd percentile of the nonzero means of the first echo.
+
+    Parameters
+    ----------
+    echo_means : :obj:`numpy.ndarray`
+        Temporal mean of each echo (columns) at each voxel (rows).
+    mask : :obj:`numpy.ndarray` or None
+        Boolean mask of the voxels; if not given, voxels with at least one
+        reliable echo.
+
+    Returns
+    -------
+    mask : :obj:`numpy.ndarray`
+        Boolean mask of the voxels.
+    masksum : :obj:`numpy.ndarray`
+        Number of echoes with reliable signal at each voxel (zero outside ``mask``).
+
+    Examples
+    --------
+    >>> echo_means = np.array([[90., 60., 30.], [60., 30., 15.], [30., 8., 4.],
+    ...                        [0., 0., 0.]])
+    >>> adaptive_mask(echo_means)
+    (array([ True,  True,  True, False]), array([3, 3, 1, 0]))
+    >>> adaptive_mask(echo_means, mask=np.array([True, False, True, True]))
+    (array([ True, False,  True,  True]), array([3, 0, 1, 0]))
+
+    """
+    first_echo = np.sort(echo_means[echo_means[:, 0] != 0, 0])
+    perc = first_echo[int(np.ceil(0.33 * (first_echo.size - 1)))]
+    thresholds = echo_means[echo_means[:, 0] == perc] / 3
+    # If several voxels match, keep the one with the highest signal
+    thresholds = thresholds[thresholds.sum(axis=1).argmax()]
+    masksum = (np.abs(echo_means) > thresholds).sum(axis=-1)
+    if mask is None:
+        return masksum >= 1, masksum
+    mask = mask.astype(bool)
+    return mask, masksum * mask
+
+
+def fit_loglinear(mean_log, echo_times, n_echoes):
+    """
+    Fit the log-linear decay model in closed form, for all voxels at once.
+
+    The model ``log(|S| + 1) = log(S0) - TE / T2*`` is fit by least squares
+    to all the volumes of the first ``n_echoes`` echoes of each voxel.
+    Since the design only depends on the echo, this amounts to fitting the
+    temporal means of the log-signals, with the pseudo-inverse of the design
+    of each number of echoes.
+
+    Parameters
+    ----------
+    mean_log : :obj:`numpy.ndarray`
+        Temporal mean of ``log(|S| + 1)`` of each echo (columns) at each voxel (rows).
+    echo_times : :obj:`numpy.ndarray`
+        Echo times.
+    n_echoes : :obj:`numpy.ndarray`
+        Number of echoes fit at each voxel (at least 2).
+
+    Returns
+    -------
+    t2s : :obj:`numpy.ndarray`
+        T2* at each voxel (``inf`` for flat decays), in the units of ``echo_times``.
+    s0 : :obj:`numpy.ndarray`
+        S0 at each voxel.
+
+    Examples
+    --------
+    >>> echo_times = np.array([10., 20., 30.])
+    >>> signal = np.array([[1000.], [500.]]) * np.exp(-echo_times / np.array([[25.], [40.]]))
+    >>> t2s, s0 = fit_loglinear(np.log(signal), echo_times, np.array([3, 2]))
+    >>> t2s.round(), s0.round()
+    (array([25., 40.]), array([1000.,  500.]))
+
+    """
+    betas = np.zeros((mean_log.shape[0], 2))
+    for n in np.unique(n_echoes):
+        design = np.column_stack([np.ones(n), -np.asanyarray(echo_times[:n])])
+        rows = n_echoes == n
+        betas[rows] = mean_log[rows, :n] @ np.linalg.pinv(design).T
+    with np.errstate(divide="ignore"):
+        return 1.0 / betas[:, 1], np.exp(betas[:, 0])
+
+
+def fit_monoexponential(mean_data, echo_times, n_echoes, t2s, s0, lower, max_iter=50,
+                        tol=1e-8):
+    """
+    Refine the fit of the monoexponential decay model, for all voxels at once.
+
+    The model ``S = S0 * exp(-TE / T2*)`` is fit by (vectorized) Gauss-Newton
+    iterations with step halving, in lieu of *tedana*'s voxel-wise
+    ``curve_fit``, to all the volumes of the first ``n_echoes`` echoes of each
+    voxel (i.e., to their temporal means, as they are equally weighted).
+    ``S0`` is bounded below by ``lower``, and ``1 / T2*`` by zero.
+    Voxels whose initial estimates are not within these bounds, or whose
+    iterations fail, keep their initial estimates.
+
+    Parameters
+    ----------
+    mean_data : :obj:`numpy.ndarray`
+        Temporal mean of each echo (columns) at each voxel (rows).
+    echo_times : :obj:`numpy.ndarray`
+        Echo times.
+    n_echoes : :obj:`numpy.ndarray`
+        Number of echoes fit at each voxel.
+    t2s, s0 : :obj:`numpy.ndarray`
+        Initial estimates (e.g., from :py:func:`fit_loglinear`).
+    lower : :obj:`numpy.ndarray`
+        Lower bound of ``S0`` at each voxel.
+    max_iter : :obj:`int`
+        Maximum number of iterations.
+    tol : :obj:`float`
+        Relative change of the parameters at which iterations stop.
+
+    Returns
+    -------
+    t2s : :obj:`numpy.ndarray`
+        T2* at each voxel.
+    s0 : :obj:`numpy.ndarray`
+        S0 at each voxel.
+
+    Examples
+    --------
+    >>> echo_times = np.array([10., 20., 30., 40.])
+    >>> mean_data = 1000 * np.exp(-echo_times / 25.)[np.newaxis] + [[0., 3., -3., 1.]]
+    >>> t2s, s0 = fit_loglinear(np.log(mean_data + 1), echo_times, np.array([4]))
+    >>> t2s, s0 = fit_monoexponential(mean_data, echo_times, np.array([4]), t2s, s0,
+    ...                               lower=mean_data.min(axis=1))
+    >>> from scipy.optimize import curve_fit
+    >>> popt, _ = curve_fit(lambda te, s0, t2s: s0 * np.exp(-te / t2s), echo_times,
+    ...                     mean_data[0], p0=(s0[0], t2s[0]))
+    >>> np.allclose([s0[0], t2s[0]], popt)
+    True
+
+    """
+    tes = np.asanyarray(echo_times, dtype=float)[np.newaxis]
+    with np.errstate(divide="ignore"):
+        rate = 1.0 / t2s
+    lower = np.broadcast_to(lower, s0.shape)
+    rows = np.flatnonzero(
+        np.isfinite(rate) & (rate >= 0) & np.isfinite(s0) & (s0 >= lower)
+    )
+    data = mean_data[rows]
+    weights = (np.arange(data.shape[1]) < n_echoes[rows, np.newaxis]).astype(float)
+    amplitude, rate, lower = s0[rows].astype(float), rate[rows], lower[rows]
+
+    def _cost(amplitude, rate):
+        model = amplitude[:, np.newaxis] * np.exp(-tes * rate[:, np.newaxis])
+        return (weights * (data - model) ** 2).sum(axis=1)
+
+    cost = _cost(amplitude, rate)
+    # Voxels stop iterating as they converge, so that results do not depend on their batch
+    converged = np.zeros(rows.size, dtype=bool)
+    for _ in range(max_iter):
+        decay = np.exp(-tes * rate[:, np.newaxis])
+        residuals = weights * (data - amplitude[:, np.newaxis] * decay)
+        jac_a = weights * decay
+        jac_r = -weights * tes * amplitude[:, np.newaxis] * decay
+        # Solve the 2 x 2 normal equations of all voxels at once
+        h_aa, h_ar, h_rr = (jac_a ** 2).sum(1), (jac_a * jac_r).sum(1), (jac_r ** 2).sum(1)
+        g_a, g_r = (jac_a * residuals).sum(1), (jac_r * residuals).sum(1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            det = h_aa * h_rr - h_ar ** 2
+            delta_a = (h_rr * g_a - h_ar * g_r) / det
+            delta_r = (h_aa * g_r - h_ar * g_a) / det
+        pending = np.isfinite(delta_a) & np.isfinite(delta_r) & ~converged
+
+        # Halve the steps that do not decrease the cost (projected onto the bounds)
+        new_amplitude, new_rate, new_cost = amplitude.copy(), rate.copy(), cost.copy()
+        step = 1.0
+        for _ in range(16):
+            if not pending.any():
+                break
+            trial_a = np.maximum(amplitude + step * delta_a, lower)
+            trial_r = np.maximum(rate + step * delta_r, 0.0)
+            trial_cost = _cost(trial_a, trial_r)
+            accept = pending & (trial_cost <= cost)
+            new_amplitude[accept] = trial_a[accept]
+            new_rate[accept] = trial_r[accept]
+            new_cost[accept] = trial_cost[accept]
+            pending &= ~accept
+            step /= 2
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.maximum(
+                np.abs(new_amplitude - amplitude) / np.abs(amplitude),
+                np.abs(new_rate - rate) / np.abs(rate),
+            )
+        amplitude, rate, cost = new_amplitude, new_rate, new_cost
+        converged |= ~(change > tol)
+        if converged.all():
+            break
+
+    t2s, s0 = t2s.copy(), s0.copy()
+    with np.errstate(divide="ignore"):
+        t2s[rows] = 1.0 / rate
+    s0[rows] = amplitude
+    return t2s, s0
+
+
+def t2smap(in_files, echo_times, mask_file=None, fittype="curvefit", num_threads=1,
+           chunk_size=2 ** 16, newpath=None):
+    """
+    Estimate T2* and S0 maps, and optimally combine the echoes of a multi-echo series.
+
+    This is an in-process replacement of *tedana*'s ``t2smap`` workflow, which
+    loads all echoes in memory.
+    Here, the echoes are streamed twice, one volume at a time: first to
+    accumulate the temporal means of the signals (and of their logarithms),
+    from which the decay is fit (see :py:func:`fit_loglinear` and
+    :py:func:`fit_monoexponential`) over chunks of voxels in a thread pool;
+    then to write the optimally combined series volume by volume.
+    As in *tedana*, each voxel is fit with the echoes with reliable signal
+    (see :py:func:`adaptive_mask`), but at least two, and combined with the
+    reliable echoes only, weighted by ``TE * exp(-TE / T2*)``.
+
+    Parameters
+    ----------
+    in_files : :obj:`list` of :obj:`str`
+        The echoes, sorted by echo time.
+    echo_times : :obj:`list` of :obj:`float`
+        Echo times (in seconds).
+    mask_file : :obj:`str` or None
+        Brain mask; if not given, voxels with at least one reliable echo.
+    fittype : :obj:`str`
+        ``"loglin"`` or ``"curvefit"`` (the log-linear fit, refined with the
+        monoexponential model).
+    num_threads : :obj:`int`
+        Number of chunks of voxels fit in parallel.
+    chunk_size : :obj:`int`
+        Number of voxels fit at a time.
+    newpath : :obj:`str`
+        Directory where outputs are written (default: current directory).
+
+    Returns
+    -------
+    out_files : :obj:`dict`
+        Paths to the T2* map (in ms, as *tedana*'s), the S0 map and the
+        optimally combined series.
+
+    """
+    from pathlib import Path
+    import nibabel as nb
+    from .images import iter_volumes, series_writer
+
+    newpath = Path(newpath or ".").absolute()
+    tes = 1000 * np.asanyarray(echo_times, dtype=float)
+    ref = nb.load(in_files[0])
+    shape, n_vols = ref.shape[:3], ref.shape[3]
+    for fname in in_files[1:]:
+        if nb.load(fname).shape != ref.shape:
+            raise ValueError(f"<{fname}> does not match the shape of <{in_files[0]}>.")
+
+    # Accumulate the temporal statistics of each echo, reading it once
+    n_echoes = len(in_files)
+    mean_data = np.zeros((int(np.prod(shape)), n_echoes))
+    mean_log = np.zeros_like(mean_data)
+    minimum = np.full_like(mean_data, np.inf)
+    for echo, fname in enumerate(in_files):
+        for volume in iter_volumes(fname):
+            volume = volume.reshape(-1)
+            mean_data[:, echo] += volume
+            mean_log[:, echo] += np.log(np.abs(volume) + 1)
+            np.minimum(minimum[:, echo], volume, out=minimum[:, echo])
+    mean_data /= n_vols
+    mean_log /= n_vols
+
+    mask = None
+    if mask_file is not None:
+        mask = np.asanyarray(nb.load(mask_file).dataobj).reshape(-1) != 0
+    mask, masksum = adaptive_mask(mean_data, mask=mask)
+
+    def _fit(rows):
+        n_fit = np.maximum(masksum[rows], 2)
+        t2s, s0 = fit_loglinear(mean_log[rows], tes, n_fit)
+        if fittype == "curvefit":
+            lower = np.where(
+                np.arange(n_echoes) < n_fit[:, np.newaxis], minimum[rows], np.inf
+            ).min(axis=1)
+            t2s, s0 = fit_monoexponential(mean_data[rows], tes, n_fit, t2s, s0, lower)
+        return t2s, s0
+
+    voxels = np.flatnonzero(mask)
+    chunks = [voxels[start:start + chunk_size] for start in range(0, voxels.size, chunk_size)]
+    if num_threads > 1 and len(chunks) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=num_threads) as pool:
+            fits = list(pool.map(_fit, chunks))
+    else:
+        fits = [_fit(rows) for rows in chunks]
+
+    t2s_full, s0_full = np.zeros(mean_data.shape[0]), np.zeros(mean_data.shape[0])
+    for rows, (t2s, s0) in zip(chunks, fits):
+        # Voxels without reliable echoes are not fit
+        fitted = masksum[rows] > 0
+        t2s_full[rows] = np.where(fitted, t2s, 0.0)
+        s0_full[rows] = np.where(fitted, s0, 0.0)
+    t2s_full[mask & np.isinf(t2s_full)] = 500.0
+    t2s_full[mask & (t2s_full <= 0)] = 1.0
+    s0_full[np.isnan(s0_full)] = 0.0
+    # Values 10 times higher than the 99.5th percentile are reset to the 99.5th percentile
+    cap_t2s = np.sort(t2s_full)[int(np.floor(0.995 * (t2s_full.size - 1)))]
+    t2s_full[t2s_full > cap_t2s * 10] = cap_t2s
+
+    # Weights of the optimal combination, for the reliable echoes only
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        weights = tes * np.exp(-tes / t2s_full[:, np.newaxis])
+        weights[np.arange(n_echoes) >= masksum[:, np.newaxis]] = 0.0
+        weights = np.nan_to_num(weights / weights.sum(axis=1, keepdims=True))
+    weights = weights.astype("float32")
+    t2s_full = np.clip(np.nan_to_num(t2s_full), 0, None)
+    s0_full = np.clip(np.nan_to_num(s0_full), 0, None)
+
+    hdr = ref.header.copy()
+    hdr.set_data_dtype("float32")
+    hdr.set_slope_inter(1.0, 0.0)
+    out_files = {
+        "t2star_map": str(newpath / "T2starmap.nii.gz"),
+        "s0_map": str(newpath / "S0map.nii.gz"),
+        "optimal_comb": str(newpath / "desc-optcom_bold.nii"),
+    }
+    for key, data in (("t2star_map", t2s_full), ("s0_map", s0_full)):
+        nb.Nifti1Image(data.reshape(shape).astype("float32"), ref.affine, hdr).to_filename(
+            out_files[key]
+        )
+    with series_writer(hdr, out_files["optimal_comb"]) as write:
+        for volumes in zip(*(iter_volumes(fname) for fname in in_files)):
+            combined = sum(
+                weights[:, echo] * volume.reshape(-1) for echo, volume in enumerate(volumes)
+            )
+            write(combined.reshape(shape))
+    return out_files
@@ -0,0 +1,398 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright 2021 The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Sparse operators sampling volumes onto surfaces, and mapping between surfaces."""
+
+
+def vertex_normals(vertices, faces):
+    """
+    Calculate the unit normals of the vertices of a triangulated surface.
+
+    As in FreeSurfer, the normal of a vertex is the (area-weighted) average of
+    the normals of the faces it belongs to, and normals point outwards for
+    FreeSurfer surfaces.
+
+    >>> import numpy as np
+    >>> vertices = np.array([[0., 0., 0.], [1., 0., 0.], [0., 1., 0.]])
+    >>> vertex_normals(vertices, np.array([[0, 1, 2]]))
+    array([[0., 0., 1.],
+           [0., 0., 1.],
+           [0., 0., 1.]])
+
+    """
+    import numpy as np
+
+    triangles = vertices[faces]
+    face_normals = np.cross(triangles[:, 1] - triangles[:, 0],
+                            triangles[:, 2] - triangles[:, 0])
+    normals = np.zeros_like(vertices, dtype=float)
+    for i in range(3):
+        np.add.at(normals, faces[:, i], face_normals)
+    norms = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(norms > 0, norms, 1.0)
+
+
+def trilinear_matrix(coords, shape):
+    """
+    Build the sparse matrix sampling a volume with trilinear interpolation.
+
+    Multiplying the matrix by a volume flattened in Fortran order gives the
+    same samples as :py:func:`~fmriprep.utils.transforms.linear_interpolation`:
+    samples falling outside the volume are zero, and the volume is extended
+    beyond its borders by repeating the edge voxels.
+
+    Parameters
+    ----------
+    coords : :obj:`numpy.ndarray`
+        Array of shape (3, M) with the voxel coordinates of the M samples.
+    shape : :obj:`tuple`
+        Shape of the sampled volume.
+
+    Returns
+    -------
+    matrix : :obj:`scipy.sparse.csr_matrix`
+        Matrix of shape (M, number of voxels).
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from fmriprep.utils.transforms import linear_interpolation
+    >>> data = np.arange(27, dtype=float).reshape((3, 3, 3))
+    >>> coords = np.array([[0.5, 1.0, 3.0, -0.2], [1.0, 1.5, 0.0, 2.1], [1.0, 0.0, 0.0, 0.3]])
+    >>> samples = trilinear_matrix(coords, data.shape) @ data.ravel(order="F")
+    >>> np.allclose(samples, linear_interpolation(data, coords))
+    True
+
+    """
+    from itertools import product
+    import numpy as np
+    from scipy import sparse
+
+    coords = np.asanyarray(coords, dtype=float)
+    size = np.array(shape[:3])[:, np.newaxis]
+    inside = np.all((coords >= -0.5) & (coords < size - 0.5), axis=0)
+    rows = np.flatnonzero(inside)
+    coords = coords[:, inside]
+
+    base = np.floor(coords).astype(int)
+    frac = coords - base
+    strides = np.array([1, shape[0], shape[0] * shape[1]])[:, np.newaxis]
+    cols, weights = [], []
+    for corner in product((0, 1), repeat=3):
+        corner = np.array(corner)[:, np.newaxis]
+        index = np.clip(base + corner, 0, size - 1)
+        cols.append((index * strides).sum(axis=0))
+        weights.append(np.prod(np.where(corner, frac, 1.0 - frac), axis=0))
+
+    return sparse.csr_matrix(
+        (np.concatenate(weights).astype("float32"), (np.tile(rows, 8), np.concatenate(cols))),
+        shape=(inside.size, int(np.prod(shape[:3]))),
+    )
+
+
+def projection_matrix(white, faces, thickness, shape, ras2vox, fractions=None):
+    """
+    Build the sparse matrix averaging a volume across the cortical ribbon.
+
+    This reproduces ``mri_vol2surf --projfrac-avg 0 1 0.2 --interp trilinear``:
+    each vertex of the white surface is projected along its normal by the given
+    fractions of the cortical thickness, the volume is sampled at each point
+    and the samples are averaged.
+
+    Parameters
+    ----------
+    white : :obj:`numpy.ndarray`
+        Coordinates of the vertices of the white surface, of shape (N, 3).
+    faces : :obj:`numpy.ndarray`
+        Triangles of the surface.
+    thickness : :obj:`numpy.ndarray`
+        Cortical thickness at each vertex.
+    shape : :obj:`tuple`
+        Shape of the sampled volume.
+    ras2vox : :obj:`numpy.ndarray`
+        Affine matrix mapping surface coordinates onto voxel coordinates.
+    fractions : :obj:`list`, optional
+        Fractions of the thickness sampled (six points, 20% apart, by default).
+
+    Returns
+    -------
+    matrix : :obj:`scipy.sparse.csr_matrix`
+        Matrix of shape (N, number of voxels).
+
+    """
+    import numpy as np
+
+    if fractions is None:
+        fractions = np.linspace(0.0, 1.0, 6)
+
+    normals = vertex_normals(white, faces) * thickness[:, np.newaxis]
+    matrix = None
+    for fraction in fractions:
+        points = white + fraction * normals
+        coords = ras2vox[:3, :3] @ points.T + ras2vox[:3, 3:]
+        sampler = trilinear_matrix(coords, shape)
+        matrix = sampler if matrix is None else matrix + sampler
+    return matrix / len(fractions)
+
+
+def nearest_neighbor_matrix(source, target):
+    """
+    Build the sparse matrix mapping values between two registered spheres.
+
+    This reproduces FreeSurfer's forward-and-reverse nearest-neighbor mapping
+    (``nnfr``): each target vertex averages its nearest source vertex and all
+    source vertices whose nearest target vertex it is.
+
+    Parameters
+    ----------
+    source : :obj:`numpy.ndarray`
+        Coordinates of the vertices of the source sphere, of shape (N, 3).
+    target : :obj:`numpy.ndarray`
+        Coordinates of the vertices of the target sphere, of shape (M, 3).
+
+    Returns
+    -------
+    matrix : :obj:`scipy.sparse.csr_matrix`
+        Matrix of shape (M, N).
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> source = np.array([[1., 0., 0.], [0., 1., 0.], [0., 0., 1.], [0.9, 0.1, 0.]])
+    >>> target = np.array([[1., 0., 0.], [0., 0.8, 0.6]])
+    >>> nearest_neighbor_matrix(source, target).toarray()
+    array([[0.5, 0. , 0. , 0.5],
+           [0. , 0.5, 0.5, 0. ]], dtype=float32)
+
+    """
+    import numpy as np
+    from scipy import sparse
+    from scipy.spatial import cKDTree
+
+    forward = cKDTree(source).query(target)[1]
+    reverse = cKDTree(target).query(source)[1]
+    rows = np.concatenate((np.arange(len(target)), reverse))
+    cols = np.concatenate((forward, np.arange(len(source))))
+    matrix = sparse.csr_matrix(
+        (np.ones(rows.size, dtype="float32"), (rows, cols)), shape=(len(target), len(source))
+    )
+    # Count source vertices only once if they are both forward and reverse neighbors
+    matrix.data[:] = 1.0
+    return sparse.diags(1.0 / np.asarray(matrix.sum(axis=1)).ravel()).astype("float32") @ matrix
+
+
+def vol2surf_matrix(subjects_dir, subject_id, target_subject, hemi, shape, ras2vox):
+    """
+    Build the sparse matrix sampling a volume onto a FreeSurfer surface.
+
+    This reproduces ``mri_vol2surf`` as run by *fMRIPrep* (averaging six points
+    across the cortical ribbon, with trilinear interpolation, restricted to the
+    cortex label of the subject), including the mapping onto the surface of
+    another subject (e.g., ``fsaverage5``) through the registered spheres.
+
+    Parameters
+    ----------
+    subjects_dir : :obj:`os.PathLike`
+        FreeSurfer's ``SUBJECTS_DIR``.
+    subject_id : :obj:`str`
+        The subject whose cortical ribbon is sampled.
+    target_subject : :obj:`str`
+        The subject whose surface the samples are mapped onto.
+    hemi : :obj:`str`
+        Hemisphere (``lh`` or ``rh``).
+    shape : :obj:`tuple`
+        Shape of the sampled volume.
+    ras2vox : :obj:`numpy.ndarray`
+        Affine matrix mapping the subject's surface (``tkr``) coordinates onto
+        voxel coordinates.
+
+    Returns
+    -------
+    matrix : :obj:`scipy.sparse.csr_matrix`
+        Matrix of shape (number of target vertices, number of voxels).
+
+    """
+    from pathlib import Path
+    import numpy as np
+    import nibabel as nb
+    from scipy import sparse
+
+    subject_dir = Path(subjects_dir) / subject_id
+    white, faces = nb.freesurfer.read_geometry(str(subject_dir / "surf" / f"{hemi}.white"))
+    thickness = nb.freesurfer.read_morph_data(str(subject_dir / "surf" / f"{hemi}.thickness"))
+    matrix = projection_matrix(white, faces, thickness, shape, ras2vox)
+
+    # Vertices out of the cortex label are zeroed before mapping
+    cortex = np.zeros(len(white), dtype="float32")
+    cortex[nb.freesurfer.read_label(str(subject_dir / "label" / f"{hemi}.cortex.label"))] = 1
+    matrix = sparse.diags(cortex) @ matrix
+
+    if target_subject != subject_id:
+        source = nb.freesurfer.read_geometry(str(subject_dir / "surf" / f"{hemi}.sphere.reg"))[0]
+        target = nb.freesurfer.read_geometry(
+            str(Path(subjects_dir) / target_subject / "surf" / f"{hemi}.sphere.reg")
+        )[0]
+        matrix = nearest_neighbor_matrix(source, target) @ matrix
+    return matrix.tocsr().astype("float32")
+
+
+def barycentric_matrix(vertices, faces, points, chunk_size=2 ** 13):
+    """
+    Build the sparse matrix interpolating values of a sphere's vertices at other points.
+
+    Each point is projected, through the center of the sphere, onto the triangle
+    containing it, and takes the barycentric average of the values at the corners
+    of that triangle (Workbench's ``BARYCENTRIC`` method).
+
+    Parameters
+    ----------
+    vertices : :obj:`numpy.ndarray`
+        Coordinates of the vertices of the sphere, of shape (N, 3).
+    faces : :obj:`numpy.ndarray`
+        Triangles of the sphere.
+    points : :obj:`numpy.ndarray`
+        Coordinates of the points, of shape (M, 3).
+    chunk_size : :obj:`int`
+        Number of points processed at once, to limit memory usage.
+
+    Returns
+    -------
+    matrix : :obj:`scipy.sparse.csr_matrix`
+        Matrix of shape (M, N).
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> vertices = np.array([[1., 0., 0.], [0., 1., 0.], [0., 0., 1.], [-1., 0., 0.]])
+    >>> faces = np.array([[0, 1, 2], [1, 3, 2]])
+    >>> points = np.array([[1., 1., 2.], [0., 0., 1.], [-1., 1., 0.]])
+    >>> barycentric_matrix(vertices, faces, points).toarray()
+    array([[0.25, 0.25, 0.5 , 0.  ],
+           [0.  , 0.  , 1.  , 0.  ],
+           [0.  , 0.5 , 0.  , 0.5 ]], dtype=float32)
+
+    """
+    import numpy as np
+    from scipy import sparse
+    from scipy.spatial import cKDTree
+
+    vertices = np.asanyarray(vertices, dtype=float)
+    points = np.asanyarray(points, dtype=float)
+
+    # Triangles around each vertex, padded with -1
+    corners = faces.ravel()
+    order = np.argsort(corners, kind="stable")
+    counts = np.bincount(corners, minlength=len(vertices))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ranks = np.arange(corners.size) - np.repeat(starts, counts)
+    around = np.full((len(vertices), max(counts.max(), 1)), -1)
+    around[corners[order], ranks] = order // 3
+
+    # Candidate triangles are those around the nearest vertices
+    nearest = cKDTree(vertices).query(points, k=min(3, len(vertices)))[1]
+    nearest = nearest.reshape((len(points), -1))
+
+    cols = np.empty((len(points), 3), dtype=int)
+    weights = np.empty((len(points), 3))
+    for start in range(0, len(points), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        candidates = around[nearest[chunk]].reshape((nearest[chunk].shape[0], -1))
+        triangles = vertices[faces[candidates]]
+        # Solve for the weights of the corners whose combination is collinear to the point
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bary = np.linalg.solve(
+                np.swapaxes(triangles, -1, -2),
+                np.broadcast_to(points[chunk, np.newaxis, :, np.newaxis],
+                                triangles.shape[:2] + (3, 1)),
+            )[..., 0]
+            bary /= bary.sum(axis=-1, keepdims=True)
+        score = np.where((candidates >= 0) & np.all(np.isfinite(bary), axis=-1),
+                         bary.min(axis=-1), -np.inf)
+        best = np.argmax(score, axis=1)
+        index = np.arange(len(best))
+        cols[chunk] = faces[candidates[index, best]]
+        weights[chunk] = np.clip(bary[index, best], 0.0, None)
+
+    weights /= weights.sum(axis=1, keepdims=True)
+    matrix = sparse.csr_matrix(
+        (weights.ravel().astype("float32"), (np.repeat(np.arange(len(points)), 3), cols.ravel())),
+        shape=(len(points), len(vertices)),
+    )
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def adap_bary_area_matrix(current_sphere, new_sphere, current_area, new_area):
+    """
+    Build the sparse matrix resampling values between spheres with Workbench's ``ADAP_BARY_AREA``.
+
+    As in ``wb_command -metric-resample``, each new vertex gathers the
+    barycentric weights of its position on the current sphere, unless some
+    current vertices map onto it without being among those (i.e., the new
+    sphere is coarser there), in which case the (reverse) barycentric weights
+    of those current vertices are used.
+    Weights are then corrected by the vertex areas of both surfaces, and
+    normalized.
+
+    Parameters
+    ----------
+    current_sphere : :obj:`tuple`
+        Vertices and triangles of the sphere of the input values.
+    new_sphere : :obj:`tuple`
+        Vertices and triangles of the sphere resampled onto.
+    current_area : :obj:`numpy.ndarray`
+        Vertex areas of the input surface.
+    new_area : :obj:`numpy.ndarray`
+        Vertex areas of the output surface.
+
+    Returns
+    -------
+    matrix : :obj:`scipy.sparse.csr_matrix`
+        Matrix of shape (new vertices, current vertices).
+
+    """
+    import numpy as np
+    from scipy import sparse
+
+    forward = barycentric_matrix(*current_sphere, new_sphere[0])
+    reverse = barycentric_matrix(*new_sphere, current_sphere[0]).T.tocsr()
+
+    def _support(matrix):
+        support = matrix.copy()
+        support.data[:] = 1.0
+        return support
+
+    # Reverse neighbors not used by forward weights call for the reverse weights
+    reverse_only = _support(reverse) - _support(reverse).multiply(_support(forward))
+    use_reverse = np.asarray(reverse_only.sum(axis=1)).ravel() > 0
+    weights = (sparse.diags((~use_reverse).astype("float32")) @ forward
+               + sparse.diags(use_reverse.astype("float32")) @ reverse)
+
+    weights = sparse.diags(np.asarray(new_area, dtype="float32")) @ weights
+    scatter = np.asarray(weights.sum(axis=0)).ravel()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = weights @ sparse.diags(
+            np.where(scatter > 0, current_area / scatter, 0.0).astype("float32")
+        )
+        gather = np.asarray(weights.sum(axis=1)).ravel()
+        weights = sparse.diags(np.where(gather > 0, 1.0 / gather, 0.0).astype("float32")) @ weights
+    return weights.tocsr()
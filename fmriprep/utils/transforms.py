@@ -0,0 +1,744 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright 2021 The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Utilities for handling transforms and resampling in-process."""
+
+
+def load_affine(xfm_file, fmt="itk"):
+    """
+    Load a linear transform as a 4x4 RAS matrix.
+
+    The matrix maps physical coordinates of the reference (i.e., the target
+    grid of resamplings) onto the moving image, following the conventions
+    of ANTs' ``antsApplyTransforms`` and *NiTransforms*.
+
+    """
+    from nitransforms.linear import Affine
+
+    return Affine.from_filename(str(xfm_file), fmt=fmt).matrix
+
+
+def fsl_to_ras(matrices, reference, moving):
+    """
+    Convert FSL matrices (e.g., those of MCFLIRT) into RAS matrices, all at once.
+
+    FSL matrices map the scaled-voxel coordinates of the moving image onto
+    those of the reference (with the first axis flipped for images in
+    neurological orientation).
+    The RAS matrices follow the conventions of :py:func:`load_affine`, and are
+    those *NiTransforms* (or ``c3d_affine_tool -fsl2ras``) would calculate for
+    each matrix in turn.
+
+    Parameters
+    ----------
+    matrices : :obj:`numpy.ndarray`
+        Array of shape (N, 4, 4) of FSL matrices.
+    reference : :obj:`nibabel.spatialimages.SpatialImage`
+        The reference image of the FSL matrices.
+    moving : :obj:`nibabel.spatialimages.SpatialImage`
+        The moving image of the FSL matrices.
+
+    Returns
+    -------
+    matrices : :obj:`numpy.ndarray`
+        Array of shape (N, 4, 4) of RAS matrices.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> import nibabel as nb
+    >>> img = nb.Nifti1Image(np.zeros((10, 10, 10), dtype="uint8"), np.diag([-2, 2, 2, 1]))
+    >>> shift = np.eye(4)
+    >>> shift[0, 3] = 4.0
+    >>> fsl_to_ras(shift[np.newaxis], img, img)[0, :3, 3].tolist()
+    [4.0, 0.0, 0.0]
+
+    """
+    import numpy as np
+    from nibabel.affines import voxel_sizes
+
+    def _ras2fsl(img):
+        zooms = voxel_sizes(img.affine)
+        vox2fsl = np.diag(list(zooms) + [1.0])
+        if np.linalg.det(img.affine) > 0:
+            vox2fsl[0, 0] = -zooms[0]
+            vox2fsl[0, 3] = (img.shape[0] - 1) * zooms[0]
+        return vox2fsl @ np.linalg.inv(img.affine)
+
+    return (
+        np.linalg.inv(_ras2fsl(moving))
+        @ np.linalg.inv(np.asanyarray(matrices, dtype="float64"))
+        @ _ras2fsl(reference)
+    )
+
+
+def vox2vox(matrix, reference_affine, moving_affine):
+    """
+    Compose a RAS-to-RAS transform with the grids of the reference and moving images.
+
+    >>> import numpy as np
+    >>> vox2vox(np.eye(4), np.diag([2.0, 2.0, 2.0, 1.0]), np.eye(4))[:3, :3].diagonal()
+    array([2., 2., 2.])
+
+    """
+    import numpy as np
+
+    return np.linalg.inv(moving_affine) @ matrix @ reference_affine
+
+
+def gaussian_interpolation(data, coords, sigma=1.0, alpha=1.0):
+    """
+    Sample a volume at continuous voxel coordinates with Gaussian interpolation.
+
+    This function reproduces ITK's ``GaussianInterpolateImageFunction``, which
+    is behind ANTs' ``Gaussian`` interpolation: each voxel is weighted by the
+    integral of a Gaussian kernel of width ``sigma`` over the voxel's extent,
+    within ``alpha * sigma`` of the sampling location.
+    Samples falling outside the input volume are set to zero.
+
+    Parameters
+    ----------
+    data : :obj:`numpy.ndarray`
+        A 3D volume, or several of them stacked along a fourth axis, which
+        are then all sampled at once.
+    coords : :obj:`numpy.ndarray`
+        Array of shape (3, M) with the voxel coordinates (in ``data``'s grid)
+        of the M samples.
+    sigma : :obj:`float`
+        Width of the kernel, in voxels (ANTs' default is one voxel).
+    alpha : :obj:`float`
+        Cutoff distance of the kernel, in multiples of ``sigma``.
+
+    Returns
+    -------
+    samples : :obj:`numpy.ndarray`
+        Array of shape (M,) or (M, N), with N the number of volumes.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> data = np.zeros((5, 5, 5))
+    >>> data[2:] = 1.0
+    >>> samples = gaussian_interpolation(data, np.array([[0.0, 2.0, 4.0, 5.0],
+    ...                                                  [2.0, 2.0, 2.0, 2.0],
+    ...                                                  [2.0, 2.0, 2.0, 2.0]]))
+    >>> samples.round(4).tolist()
+    [0.0, 0.721, 1.0, 0.0]
+
+    """
+    import numpy as np
+
+    data = np.asanyarray(data)
+    squeeze = data.ndim == 3
+    if squeeze:
+        data = data[..., np.newaxis]
+
+    shape = np.array(data.shape[:3])
+    coords = np.asanyarray(coords, dtype=float)
+    samples = np.zeros((coords.shape[1], data.shape[-1]))
+    inside = np.all((coords >= -0.5) & (coords < shape[:, np.newaxis] - 0.5), axis=0)
+    coords = coords[:, inside]
+
+    index, weights = _gaussian_weights(coords, shape, sigma, alpha)
+    width = len(index)
+
+    values = np.zeros((coords.shape[1], data.shape[-1]))
+    total = np.zeros(coords.shape[1])
+    for i in range(width):
+        for j in range(width):
+            wij = weights[i, 0] * weights[j, 1]
+            for k in range(width):
+                w = wij * weights[k, 2]
+                values += w[:, np.newaxis] * data[index[i, 0], index[j, 1], index[k, 2]]
+                total += w
+
+    samples[inside] = values / total[:, np.newaxis]
+    return samples[:, 0] if squeeze else samples
+
+
+def multilabel_interpolation(data, coords, sigma=1.0, alpha=4.0, chunk_size=2 ** 12):
+    """
+    Sample a label volume at continuous voxel coordinates, by Gaussian-weighted voting.
+
+    This function reproduces ITK's ``LabelImageGaussianInterpolateImageFunction``,
+    which is behind ANTs' ``MultiLabel`` interpolation (whose defaults are a
+    ``sigma`` of one voxel and ``alpha = 4``): each voxel within
+    ``alpha * sigma`` of the sampling location votes for its label, with the
+    weight it would have in :py:func:`gaussian_interpolation`, and the label
+    with the largest total weight is picked (the lowest one, in case of ties).
+    Samples whose whole neighborhood holds a single label are given that label
+    directly, so that only those near the boundaries between labels are voted.
+    Samples falling outside the input volume are set to zero.
+
+    Parameters
+    ----------
+    data : :obj:`numpy.ndarray`
+        A 3D label volume, or several of them stacked along a fourth axis,
+        which are then all sampled at once.
+    coords : :obj:`numpy.ndarray`
+        Array of shape (3, M) with the voxel coordinates (in ``data``'s grid)
+        of the M samples.
+    sigma : :obj:`float`
+        Width of the kernel, in voxels.
+    alpha : :obj:`float`
+        Cutoff distance of the kernel, in multiples of ``sigma``.
+    chunk_size : :obj:`int`
+        Maximum number of samples voted at once, bounding memory usage.
+
+    Returns
+    -------
+    samples : :obj:`numpy.ndarray`
+        Array of shape (M,) or (M, N), with N the number of volumes, and the
+        data type of ``data``.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> data = np.zeros((9, 9, 9), dtype="uint8")
+    >>> data[4:] = 3
+    >>> data[4:, 4:] = 2
+    >>> samples = multilabel_interpolation(data, np.array([[0.0, 3.4, 4.4, 4.4, 9.0],
+    ...                                                    [0.0, 3.0, 3.0, 3.6, 0.0],
+    ...                                                    [0.0, 4.0, 4.0, 4.0, 0.0]]))
+    >>> samples.tolist()
+    [0, 0, 3, 2, 0]
+
+    """
+    import numpy as np
+    from scipy import ndimage
+
+    data = np.asanyarray(data)
+    squeeze = data.ndim == 3
+    if squeeze:
+        data = data[..., np.newaxis]
+
+    shape = np.array(data.shape[:3])
+    coords = np.asanyarray(coords, dtype=float)
+    samples = np.zeros((coords.shape[1], data.shape[-1]), dtype=data.dtype)
+    inside = np.all((coords >= -0.5) & (coords < shape[:, np.newaxis] - 0.5), axis=0)
+    coords = coords[:, inside]
+    nearest = tuple(np.minimum(np.floor(coords + 0.5).astype(int), shape[:, np.newaxis] - 1))
+
+    # The kernel support lies within this distance of the nearest voxel
+    size = 2 * int(np.ceil(sigma * alpha)) + 1
+    values = np.zeros((coords.shape[1], data.shape[-1]), dtype=data.dtype)
+    vote = np.zeros(coords.shape[1], dtype=bool)
+    labels, volumes = [], []
+    for n in range(data.shape[-1]):
+        volume = data[..., n]
+        values[:, n] = volume[nearest]
+        vote |= (ndimage.minimum_filter(volume, size, mode="nearest")
+                 != ndimage.maximum_filter(volume, size, mode="nearest"))[nearest]
+        # Votes are counted on the indices of the labels present in the volume
+        unique, inverse = np.unique(volume, return_inverse=True)
+        labels.append(unique)
+        volumes.append(inverse.astype("int32").ravel())
+
+    strides = np.array([shape[1] * shape[2], shape[2], 1])[np.newaxis, :, np.newaxis]
+    vote = np.nonzero(vote)[0]
+    for start in range(0, vote.size, chunk_size):
+        chunk = vote[start:start + chunk_size]
+        index, weights = _gaussian_weights(coords[:, chunk], shape, sigma, alpha)
+        index = index * strides
+        index = (index[:, np.newaxis, np.newaxis, 0]
+                 + index[np.newaxis, :, np.newaxis, 1]
+                 + index[np.newaxis, np.newaxis, :, 2]).ravel()
+        weights = weights.astype("float32")
+        weights = (weights[:, np.newaxis, np.newaxis, 0]
+                   * weights[np.newaxis, :, np.newaxis, 1]
+                   * weights[np.newaxis, np.newaxis, :, 2]).ravel()
+        points = np.tile(np.arange(chunk.size), index.size // chunk.size)
+        for n, (unique, volume) in enumerate(zip(labels, volumes)):
+            votes = points * unique.size + volume[index]
+            totals = np.bincount(votes, weights=weights, minlength=chunk.size * unique.size)
+            values[chunk, n] = unique[totals.reshape(chunk.size, -1).argmax(axis=1)]
+
+    samples[inside] = values
+    return samples[:, 0] if squeeze else samples
+
+
+def _gaussian_weights(coords, shape, sigma, alpha):
+    """
+    Calculate the separable weights of the Gaussian kernel at each sampling location.
+
+    Returns arrays of shape (W, 3, M), with the indices of the voxels along
+    each axis of the kernel's support, and their weights (zero past the
+    support or the edges of the volume).
+
+    """
+    import numpy as np
+    from scipy.special import erf
+
+    scale = 1.0 / (np.sqrt(2.0) * sigma)
+    cutoff = sigma * alpha
+    begin = np.maximum(np.floor(coords + 0.5 - cutoff), 0).astype(int)
+    end = np.minimum(np.ceil(coords + 0.5 + cutoff), shape[:, np.newaxis]).astype(int)
+    width = int(np.ceil(2 * cutoff)) + 2
+
+    # Separable weights, one row per position in the kernel support
+    index = begin[np.newaxis] + np.arange(width)[:, np.newaxis, np.newaxis]
+    weights = np.where(
+        index < end[np.newaxis],
+        erf((index + 0.5 - coords) * scale) - erf((index - 0.5 - coords) * scale),
+        0.0,
+    )
+    return np.minimum(index, shape[np.newaxis, :, np.newaxis] - 1), weights
+
+
+def load_transforms(xfm_files):
+    """
+    Load a chain of ITK/ANTs transforms for in-process resampling.
+
+    Transforms are listed as they would be passed to ``antsApplyTransforms``,
+    and the chain maps physical coordinates of the reference onto the moving
+    image applying them in that same order.
+    Displacements fields (either ITK NIfTI files or within ITK's composite
+    ``.h5`` files) are returned as tuples ``(field, ras2vox)``, with the field
+    as an array of shape (X, Y, Z, 3) of RAS displacements; linear transforms
+    are returned as RAS matrices, stacked along the first axis if the file
+    contains a series of them (e.g., head-motion correction).
+    Series of RAS matrices may also be given as stacks of shape (N, 4, 4),
+    stored in NumPy's ``.npy`` format (see :py:func:`fsl_to_ras`), which are
+    read directly, without parsing a text transform per matrix.
+    Identity transforms are dropped.
+
+    """
+    import numpy as np
+    import nibabel as nb
+    from nitransforms.io.itk import (
+        ITKCompositeH5,
+        ITKDisplacementsField,
+        ITKLinearTransformArray,
+    )
+
+    def _field(img):
+        field = np.asanyarray(img.dataobj, dtype="float32").reshape(img.shape[:3] + (3,))
+        return field, np.linalg.inv(img.affine)
+
+    chain = []
+    for xfm in xfm_files:
+        xfm = str(xfm)
+        if xfm == "identity":
+            continue
+        if xfm.endswith(".h5"):
+            # ITK applies the transforms of a composite last-in, first-applied
+            for part in reversed(ITKCompositeH5.from_filename(xfm)):
+                chain.append(
+                    _field(part) if isinstance(part, nb.Nifti1Image) else part.to_ras()
+                )
+        elif xfm.endswith((".nii", ".nii.gz")):
+            chain.append(_field(ITKDisplacementsField.from_image(nb.load(xfm))))
+        elif xfm.endswith(".npy"):
+            matrices = np.load(xfm)
+            chain.append(matrices[0] if len(matrices) == 1 else matrices)
+        elif xfm.endswith(".mat"):
+            chain.append(load_affine(xfm))
+        else:
+            matrices = ITKLinearTransformArray.from_filename(xfm).to_ras()
+            chain.append(matrices[0] if len(matrices) == 1 else matrices)
+    return chain
+
+
+def map_points(chain, points):
+    """
+    Map physical coordinates through a chain of transforms.
+
+    Parameters
+    ----------
+    chain : :obj:`list`
+        Transforms as returned by :py:func:`load_transforms`, with all linear
+        transforms given as single 4x4 matrices.
+    points : :obj:`numpy.ndarray`
+        Array of shape (3, M) with RAS coordinates.
+
+    Returns
+    -------
+    points : :obj:`numpy.ndarray`
+        Array of shape (3, M) with the mapped coordinates.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> field = np.zeros((3, 3, 3, 3), dtype="float32")
+    >>> field[..., 0] = 1.0
+    >>> chain = [np.diag([2.0, 2.0, 2.0, 1.0]), (field, np.eye(4))]
+    >>> map_points(chain, np.array([[0.5, 10.0], [0.5, 0.0], [0.5, 0.0]])).tolist()
+    [[2.0, 20.0], [1.0, 0.0], [1.0, 0.0]]
+
+    """
+    import numpy as np
+
+    points = np.asanyarray(points, dtype=float)
+    matrix = np.eye(4)
+    for xfm in chain:
+        if not isinstance(xfm, tuple):
+            # Consecutive linear transforms are composed, and applied at once
+            matrix = xfm @ matrix
+            continue
+        field, ras2vox = xfm
+        ijk = ras2vox @ matrix
+        ijk = ijk[:3, :3] @ points + ijk[:3, 3:]
+        points = matrix[:3, :3] @ points + matrix[:3, 3:]
+        points += linear_interpolation(field, ijk).T
+        matrix = np.eye(4)
+    return matrix[:3, :3] @ points + matrix[:3, 3:]
+
+
+def dense_displacements(chain, shape, affine, chunk_size=2 ** 20):
+    """
+    Evaluate a chain of transforms on a grid, as an ITK displacements field.
+
+    Parameters
+    ----------
+    chain : :obj:`list`
+        Transforms as returned by :py:func:`load_transforms`, with all linear
+        transforms given as single 4x4 matrices.
+    shape : :obj:`tuple`
+        Dimensions of the grid.
+    affine : :obj:`numpy.ndarray`
+        Voxel-to-RAS matrix of the grid.
+    chunk_size : :obj:`int`
+        Maximum number of grid points mapped at once, bounding memory usage.
+
+    Returns
+    -------
+    field : :obj:`nibabel.nifti1.Nifti1Image`
+        A displacements field as written by ANTs (i.e., 5D, with LPS vectors),
+        which maps each grid point through the whole chain.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> shift = np.eye(4)
+    >>> shift[0, 3] = 2.0
+    >>> field = dense_displacements([shift], (2, 3, 4), np.eye(4))
+    >>> field.shape
+    (2, 3, 4, 1, 3)
+    >>> np.unique(field.get_fdata()[..., 0]).tolist()
+    [-2.0]
+
+    """
+    import numpy as np
+    import nibabel as nb
+
+    shape = tuple(shape[:3])
+    n_points = int(np.prod(shape))
+    field = np.zeros((n_points, 3), dtype="float32")
+    for start in range(0, n_points, chunk_size):
+        ijk = np.array(np.unravel_index(np.arange(start, min(start + chunk_size, n_points)),
+                                        shape, order="F"))
+        points = affine[:3, :3] @ ijk + affine[:3, 3:]
+        field[start:start + chunk_size] = (map_points(chain, points) - points).T
+
+    # ITK stores displacements in LPS
+    field[:, :2] *= -1.0
+    hdr = nb.Nifti1Header()
+    hdr.set_intent("vector")
+    hdr.set_data_dtype("float32")
+    return nb.Nifti1Image(field.reshape(shape + (1, 3), order="F"), affine, hdr)
+
+
+def resample_series(
+    in_files,
+    transforms,
+    references,
+    target_transforms=None,
+    masks=None,
+    interpolation="LanczosWindowedSinc",
+    num_volumes=None,
+    num_threads=1,
+    chunk_size=2 ** 18,
+    joint=False,
+):
+    """
+    Resample a BOLD series onto one or several grids, volume by volume.
+
+    All transforms are composed once into a mapping of each reference grid
+    onto the series, and only the volume-wise transforms (i.e., head-motion
+    correction) are applied for each volume, which are interpolated in
+    parallel threads as they are read from the series.
+    Negative values (an artifact of the Lanczos interpolation) are clipped
+    to zero.
+
+    Parameters
+    ----------
+    in_files : :obj:`list` of :obj:`str`
+        A 4D series, or its individual 3D volumes.
+    transforms : :obj:`list`
+        Transforms, listed as for ``antsApplyTransforms``, mapping the
+        references onto the series; files with a transform per volume are
+        applied volume-wise.
+    references : :obj:`list` of :obj:`nibabel.spatialimages.SpatialImage`
+        Images defining the target grids.
+    target_transforms : :obj:`list` or None
+        A transform per reference, mapping it onto the space of ``transforms``.
+    masks : :obj:`list` or None
+        A mask file per reference (or ``"none"``), restricting the resampling
+        to the voxels within the mask, in the order of :py:func:`numpy.nonzero`.
+    interpolation : :obj:`str`
+        ``"LanczosWindowedSinc"``, ``"Linear"`` or ``"NearestNeighbor"``.
+    num_volumes : :obj:`int` or None
+        Resample only the first volumes of the series.
+    num_threads : :obj:`int`
+        Number of volumes resampled in parallel.
+    chunk_size : :obj:`int`
+        Maximum number of samples interpolated at once, bounding memory usage.
+    joint : :obj:`bool`
+        ``in_files`` are several 4D series sharing the same grid and transforms
+        (e.g., the echoes of a multi-echo run), which are resampled together:
+        the sampling coordinates of each volume are computed once and applied
+        to all of them.
+
+    Returns
+    -------
+    n_vols : :obj:`int`
+        Number of volumes resampled.
+    shapes : :obj:`list` of :obj:`tuple`
+        Shape of the volumes resampled onto each reference (``(voxels, 1, 1)``
+        for masked references).
+    volumes : generator
+        For each volume, the list of its resamplings onto the references,
+        yielded in order as they are ready (if ``joint``, with a last axis
+        indexing the series).
+
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    from itertools import islice
+    import numpy as np
+    import nibabel as nb
+    from .images import iter_volumes
+
+    interpolate = {
+        "LanczosWindowedSinc": lanczos_interpolation,
+        "Linear": linear_interpolation,
+        "NearestNeighbor": nearest_interpolation,
+    }[interpolation]
+
+    moving = nb.load(in_files[0])
+    if joint:
+        if any(nb.load(fname).shape != moving.shape for fname in in_files[1:]):
+            raise ValueError("All series must share the same dimensions.")
+        n_total = moving.shape[3]
+        series = (
+            np.stack(volumes, axis=-1)
+            for volumes in zip(*(iter_volumes(fname) for fname in in_files))
+        )
+    elif len(in_files) > 1:
+        n_total = len(in_files)
+        series = (nb.load(fname).get_fdata(dtype=np.float32) for fname in in_files)
+    elif moving.ndim == 4:
+        n_total = moving.shape[3]
+        series = iter_volumes(in_files[0])
+    else:
+        n_total = 1
+        series = iter([moving.get_fdata(dtype=np.float32)])
+    n_vols = n_total if num_volumes is None else min(num_volumes, n_total)
+
+    target_transforms = target_transforms or ["identity"] * len(references)
+    if len(target_transforms) != len(references):
+        raise ValueError("A target transform must be given for each reference.")
+    masks = masks or ["none"] * len(references)
+    if len(masks) != len(references):
+        raise ValueError("A mask (or 'none') must be given for each reference.")
+
+    # Apply the transforms shared by all volumes, up to the first volume-wise one
+    chain = load_transforms(transforms)
+    volumewise = [isinstance(xfm, np.ndarray) and xfm.ndim == 3 for xfm in chain]
+    split = volumewise.index(True) if any(volumewise) else len(chain)
+    if any(len(xfm) != n_total for xfm, vw in zip(chain, volumewise) if vw):
+        raise ValueError("The number of volume-wise transforms does not match "
+                         f"the number of volumes ({n_total}).")
+
+    targets, shapes = [], []
+    for ref, target_xfm, mask in zip(references, target_transforms, masks):
+        if mask == "none":
+            ijk = np.indices(ref.shape[:3]).reshape(3, -1)
+            shapes.append(ref.shape[:3])
+        else:
+            ijk = np.array(np.nonzero(np.asanyarray(nb.load(mask).dataobj)))
+            shapes.append((ijk.shape[1], 1, 1))
+        targets.append(map_points(
+            [ref.affine] + load_transforms([target_xfm]) + chain[:split], ijk
+        ))
+    ras2vox = np.linalg.inv(moving.affine)
+
+    def _resample(index, data):
+        volume_chain = [xfm[index] if vw else xfm
+                        for xfm, vw in zip(chain[split:], volumewise[split:])]
+        volume_chain.append(ras2vox)
+        volumes = []
+        for shape, points in zip(shapes, targets):
+            samples = np.zeros((points.shape[1],) + data.shape[3:], dtype=np.float32)
+            for start in range(0, points.shape[1], chunk_size):
+                chunk = slice(start, start + chunk_size)
+                coords = map_points(volume_chain, points[:, chunk])
+                samples[chunk] = interpolate(data, coords)
+            volumes.append(np.clip(samples, 0, None).reshape(shape + data.shape[3:]))
+        return volumes
+
+    def _volumes():
+        with ThreadPoolExecutor(max_workers=num_threads) as pool:
+            pending = deque()
+            for index, data in enumerate(islice(series, n_vols)):
+                pending.append(pool.submit(_resample, index, data))
+                if len(pending) > 2 * num_threads:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    return n_vols, shapes, _volumes()
+
+
+def _separable_interpolation(data, coords, radius, kernel):
+    """
+    Sample a volume (or a field of vectors) with a separable interpolation kernel.
+
+    The kernel is evaluated at the ``2 * radius`` nearest grid positions along
+    each axis, and the volume is extended beyond its borders by repeating the
+    edge voxels (ITK's zero-flux Neumann boundary condition).
+    Samples falling outside the input volume are set to zero.
+
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    coords = np.asanyarray(coords, dtype=float)
+    shape = np.array(data.shape[:3])[:, np.newaxis]
+    inside = np.all((coords >= -0.5) & (coords < shape - 0.5), axis=0)
+    coords = coords[:, inside]
+
+    base = np.floor(coords).astype(int)
+    dist = coords - base - np.arange(1 - radius, radius + 1)[:, np.newaxis, np.newaxis]
+    weights = kernel(dist).astype(data.dtype)
+
+    # Once padded, the neighborhood of each sample starts at index base + 1, and
+    # the neighbors along the first axis are gathered at once as contiguous runs
+    padded = np.pad(data, [(radius, radius)] * 3 + [(0, 0)] * (data.ndim - 3), mode="edge")
+    nx, ny = padded.shape[:2]
+    flat = padded.reshape((-1,) + data.shape[3:], order="F")
+    runs = sliding_window_view(flat, 2 * radius, axis=0)
+    start = base[0] + 1 + (base[1] + 1) * nx + (base[2] + 1) * nx * ny
+    weights_x = weights[:, 0].T.copy()
+    weights_shape = (-1,) + (1,) * (data.ndim - 3)
+
+    values = np.zeros((coords.shape[1],) + data.shape[3:], dtype=data.dtype)
+    for j in range(2 * radius):
+        for k in range(2 * radius):
+            rows = runs[start + j * nx + k * nx * ny]
+            weights_yz = (weights[j, 1] * weights[k, 2]).reshape(weights_shape)
+            values += np.einsum("i...j,ij->i...", rows, weights_x) * weights_yz
+
+    samples = np.zeros((inside.size,) + data.shape[3:], dtype=data.dtype)
+    samples[inside] = values
+    return samples
+
+
+def linear_interpolation(data, coords):
+    """
+    Sample a volume at continuous voxel coordinates with trilinear interpolation.
+
+    As ITK's ``LinearInterpolateImageFunction``, samples falling outside the
+    input volume are set to zero.
+
+    Parameters
+    ----------
+    data : :obj:`numpy.ndarray`
+        A 3D volume, or an array of shape (X, Y, Z, C) of vectors.
+    coords : :obj:`numpy.ndarray`
+        Array of shape (3, M) with the voxel coordinates of the M samples.
+
+    Returns
+    -------
+    samples : :obj:`numpy.ndarray`
+        Array of shape (M,) or (M, C).
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> data = np.arange(27, dtype=float).reshape((3, 3, 3))
+    >>> linear_interpolation(data, np.array([[0.5, 1.0, 3.0], [1.0, 1.5, 0.0], [1.0, 0.0, 0.0]]))
+    array([ 8.5, 13.5,  0. ])
+
+    """
+    import numpy as np
+
+    return _separable_interpolation(data, coords, 1, lambda x: 1.0 - np.abs(x))
+
+
+def lanczos_interpolation(data, coords):
+    """
+    Sample a volume at continuous voxel coordinates with Lanczos interpolation.
+
+    This function reproduces ITK's ``WindowedSincInterpolateImageFunction``
+    with a Lanczos window of radius 3, which is behind ANTs'
+    ``LanczosWindowedSinc`` interpolation: the kernel is not normalized,
+    and the volume is extended beyond its borders by repeating the edge
+    voxels.
+    Samples falling outside the input volume are set to zero.
+
+    Parameters
+    ----------
+    data : :obj:`numpy.ndarray`
+        A 3D volume.
+    coords : :obj:`numpy.ndarray`
+        Array of shape (3, M) with the voxel coordinates of the M samples.
+
+    Returns
+    -------
+    samples : :obj:`numpy.ndarray`
+        Array of shape (M,).
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> data = np.arange(8 ** 3, dtype=float).reshape((8, 8, 8))
+    >>> lanczos_interpolation(data, np.array([[4.0, 8.0], [4.0, 4.0], [4.0, 4.0]]))
+    array([292.,   0.])
+
+    """
+    import numpy as np
+
+    return _separable_interpolation(
+        data, coords, 3, lambda x: np.sinc(x) * np.sinc(x / 3)
+    )
+
+
+def nearest_interpolation(data, coords):
+    """
+    Sample a volume at continuous voxel coordinates, picking the nearest voxel.
+
+    >>> import numpy as np
+    >>> data = np.arange(27, dtype=float).reshape((3, 3, 3))
+    >>> nearest_interpolation(data, np.array([[0.4, 2.4, 3.0], [1.0, 0.0, 0.0], [1.0, 0.0, 0.0]]))
+    array([ 4., 18.,  0.])
+
+    """
+    import numpy as np
+
+    coords = np.asanyarray(coords, dtype=float)
+    shape = np.array(data.shape[:3])[:, np.newaxis]
+    inside = np.all((coords >= -0.5) & (coords < shape - 0.5), axis=0)
+    index = np.minimum(np.floor(coords[:, inside] + 0.5).astype(int), shape - 1)
+    samples = np.zeros((coords.shape[1],) + data.shape[3:], dtype=data.dtype)
+    samples[inside] = data[tuple(index)]
+    return samples
@@ -26,6 +26,7 @@ fMRIPrep base processing workflows
 
 .. autofunction:: init_fmriprep_wf
 .. autofunction:: init_single_subject_wf
+.. autofunction:: init_single_subject_confounds_wf
 
 """
 
@@ -33,11 +34,13 @@ import sys
 import os
 from copy import deepcopy
 
+import nibabel as nb
 from nipype.pipeline import engine as pe
 from nipype.interfaces import utility as niu
 
 from .. import config
 from ..interfaces import DerivativesDataSink
+from ..interfaces.confounds import aCompCorMasks
 from ..interfaces.reports import SubjectSummary, AboutSummary
 from .bold import init_func_preproc_wf
 
@@ -69,7 +72,7 @@ def init_fmriprep_wf():
     fmriprep_wf = Workflow(name='fmriprep_wf')
     fmriprep_wf.base_dir = config.execution.work_dir
 
-    freesurfer = config.workflow.run_reconall
+    freesurfer = config.workflow.run_reconall and not config.workflow.confounds_only
     if freesurfer:
         fsdir = pe.Node(
             BIDSFreeSurferDir(
@@ -170,6 +173,9 @@ def init_single_subject_wf(subject_id):
                 subject_id, task_id if task_id else '<all>')
         )
 
+    if config.workflow.confounds_only:
+        return init_single_subject_confounds_wf(subject_id, subject_data['bold'])
+
     if anat_derivatives:
         from smriprep.utils.bids import collect_derivatives
         std_spaces = spaces.get_spaces(nonstandard=False, dim=(3,))
@@ -364,12 +370,25 @@ tasks and sessions), the following preprocessing was performed.
 """.format(num_bold=len(subject_data['bold']))
 
     func_preproc_wfs = []
+    acc_masks = {}
     has_fieldmap = bool(fmap_estimators)
     for bold_file in subject_data['bold']:
         func_preproc_wf = init_func_preproc_wf(bold_file, has_fieldmap=has_fieldmap)
         if func_preproc_wf is None:
             continue
 
+        # aCompCor masks (T1w space) are shared by all runs with the same voxel size
+        ref_file = bold_file[0] if isinstance(bold_file, (list, tuple)) else bold_file
+        bold_zooms = tuple(nb.load(ref_file).header.get_zooms()[:3])
+        if bold_zooms not in acc_masks:
+            acc_masks[bold_zooms] = pe.Node(
+                aCompCorMasks(is_aseg=config.workflow.run_reconall, bold_zooms=bold_zooms),
+                name=f"acc_masks_{len(acc_masks):02d}",
+            )
+            workflow.connect([
+                (anat_preproc_wf, acc_masks[bold_zooms], [('outputnode.t1w_tpms', 'in_vfs')]),
+            ])
+
         func_preproc_wf.__desc__ = func_pre_desc + (func_preproc_wf.__desc__ or "")
         workflow.connect([
             (anat_preproc_wf, func_preproc_wf,
@@ -378,7 +397,6 @@ tasks and sessions), the following preprocessing was performed.
               ('outputnode.t1w_dseg', 'inputnode.t1w_dseg'),
               ('outputnode.t1w_aseg', 'inputnode.t1w_aseg'),
               ('outputnode.t1w_aparc', 'inputnode.t1w_aparc'),
-              ('outputnode.t1w_tpms', 'inputnode.t1w_tpms'),
               ('outputnode.template', 'inputnode.template'),
               ('outputnode.anat2std_xfm', 'inputnode.anat2std_xfm'),
               ('outputnode.std2anat_xfm', 'inputnode.std2anat_xfm'),
@@ -387,6 +405,8 @@ tasks and sessions), the following preprocessing was performed.
               ('outputnode.subject_id', 'inputnode.subject_id'),
               ('outputnode.t1w2fsnative_xfm', 'inputnode.t1w2fsnative_xfm'),
               ('outputnode.fsnative2t1w_xfm', 'inputnode.fsnative2t1w_xfm')]),
+            (acc_masks[bold_zooms], func_preproc_wf,
+             [('out_masks', 'inputnode.t1w_acompcor_masks')]),
         ])
         func_preproc_wfs.append(func_preproc_wf)
 
@@ -500,5 +520,73 @@ Setting-up fieldmap "{estimator.bids_id}" ({estimator.method}) with \
     return workflow
 
 
+def init_single_subject_confounds_wf(subject_id, bold_files):
+    """
+    Recalculate the confounds of a single subject from the outputs of a previous run.
+
+    For each BOLD run, the derivatives found in the output directory are
+    gathered with :py:func:`~fmriprep.utils.bids.collect_confounds_derivatives`
+    and fed into :py:func:`~fmriprep.workflows.bold.confounds.init_confounds_only_wf`.
+    The anatomical tissue probability maps are not recalculated either.
+
+    Parameters
+    ----------
+    subject_id : :obj:`str`
+        Subject label for this single-subject workflow.
+    bold_files : :obj:`list`
+        The original BOLD runs of the subject.
+
+    Inputs
+    ------
+    subjects_dir : :obj:`str`
+        FreeSurfer's ``$SUBJECTS_DIR`` (unused).
+
+    """
+    from niworkflows.engine.workflows import LiterateWorkflow as Workflow
+    from ..utils.bids import collect_confounds_derivatives
+    from .bold.base import _create_mem_gb, _get_wf_name
+    from .bold.confounds import init_confounds_only_wf
+
+    workflow = Workflow(name="single_subject_%s_wf" % subject_id)
+    inputnode = pe.Node(niu.IdentityInterface(fields=['subjects_dir']),
+                        name='inputnode')
+    workflow.add_nodes([inputnode])
+
+    acc_masks = {}
+    for bold_file in bold_files:
+        ref_file = bold_file[0] if isinstance(bold_file, (list, tuple)) else bold_file
+        derivatives = collect_confounds_derivatives(config.execution.fmriprep_dir, bold_file)
+        if derivatives is None:
+            raise RuntimeError(
+                f"Could not find the derivatives required to recalculate the confounds of "
+                f"<{ref_file}> in <{config.execution.fmriprep_dir}>. Please make sure "
+                "fMRIPrep was previously run with --output-spaces func.")
+
+        bold_zooms = tuple(nb.load(derivatives['bold']).header.get_zooms()[:3])
+        if bold_zooms not in acc_masks:
+            acc_masks[bold_zooms] = pe.Node(
+                aCompCorMasks(in_vfs=derivatives['t1w_tpms'],
+                              is_aseg=config.workflow.run_reconall,
+                              bold_zooms=bold_zooms),
+                name=f"acc_masks_{len(acc_masks):02d}",
+            )
+
+        confounds_wf = init_confounds_only_wf(
+            derivatives=derivatives,
+            mem_gb=_create_mem_gb(derivatives['bold'])[1]["largemem"],
+            metadata=config.execution.layout.get_metadata(ref_file),
+            output_dir=str(config.execution.fmriprep_dir),
+            source_file=ref_file,
+            freesurfer=config.workflow.run_reconall,
+            name=_get_wf_name(ref_file).replace("func_preproc", "confounds_only"),
+        )
+        workflow.connect([
+            (acc_masks[bold_zooms], confounds_wf,
+             [('out_masks', 'inputnode.t1w_acompcor_masks')]),
+        ])
+
+    return workflow
+
+
 def _prefix(subid):
     return subid if subid.startswith('sub-') else f'sub-{subid}'
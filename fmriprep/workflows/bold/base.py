@@ -98,8 +98,8 @@ def init_func_preproc_wf(bold_file, has_fieldmap=False):
         Segmentation of structural image, done with FreeSurfer.
     t1w_aparc
         Parcellation of structural image, done with FreeSurfer.
-    t1w_tpms
-        List of tissue probability maps in T1w space
+    t1w_acompcor_masks
+        CSF, WM and combined aCompCor masks in T1w space
     template
         List of templates to target
     anat2std_xfm
@@ -303,7 +303,7 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
                 "t1w_preproc",
                 "t1w_mask",
                 "t1w_dseg",
-                "t1w_tpms",
+                "t1w_acompcor_masks",
                 "t1w_aseg",
                 "t1w_aparc",
                 "anat2std_xfm",
@@ -451,10 +451,21 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
     bold_split = pe.Node(
         FSLSplit(dimension="t"), name="bold_split", mem_gb=mem_gb["filesize"] * 3
     )
+    if config.workflow.fused_resampling:
+        # The 4D series is resampled in one shot, without splitting it
+        bold_series, series_field = boldbuffer, "bold_file"
+    else:
+        bold_series, series_field = bold_split, "out_files"
 
     # HMC on the BOLD
     bold_hmc_wf = init_bold_hmc_wf(
-        name="bold_hmc_wf", mem_gb=mem_gb["filesize"], omp_nthreads=omp_nthreads
+        name="bold_hmc_wf",
+        mem_gb=mem_gb["filesize"],
+        omp_nthreads=omp_nthreads,
+        fused=config.workflow.fused_resampling,
+        chunked=config.workflow.parallel_hmc,
+        # SDCFlows' unwarping reads ITK transforms
+        write_itk=has_fieldmap,
     )
 
     # calculate BOLD registration to T1w
@@ -477,24 +488,49 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
         mem_gb=mem_gb["resampled"],
         omp_nthreads=omp_nthreads,
         use_compression=False,
+        fused=config.workflow.fused_resampling,
     )
     bold_t1_trans_wf.inputs.inputnode.fieldwarp = "identity"
 
+    # Only resample the whole native series if it is written out: the final reference
+    # needs only its first volumes, and confounds correct head-motion on the fly
+    lazy_native = (
+        config.workflow.lazy_native
+        and config.workflow.fused_resampling
+        and config.workflow.fused_confounds
+        and not multiecho
+        and not has_fieldmap
+        and not set(spaces.get_nonstandard()).intersection(
+            ("func", "run", "bold", "boldref", "sbref")
+        )
+    )
+    # Echoes share the head-motion transforms: resample them together, in one node
+    joint_echoes = multiecho and config.workflow.fused_resampling and not has_fieldmap
+
     # get confounds
     bold_confounds_wf = init_bold_confs_wf(
         mem_gb=mem_gb["largemem"],
         metadata=metadata,
         freesurfer=freesurfer,
+        fused=config.workflow.fused_confounds,
+        fused_masks=config.workflow.fused_resampling,
         regressors_all_comps=config.workflow.regressors_all_comps,
         regressors_fd_th=config.workflow.regressors_fd_th,
         regressors_dvars_th=config.workflow.regressors_dvars_th,
         name="bold_confounds_wf",
     )
     bold_confounds_wf.get_node("inputnode").inputs.t1_transform_flags = [False]
+    if lazy_native:
+        bold_confounds_wf.get_node("fused_confounds").n_procs = omp_nthreads
 
     # SLICE-TIME CORRECTION (or bypass) #############################################
     if run_stc:
-        bold_stc_wf = init_bold_stc_wf(name="bold_stc_wf", metadata=metadata)
+        bold_stc_wf = init_bold_stc_wf(
+            name="bold_stc_wf",
+            metadata=metadata,
+            omp_nthreads=omp_nthreads,
+            fused=config.workflow.fused_resampling,
+        )
         # fmt:off
         workflow.connect([
             (initial_boldref_wf, bold_stc_wf, [("outputnode.skip_vols", "inputnode.skip_vols")]),
@@ -519,6 +555,11 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
             joinfield=["bold_files"],
             name="join_echos",
         )
+        if joint_echoes:
+            # The (slice-timing corrected) echoes are joined before resampling instead
+            join_buffers = join_echos.clone(name="join_buffers")
+            join_echos = pe.Node(niu.IdentityInterface(fields=["bold_files"]),
+                                 name="join_echos")
 
         # create optimal combination, adaptive T2* map
         bold_t2s_wf = init_bold_t2s_wf(
@@ -526,6 +567,7 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
             mem_gb=mem_gb["resampled"],
             omp_nthreads=omp_nthreads,
             name="bold_t2smap_wf",
+            fused=config.workflow.fused_resampling,
         )
 
     bold_final = pe.Node(
@@ -550,8 +592,6 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
                                 ("t1w_mask", "in_mask")]),
         # Select validated bold files per-echo
         (initial_boldref_wf, select_bold, [("outputnode.all_bold_files", "inlist")]),
-        # BOLD buffer has slice-time corrected if it was run, original otherwise
-        (boldbuffer, bold_split, [("bold_file", "in_file")]),
         # HMC
         (initial_boldref_wf, bold_hmc_wf, [
             ("outputnode.raw_ref_image", "inputnode.raw_ref_image"),
@@ -594,7 +634,7 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
         ]),
         # Connect bold_confounds_wf
         (inputnode, bold_confounds_wf, [
-            ("t1w_tpms", "inputnode.t1w_tpms"),
+            ("t1w_acompcor_masks", "inputnode.t1w_acompcor_masks"),
             ("t1w_mask", "inputnode.t1w_mask"),
         ]),
         (bold_hmc_wf, bold_confounds_wf, [
@@ -614,10 +654,7 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
             ("outputnode.ref_image", "boldref"),
             ("outputnode.bold_mask", "mask"),
         ]),
-        (bold_final, bold_confounds_wf, [
-            ("bold", "inputnode.bold"),
-            ("mask", "inputnode.bold_mask"),
-        ]),
+        (bold_final, bold_confounds_wf, [("mask", "inputnode.bold_mask")]),
         (bold_confounds_wf, outputnode, [
             ("outputnode.confounds_file", "confounds"),
             ("outputnode.confounds_metadata", "confounds_metadata"),
@@ -626,7 +663,6 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
         ]),
         # Native-space BOLD files (if calculated)
         (bold_final, outputnode, [
-            ("bold", "bold_native"),
             ("boldref", "bold_native_ref"),
             ("mask", "bold_mask_native"),
             ("bold_echos", "bold_echos_native"),
@@ -641,12 +677,31 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
     ])
     # fmt:on
 
+    if has_fieldmap or not config.workflow.fused_resampling:
+        # BOLD buffer has slice-time corrected if it was run, original otherwise
+        workflow.connect([(boldbuffer, bold_split, [("bold_file", "in_file")])])
+
+    if lazy_native:
+        # fmt:off
+        workflow.connect([
+            (boldbuffer, bold_confounds_wf, [("bold_file", "inputnode.bold")]),
+            (bold_hmc_wf, bold_confounds_wf, [("outputnode.xforms", "inputnode.bold_xforms")]),
+        ])
+        # fmt:on
+    else:
+        # fmt:off
+        workflow.connect([
+            (bold_final, bold_confounds_wf, [("bold", "inputnode.bold")]),
+            (bold_final, outputnode, [("bold", "bold_native")]),
+        ])
+        # fmt:on
+
     # for standard EPI data, pass along correct file
     if not multiecho:
         # fmt:off
         workflow.connect([
             (inputnode, func_derivatives_wf, [("bold_file", "inputnode.source_file")]),
-            (bold_split, bold_t1_trans_wf, [("out_files", "inputnode.bold_split")]),
+            (bold_series, bold_t1_trans_wf, [(series_field, "inputnode.bold_split")]),
             (bold_hmc_wf, bold_t1_trans_wf, [("outputnode.xforms", "inputnode.hmc_xforms")]),
         ])
         # fmt:on
@@ -659,11 +714,17 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
             ]),
             (join_echos, bold_t2s_wf, [("bold_files", "inputnode.bold_file")]),
             (join_echos, bold_final, [("bold_files", "bold_echos")]),
-            (bold_t2s_wf, split_opt_comb, [("outputnode.bold", "in_file")]),
-            (split_opt_comb, bold_t1_trans_wf, [("out_files", "inputnode.bold_split")]),
             (bold_t2s_wf, bold_final, [("outputnode.bold", "bold")]),
         ])
         # fmt:on
+        if config.workflow.fused_resampling:
+            opt_comb_series, opt_comb_field = bold_t2s_wf, "outputnode.bold"
+        else:
+            opt_comb_series, opt_comb_field = split_opt_comb, "out_files"
+            workflow.connect([(bold_t2s_wf, split_opt_comb, [("outputnode.bold", "in_file")])])
+        workflow.connect([
+            (opt_comb_series, bold_t1_trans_wf, [(opt_comb_field, "inputnode.bold_split")]),
+        ])
 
         # Already applied in bold_bold_trans_wf, which inputs to bold_t2s_wf
         bold_t1_trans_wf.inputs.inputnode.hmc_xforms = "identity"
@@ -689,6 +750,14 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
         ])
         # fmt:on
 
+    # Sample the subcortical grayordinates directly
+    cifti_samples = (
+        config.workflow.fused_resampling
+        and config.workflow.cifti_output
+        and freesurfer
+        and bool(spaces.get_fs_spaces())
+    )
+
     if spaces.get_spaces(nonstandard=False, dim=(3,)):
         # Apply transforms in 1 shot
         # Only use uncompressed output if AROMA is to be run
@@ -699,6 +768,10 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
             spaces=spaces,
             name="bold_std_trans_wf",
             use_compression=not config.execution.low_mem,
+            fused=config.workflow.fused_resampling,
+            cache_dir=str(config.execution.work_dir / "transforms_cache"),
+            cifti_output=config.workflow.cifti_output if cifti_samples else None,
+            use_aroma=config.workflow.use_aroma,
         )
         bold_std_trans_wf.inputs.inputnode.fieldwarp = "identity"
 
@@ -742,7 +815,7 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
         if not multiecho:
             # fmt:off
             workflow.connect([
-                (bold_split, bold_std_trans_wf, [("out_files", "inputnode.bold_split")]),
+                (bold_series, bold_std_trans_wf, [(series_field, "inputnode.bold_split")]),
                 (bold_hmc_wf, bold_std_trans_wf, [
                     ("outputnode.xforms", "inputnode.hmc_xforms"),
                 ]),
@@ -751,7 +824,8 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
         else:
             # fmt:off
             workflow.connect([
-                (split_opt_comb, bold_std_trans_wf, [("out_files", "inputnode.bold_split")])
+                (opt_comb_series, bold_std_trans_wf, [
+                    (opt_comb_field, "inputnode.bold_split")]),
             ])
             # fmt:on
 
@@ -780,6 +854,7 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
                 omp_nthreads=omp_nthreads,
                 err_on_aroma_warn=config.workflow.aroma_err_on_warn,
                 aroma_melodic_dim=config.workflow.aroma_melodic_dim,
+                aroma_native=config.workflow.aroma_native,
                 name="ica_aroma_wf",
             )
 
@@ -847,6 +922,8 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
             surface_spaces=freesurfer_spaces,
             medial_surface_nan=config.workflow.medial_surface_nan,
             name="bold_surf_wf",
+            fused=config.workflow.fused_resampling,
+            cache_dir=str(config.execution.work_dir / "transforms_cache"),
         )
         # fmt:off
         workflow.connect([
@@ -869,6 +946,9 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
                 grayord_density=config.workflow.cifti_output,
                 mem_gb=mem_gb["resampled"],
                 repetition_time=metadata["RepetitionTime"],
+                fused=config.workflow.fused_resampling,
+                cache_dir=str(config.execution.work_dir / "transforms_cache"),
+                subcortical_samples=cifti_samples,
             )
 
             # fmt:off
@@ -890,6 +970,9 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
                 ]),
             ])
             # fmt:on
+            if cifti_samples:
+                workflow.connect(bold_std_trans_wf, "outputnode.bold_subcortical",
+                                 bold_grayords_wf, "inputnode.bold_subcortical")
 
     if spaces.get_spaces(nonstandard=False, dim=(3,)):
         carpetplot_wf = init_carpetplot_wf(
@@ -921,20 +1004,37 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
                 (carpetplot_select_std, carpetplot_wf, [
                     ("std2anat_xfm", "inputnode.std2anat_xfm"),
                 ]),
-                (bold_final, carpetplot_wf, [
-                    ("bold", "inputnode.bold"),
-                    ("mask", "inputnode.bold_mask"),
-                ]),
-                (bold_reg_wf, carpetplot_wf, [
-                    ("outputnode.itk_t1_to_bold", "inputnode.t1_bold_xform"),
-                ]),
             ])
             # fmt:on
 
+            if lazy_native:
+                # Plot the series in T1w space, which is resampled anyway
+                carpetplot_wf.inputs.inputnode.t1_bold_xform = "identity"
+                # fmt:off
+                workflow.connect([
+                    (bold_t1_trans_wf, carpetplot_wf, [
+                        ("outputnode.bold_t1", "inputnode.bold"),
+                        ("outputnode.bold_mask_t1", "inputnode.bold_mask"),
+                    ]),
+                ])
+                # fmt:on
+            else:
+                # fmt:off
+                workflow.connect([
+                    (bold_final, carpetplot_wf, [
+                        ("bold", "inputnode.bold"),
+                        ("mask", "inputnode.bold_mask"),
+                    ]),
+                    (bold_reg_wf, carpetplot_wf, [
+                        ("outputnode.itk_t1_to_bold", "inputnode.t1_bold_xform"),
+                    ]),
+                ])
+                # fmt:on
+
         # fmt:off
         workflow.connect([
             (bold_confounds_wf, carpetplot_wf, [
-                ("outputnode.confounds_file", "inputnode.confounds_file"),
+                ("outputnode.confounds_npz", "inputnode.confounds_file"),
             ])
         ])
         # fmt:on
@@ -975,6 +1075,8 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
         # Finalize workflow without SDC connections
         summary.inputs.distortion_correction = "None"
 
+        from niworkflows.interfaces.bold import NonsteadyStatesDetector
+
         # Resample in native space in just one shot
         bold_bold_trans_wf = init_bold_preproc_trans_wf(
             mem_gb=mem_gb["resampled"],
@@ -982,18 +1084,31 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
             use_compression=not config.execution.low_mem,
             use_fieldwarp=False,
             name="bold_bold_trans_wf",
+            fused=config.workflow.fused_resampling,
+            # The final reference is estimated within the first volumes only
+            num_volumes=NonsteadyStatesDetector().inputs.n_volumes if lazy_native else None,
+            joint=joint_echoes,
         )
         bold_bold_trans_wf.inputs.inputnode.fieldwarp = "identity"
 
         # fmt:off
         workflow.connect([
             # Connect bold_bold_trans_wf
-            (bold_source, bold_bold_trans_wf, [("out", "inputnode.name_source")]),
-            (bold_split, bold_bold_trans_wf, [("out_files", "inputnode.bold_file")]),
             (bold_hmc_wf, bold_bold_trans_wf, [
                 ("outputnode.xforms", "inputnode.hmc_xforms"),
             ]),
         ])
+        if joint_echoes:
+            workflow.connect([
+                (inputnode, bold_bold_trans_wf, [("bold_file", "inputnode.name_source")]),
+                (boldbuffer, join_buffers, [("bold_file", "bold_files")]),
+                (join_buffers, bold_bold_trans_wf, [("bold_files", "inputnode.bold_file")]),
+            ])
+        else:
+            workflow.connect([
+                (bold_source, bold_bold_trans_wf, [("out", "inputnode.name_source")]),
+                (bold_series, bold_bold_trans_wf, [(series_field, "inputnode.bold_file")]),
+            ])
 
         workflow.connect([
             (bold_bold_trans_wf, bold_final, [("outputnode.bold", "bold")]),
@@ -1085,7 +1200,7 @@ Non-gridded (surface) resamplings were performed using `mri_vol2surf`
         (coeff2epi_wf, unwarp_wf, [
             ("outputnode.fmap_coeff", "inputnode.fmap_coeff")]),
         (bold_hmc_wf, unwarp_wf, [
-            ("outputnode.xforms", "inputnode.hmc_xforms")]),
+            ("outputnode.itk_xforms", "inputnode.hmc_xforms")]),
         (initial_boldref_wf, sdc_report, [
             ("outputnode.ref_image", "before")]),
         (bold_split, unwarp_wf, [
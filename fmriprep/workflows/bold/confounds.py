@@ -38,7 +38,7 @@ from templateflow.api import get as get_template
 from ...config import DEFAULT_MEMORY_MIN_GB
 from ...interfaces import DerivativesDataSink
 from ...interfaces.confounds import (
-    GatherConfounds, ICAConfounds, FMRISummary, RenameACompCor, FilterDropped,
+    CollateCompCor, GatherConfounds, ICAConfounds, FMRISummary,
 )
 
 
@@ -49,6 +49,8 @@ def init_bold_confs_wf(
     regressors_dvars_th,
     regressors_fd_th,
     freesurfer=False,
+    fused=False,
+    fused_masks=False,
     name="bold_confs_wf",
 ):
     """
@@ -78,6 +80,15 @@ def init_bold_confs_wf(
     The cosine basis, as well as one regressor per censored volume, are included
     for convenience.
 
+    When ``fused`` is set, DVARS, the global signals and both *CompCor*
+    decompositions are calculated by one
+    :py:class:`~fmriprep.interfaces.confounds.FusedConfounds` node,
+    which reads the BOLD series only once (applying ``bold_xforms`` to its
+    volumes as they are read, if given).
+    When ``fused_masks`` is set, the anatomical masks for aCompCor are
+    projected onto the BOLD grid and binarized by one
+    :py:class:`~fmriprep.interfaces.resampling.ResampleMasks` node.
+
     Workflow Graph
         .. workflow::
             :graph2use: orig
@@ -100,6 +111,13 @@ def init_bold_confs_wf(
         the FoV
     metadata : :obj:`dict`
         BIDS metadata for BOLD file
+    fused : :obj:`bool`
+        Calculate DVARS, global signals and *CompCor* in a single pass
+        over the BOLD series
+    fused_masks : :obj:`bool`
+        Project, mask and binarize all the anatomical masks for aCompCor in one
+        process, instead of running ``antsApplyTransforms``, masking and
+        binarizing each of them in turn
     name : :obj:`str`
         Name of workflow (default: ``bold_confs_wf``)
     regressors_all_comps : :obj:`bool`
@@ -118,6 +136,9 @@ def init_bold_confs_wf(
         when available.
     bold_mask
         BOLD series mask
+    bold_xforms
+        Transforms (e.g., head-motion correction) still to be applied to ``bold``,
+        which are then applied on the fly as it is read (optional, only if ``fused``)
     movpar_file
         SPM-formatted motion parameters file
     rmsd_file
@@ -126,8 +147,9 @@ def init_bold_confs_wf(
         number of non steady state volumes
     t1w_mask
         Mask of the skull-stripped template image
-    t1w_tpms
-        List of tissue probability maps in T1w space
+    t1w_acompcor_masks
+        CSF, WM and combined aCompCor masks in T1w space, as generated by
+        :py:class:`~fmriprep.interfaces.confounds.aCompCorMasks`
     t1_bold_xform
         Affine matrix that maps the T1w space into alignment with
         the native BOLD space
@@ -136,6 +158,9 @@ def init_bold_confs_wf(
     -------
     confounds_file
         TSV of all aggregated confounds
+    confounds_npz
+        Columnar binary (``.npz``) table of the gathered confounds, before
+        model expansion and spike regressors are added
     rois_report
         Reportlet visualizing white-matter/CSF mask used for aCompCor,
         the ROI for tCompCor and the BOLD brain mask.
@@ -149,17 +174,16 @@ def init_bold_confs_wf(
     from niworkflows.interfaces.images import SignalExtraction
     from niworkflows.interfaces.reportlets.masks import ROIsPlot
     from niworkflows.interfaces.nibabel import ApplyMask, Binarize
-    from niworkflows.interfaces.patches import (
-        RobustACompCor as ACompCor,
-        RobustTCompCor as TCompCor,
-    )
     from niworkflows.interfaces.plotting import (
         CompCorVariancePlot, ConfoundsCorrelationPlot
     )
-    from niworkflows.interfaces.utility import (
-        AddTSVHeader, TSV2JSON, DictMerge
+    from niworkflows.interfaces.utility import AddTSVHeader
+    from ...interfaces.confounds import FusedConfounds
+    from ...interfaces.resampling import ResampleMasks
+    from ...interfaces.patches import (
+        RobustACompCor as ACompCor,
+        RobustTCompCor as TCompCor,
     )
-    from ...interfaces.confounds import aCompCorMasks
 
     gm_desc = (
         "dilating a GM mask extracted from the FreeSurfer's *aseg* segmentation" if freesurfer
@@ -210,11 +234,12 @@ Frames that exceeded a threshold of {regressors_fd_th} mm FD or
 {regressors_dvars_th} standardised DVARS were annotated as motion outliers.
 """
     inputnode = pe.Node(niu.IdentityInterface(
-        fields=['bold', 'bold_mask', 'movpar_file', 'rmsd_file',
-                'skip_vols', 't1w_mask', 't1w_tpms', 't1_bold_xform']),
+        fields=['bold', 'bold_mask', 'bold_xforms', 'movpar_file', 'rmsd_file',
+                'skip_vols', 't1w_mask', 't1w_acompcor_masks', 't1_bold_xform']),
         name='inputnode')
     outputnode = pe.Node(niu.IdentityInterface(
-        fields=['confounds_file', 'confounds_metadata', 'acompcor_masks', 'tcompcor_mask']),
+        fields=['confounds_file', 'confounds_npz', 'confounds_metadata', 'acompcor_masks',
+                'tcompcor_mask']),
         name='outputnode')
 
     # DVARS
@@ -225,17 +250,6 @@ Frames that exceeded a threshold of {regressors_fd_th} mm FD or
     fdisp = pe.Node(nac.FramewiseDisplacement(parameter_source="SPM"),
                     name="fdisp", mem_gb=mem_gb)
 
-    # Generate aCompCor probseg maps
-    acc_masks = pe.Node(aCompCorMasks(is_aseg=freesurfer), name="acc_masks")
-
-    # Resample probseg maps in BOLD space via T1w-to-BOLD transform
-    acc_msk_tfm = pe.MapNode(ApplyTransforms(
-        interpolation='Gaussian', float=False), iterfield=["input_image"],
-        name='acc_msk_tfm', mem_gb=0.1)
-    acc_msk_brain = pe.MapNode(ApplyMask(), name="acc_msk_brain",
-                               iterfield=["in_file"])
-    acc_msk_bin = pe.MapNode(Binarize(thresh_low=0.99), name='acc_msk_bin',
-                             iterfield=["in_file"])
     acompcor = pe.Node(
         ACompCor(components_file='acompcor.tsv', header_prefix='a_comp_cor_', pre_filter='cosine',
                  save_pre_filter=True, save_metadata=True, mask_names=['CSF', 'WM', 'combined'],
@@ -253,21 +267,27 @@ Frames that exceeded a threshold of {regressors_fd_th} mm FD or
         acompcor.inputs.num_components = 'all'
         tcompcor.inputs.num_components = 'all'
     else:
+        # Only the components explaining half of the variance are calculated
         acompcor.inputs.variance_threshold = 0.5
         tcompcor.inputs.variance_threshold = 0.5
+        acompcor.inputs.svd_solver = 'randomized'
+        tcompcor.inputs.svd_solver = 'randomized'
 
     # Set TR if present
     if 'RepetitionTime' in metadata:
         tcompcor.inputs.repetition_time = metadata['RepetitionTime']
         acompcor.inputs.repetition_time = metadata['RepetitionTime']
 
-    # Split aCompCor results into a_comp_cor, c_comp_cor, w_comp_cor
-    rename_acompcor = pe.Node(RenameACompCor(), name="rename_acompcor")
-
     # Global and segment regressors
     signals_class_labels = [
         "global_signal", "csf", "white_matter", "csf_wm", "tcompcor",
     ]
+
+    # Split aCompCor results into a_comp_cor, c_comp_cor, w_comp_cor,
+    # and gather the metadata of the retained CompCor components
+    rename_acompcor = pe.Node(CollateCompCor(
+        additional_metadata={label: {'Method': 'Mean'} for label in signals_class_labels}),
+        name="rename_acompcor")
     merge_rois = pe.Node(niu.Merge(3, ravel_inputs=True), name='merge_rois',
                          run_without_submitting=True)
     signals = pe.Node(SignalExtraction(class_labels=signals_class_labels),
@@ -288,24 +308,6 @@ Frames that exceeded a threshold of {regressors_fd_th} mm FD or
         name="add_rmsd_header", mem_gb=0.01, run_without_submitting=True)
     concat = pe.Node(GatherConfounds(), name="concat", mem_gb=0.01, run_without_submitting=True)
 
-    # CompCor metadata
-    tcc_metadata_filter = pe.Node(FilterDropped(), name="tcc_metadata_filter")
-    acc_metadata_filter = pe.Node(FilterDropped(), name="acc_metadata_filter")
-    tcc_metadata_fmt = pe.Node(
-        TSV2JSON(index_column='component', drop_columns=['mask'], output=None,
-                 additional_metadata={'Method': 'tCompCor'}, enforce_case=True),
-        name='tcc_metadata_fmt')
-    acc_metadata_fmt = pe.Node(
-        TSV2JSON(index_column='component', output=None,
-                 additional_metadata={'Method': 'aCompCor'}, enforce_case=True),
-        name='acc_metadata_fmt')
-    mrg_conf_metadata = pe.Node(niu.Merge(3), name='merge_confound_metadata',
-                                run_without_submitting=True)
-    mrg_conf_metadata.inputs.in3 = {label: {'Method': 'Mean'}
-                                    for label in signals_class_labels}
-    mrg_conf_metadata2 = pe.Node(DictMerge(), name='merge_confound_metadata2',
-                                 run_without_submitting=True)
-
     # Expand model to include derivatives and quadratics
     model_expand = pe.Node(ExpandModel(
         model_formula='(dd1(rps + wm + csf + gsr))^^2 + others'),
@@ -353,32 +355,119 @@ Frames that exceeded a threshold of {regressors_fd_th} mm FD or
         return inlist[-1]
 
     def _select_cols(table):
-        import pandas as pd
-        return [
-            col for col in pd.read_table(table, nrows=2).columns
-            if not col.startswith(("a_comp_cor_", "t_comp_cor_", "std_dvars"))
-        ]
+        import numpy as np
+        with np.load(table) as npz:
+            return [
+                col for col in npz["columns"].tolist()
+                if not col.startswith(("a_comp_cor_", "t_comp_cor_", "std_dvars"))
+            ]
 
     workflow.connect([
         # connect inputnode to each non-anatomical confound node
+        (inputnode, fdisp, [('movpar_file', 'in_file')]),
+
+        # Collate computed confounds together
+        (inputnode, add_motion_headers, [('movpar_file', 'in_file')]),
+        (inputnode, add_rmsd_header, [('rmsd_file', 'in_file')]),
+        (fdisp, concat, [('out_file', 'fd')]),
+        (rename_acompcor, concat, [('components_file', 'acompcor')]),
+        (add_motion_headers, concat, [('out_file', 'motion')]),
+        (add_rmsd_header, concat, [('out_file', 'rmsd')]),
+        (add_dvars_header, concat, [('out_file', 'dvars')]),
+        (add_std_dvars_header, concat, [('out_file', 'std_dvars')]),
+
+        # Expand the model with derivatives, quadratics, and spikes
+        (concat, model_expand, [('confounds_file', 'confounds_file')]),
+        (model_expand, spike_regress, [('confounds_file', 'confounds_file')]),
+
+        # Set outputs
+        (spike_regress, outputnode, [('confounds_file', 'confounds_file')]),
+        (concat, outputnode, [('confounds_npz', 'confounds_npz')]),
+        (rename_acompcor, outputnode, [('metadata', 'confounds_metadata')]),
+        (inputnode, rois_plot, [('bold_mask', 'in_mask')]),
+        (mrg_compcor, rois_plot, [('out', 'in_rois')]),
+        (rois_plot, ds_report_bold_rois, [('out_report', 'in_file')]),
+        (rename_acompcor, mrg_cc_metadata, [('metadata_file', 'in2')]),
+        (mrg_cc_metadata, compcor_plot, [('out', 'metadata_files')]),
+        (compcor_plot, ds_report_compcor, [('out_file', 'in_file')]),
+        (concat, conf_corr_plot, [('confounds_file', 'confounds_file'),
+                                  (('confounds_npz', _select_cols), 'columns')]),
+        (conf_corr_plot, ds_report_conf_corr, [('out_file', 'in_file')]),
+    ])
+
+    if fused_masks:
+        # Resample, mask and binarize all probseg maps at once
+        acc_msk = pe.Node(ResampleMasks(thresh_low=0.99), name='acc_msk', mem_gb=0.1)
+        workflow.connect([
+            (inputnode, acc_msk, [("t1w_acompcor_masks", "in_files"),
+                                  ("t1_bold_xform", "transform"),
+                                  ("bold_mask", "reference_mask")]),
+        ])
+        acc_msk_out = 'out_files'
+    else:
+        # Resample probseg maps in BOLD space via T1w-to-BOLD transform
+        acc_msk_tfm = pe.MapNode(ApplyTransforms(
+            interpolation='Gaussian', float=False), iterfield=["input_image"],
+            name='acc_msk_tfm', mem_gb=0.1)
+        acc_msk_brain = pe.MapNode(ApplyMask(), name="acc_msk_brain",
+                                   iterfield=["in_file"])
+        acc_msk = pe.MapNode(Binarize(thresh_low=0.99), name='acc_msk_bin',
+                             iterfield=["in_file"])
+        workflow.connect([
+            (inputnode, acc_msk_tfm, [("t1w_acompcor_masks", "input_image"),
+                                      ("t1_bold_xform", "transforms"),
+                                      ("bold_mask", "reference_image")]),
+            (inputnode, acc_msk_brain, [("bold_mask", "in_mask")]),
+            (acc_msk_tfm, acc_msk_brain, [("output_image", "in_file")]),
+            (acc_msk_brain, acc_msk, [("out_file", "in_file")]),
+        ])
+        acc_msk_out = 'out_file'
+
+    workflow.connect([
+        (acc_msk, outputnode, [(acc_msk_out, "acompcor_masks")]),
+        (acc_msk, mrg_compcor, [((acc_msk_out, _last), 'in2')]),
+    ])
+
+    if fused:
+        confounds = pe.Node(FusedConfounds(
+            components_criterion='all' if regressors_all_comps else 0.5,
+            svd_solver='gram' if regressors_all_comps else 'randomized'),
+            name="fused_confounds", mem_gb=mem_gb)
+        if 'RepetitionTime' in metadata:
+            confounds.inputs.repetition_time = metadata['RepetitionTime']
+
+        workflow.connect([
+            (acc_msk, confounds, [(acc_msk_out, 'acompcor_masks')]),
+            # bold_xforms is Undefined unless the series is corrected on the fly
+            (inputnode, confounds, [('bold', 'in_file'),
+                                    ('bold_mask', 'in_mask'),
+                                    ('bold_xforms', 'transforms'),
+                                    ('skip_vols', 'skip_vols')]),
+            (confounds, rename_acompcor, [('acompcor', 'acompcor_components'),
+                                          ('acompcor_metadata', 'acompcor_metadata'),
+                                          ('tcompcor_metadata', 'tcompcor_metadata')]),
+            (confounds, add_dvars_header, [('dvars_nstd', 'in_file')]),
+            (confounds, add_std_dvars_header, [('dvars_std', 'in_file')]),
+            (confounds, concat, [('signals', 'signals'),
+                                 ('tcompcor', 'tcompcor'),
+                                 ('cos_basis', 'cos_basis')]),
+            (confounds, outputnode, [('tcompcor_mask', 'tcompcor_mask')]),
+            (confounds, rois_plot, [('mean_file', 'in_file')]),
+            (confounds, mrg_compcor, [('tcompcor_mask', 'in1')]),
+            (confounds, mrg_cc_metadata, [('tcompcor_metadata', 'in1')]),
+        ])
+        return workflow
+
+    workflow.connect([
         (inputnode, dvars, [('bold', 'in_file'),
                             ('bold_mask', 'in_mask')]),
-        (inputnode, fdisp, [('movpar_file', 'in_file')]),
 
         # aCompCor
         (inputnode, acompcor, [("bold", "realigned_file"),
                                ("skip_vols", "ignore_initial_volumes")]),
-        (inputnode, acc_masks, [("t1w_tpms", "in_vfs"),
-                                (("bold", _get_zooms), "bold_zooms")]),
-        (inputnode, acc_msk_tfm, [("t1_bold_xform", "transforms"),
-                                  ("bold_mask", "reference_image")]),
-        (inputnode, acc_msk_brain, [("bold_mask", "in_mask")]),
-        (acc_masks, acc_msk_tfm, [("out_masks", "input_image")]),
-        (acc_msk_tfm, acc_msk_brain, [("output_image", "in_file")]),
-        (acc_msk_brain, acc_msk_bin, [("out_file", "in_file")]),
-        (acc_msk_bin, acompcor, [("out_file", "mask_files")]),
-        (acompcor, rename_acompcor, [("components_file", "components_file"),
-                                     ("metadata_file", "metadata_file")]),
+        (acc_msk, acompcor, [(acc_msk_out, "mask_files")]),
+        (acompcor, rename_acompcor, [("components_file", "acompcor_components"),
+                                     ("metadata_file", "acompcor_metadata")]),
 
         # tCompCor
         (inputnode, tcompcor, [("bold", "realigned_file"),
@@ -387,61 +476,178 @@ Frames that exceeded a threshold of {regressors_fd_th} mm FD or
         # Global signals extraction (constrained by anatomy)
         (inputnode, signals, [('bold', 'in_file')]),
         (inputnode, merge_rois, [('bold_mask', 'in1')]),
-        (acc_msk_bin, merge_rois, [('out_file', 'in2')]),
+        (acc_msk, merge_rois, [(acc_msk_out, 'in2')]),
         (tcompcor, merge_rois, [('high_variance_masks', 'in3')]),
         (merge_rois, signals, [('out', 'label_files')]),
 
         # Collate computed confounds together
-        (inputnode, add_motion_headers, [('movpar_file', 'in_file')]),
-        (inputnode, add_rmsd_header, [('rmsd_file', 'in_file')]),
         (dvars, add_dvars_header, [('out_nstd', 'in_file')]),
         (dvars, add_std_dvars_header, [('out_std', 'in_file')]),
         (signals, concat, [('out_file', 'signals')]),
-        (fdisp, concat, [('out_file', 'fd')]),
         (tcompcor, concat, [('components_file', 'tcompcor'),
                             ('pre_filter_file', 'cos_basis')]),
-        (rename_acompcor, concat, [('components_file', 'acompcor')]),
-        (add_motion_headers, concat, [('out_file', 'motion')]),
-        (add_rmsd_header, concat, [('out_file', 'rmsd')]),
-        (add_dvars_header, concat, [('out_file', 'dvars')]),
-        (add_std_dvars_header, concat, [('out_file', 'std_dvars')]),
 
         # Confounds metadata
-        (tcompcor, tcc_metadata_filter, [('metadata_file', 'in_file')]),
-        (tcc_metadata_filter, tcc_metadata_fmt, [('out_file', 'in_file')]),
-        (rename_acompcor, acc_metadata_filter, [('metadata_file', 'in_file')]),
-        (acc_metadata_filter, acc_metadata_fmt, [('out_file', 'in_file')]),
-        (tcc_metadata_fmt, mrg_conf_metadata, [('output', 'in1')]),
-        (acc_metadata_fmt, mrg_conf_metadata, [('output', 'in2')]),
-        (mrg_conf_metadata, mrg_conf_metadata2, [('out', 'in_dicts')]),
-
-        # Expand the model with derivatives, quadratics, and spikes
-        (concat, model_expand, [('confounds_file', 'confounds_file')]),
-        (model_expand, spike_regress, [('confounds_file', 'confounds_file')]),
+        (tcompcor, rename_acompcor, [('metadata_file', 'tcompcor_metadata')]),
 
         # Set outputs
-        (spike_regress, outputnode, [('confounds_file', 'confounds_file')]),
-        (mrg_conf_metadata2, outputnode, [('out_dict', 'confounds_metadata')]),
         (tcompcor, outputnode, [("high_variance_masks", "tcompcor_mask")]),
-        (acc_msk_bin, outputnode, [("out_file", "acompcor_masks")]),
-        (inputnode, rois_plot, [('bold', 'in_file'),
-                                ('bold_mask', 'in_mask')]),
+        (inputnode, rois_plot, [('bold', 'in_file')]),
         (tcompcor, mrg_compcor, [('high_variance_masks', 'in1')]),
-        (acc_msk_bin, mrg_compcor, [(('out_file', _last), 'in2')]),
-        (mrg_compcor, rois_plot, [('out', 'in_rois')]),
-        (rois_plot, ds_report_bold_rois, [('out_report', 'in_file')]),
         (tcompcor, mrg_cc_metadata, [('metadata_file', 'in1')]),
-        (rename_acompcor, mrg_cc_metadata, [('metadata_file', 'in2')]),
-        (mrg_cc_metadata, compcor_plot, [('out', 'metadata_files')]),
-        (compcor_plot, ds_report_compcor, [('out_file', 'in_file')]),
-        (concat, conf_corr_plot, [('confounds_file', 'confounds_file'),
-                                  (('confounds_file', _select_cols), 'columns')]),
-        (conf_corr_plot, ds_report_conf_corr, [('out_file', 'in_file')]),
     ])
 
     return workflow
 
 
+def init_confounds_only_wf(
+    derivatives,
+    mem_gb,
+    metadata,
+    output_dir,
+    source_file,
+    freesurfer=False,
+    name="confounds_only_wf",
+):
+    """
+    Recalculate the confounds of a BOLD run from the derivatives of a previous run.
+
+    The native-space preprocessed BOLD series, its brain mask, the T1w-to-BOLD
+    transform and the head-motion estimates stored in the previous confounds
+    file are fed into :py:func:`init_bold_confs_wf`, so that only the confounds
+    (e.g., with new spike thresholds or retaining all *CompCor* components) are
+    recomputed.
+    Only the ``_desc-confounds_timeseries.tsv`` file (and its ``.json`` and
+    ``.npz`` siblings) is overwritten, and no reportlets are generated.
+
+    Workflow Graph
+        .. workflow::
+            :graph2use: orig
+            :simple_form: yes
+
+            from fmriprep.workflows.bold.confounds import init_confounds_only_wf
+            wf = init_confounds_only_wf(
+                derivatives={
+                    'bold': 'sub-01_task-rest_desc-preproc_bold.nii.gz',
+                    'bold_mask': 'sub-01_task-rest_desc-brain_mask.nii.gz',
+                    't1_bold_xform': 'sub-01_task-rest_from-T1w_to-scanner_mode-image_xfm.txt',
+                    'confounds': 'sub-01_task-rest_desc-confounds_timeseries.tsv',
+                    'confounds_metadata': 'sub-01_task-rest_desc-confounds_timeseries.json',
+                },
+                mem_gb=1,
+                metadata={},
+                output_dir='.',
+                source_file='sub-01_task-rest_bold.nii.gz',
+            )
+
+    Parameters
+    ----------
+    derivatives : :obj:`dict`
+        Derivatives of the previous run, as gathered by
+        :py:func:`~fmriprep.utils.bids.collect_confounds_derivatives`
+    mem_gb : :obj:`float`
+        Size of BOLD file in GB
+    metadata : :obj:`dict`
+        BIDS metadata for BOLD file
+    output_dir : :obj:`str`
+        Directory in which to save derivatives
+    source_file : :obj:`str`
+        The original BOLD file (derivatives are named after it)
+    freesurfer : :obj:`bool`
+        Whether FreeSurfer was run on the previous run
+    name : :obj:`str`
+        Name of workflow (default: ``confounds_only_wf``)
+
+    Inputs
+    ------
+    t1w_acompcor_masks
+        CSF, WM and combined aCompCor masks in T1w space, as generated by
+        :py:class:`~fmriprep.interfaces.confounds.aCompCorMasks`
+
+    Outputs
+    -------
+    confounds_file
+        TSV of all aggregated confounds
+    confounds_metadata
+        Confounds metadata dictionary.
+
+    """
+    from niworkflows.engine.workflows import LiterateWorkflow as Workflow
+    from niworkflows.interfaces.utility import DictMerge
+    from ... import config
+    from ...interfaces.confounds import PreviousConfounds, TSV2NPZ
+    from .base import _to_join
+    from .outputs import _npz_name
+
+    workflow = Workflow(name=name)
+
+    inputnode = pe.Node(niu.IdentityInterface(fields=['t1w_acompcor_masks']),
+                        name='inputnode')
+    outputnode = pe.Node(niu.IdentityInterface(
+        fields=['confounds_file', 'confounds_metadata']), name='outputnode')
+
+    previous = pe.Node(PreviousConfounds(in_file=derivatives['confounds']),
+                       name='previous_confounds', mem_gb=DEFAULT_MEMORY_MIN_GB)
+    if derivatives.get('confounds_metadata'):
+        previous.inputs.in_metadata = derivatives['confounds_metadata']
+
+    bold_confounds_wf = init_bold_confs_wf(
+        mem_gb=mem_gb,
+        metadata=metadata,
+        freesurfer=freesurfer,
+        fused=config.workflow.fused_confounds,
+        fused_masks=config.workflow.fused_resampling,
+        regressors_all_comps=config.workflow.regressors_all_comps,
+        regressors_fd_th=config.workflow.regressors_fd_th,
+        regressors_dvars_th=config.workflow.regressors_dvars_th,
+        name="bold_confounds_wf",
+    )
+    bold_confounds_wf.inputs.inputnode.bold = derivatives['bold']
+    bold_confounds_wf.inputs.inputnode.bold_mask = derivatives['bold_mask']
+    bold_confounds_wf.inputs.inputnode.t1_bold_xform = derivatives['t1_bold_xform']
+    # Reportlets are left as they were
+    bold_confounds_wf.remove_nodes([
+        bold_confounds_wf.get_node(node) for node in (
+            'rois_plot', 'ds_report_bold_rois', 'compcor_plot', 'ds_report_compcor',
+            'conf_corr_plot', 'ds_report_conf_corr', 'mrg_compcor', 'mrg_cc_metadata')
+    ])
+
+    join = pe.Node(niu.Function(output_names=["out_file"], function=_to_join),
+                   name="join_carry_over")
+    mrg_conf_metadata = pe.Node(niu.Merge(2), name='merge_confound_metadata',
+                                run_without_submitting=True)
+    mrg_conf_metadata2 = pe.Node(DictMerge(), name='merge_confound_metadata2',
+                                 run_without_submitting=True)
+
+    ds_confounds = pe.Node(DerivativesDataSink(
+        base_directory=output_dir, desc='confounds', suffix='timeseries',
+        dismiss_entities=("echo",), source_file=source_file),
+        name="ds_confounds", run_without_submitting=True,
+        mem_gb=DEFAULT_MEMORY_MIN_GB)
+    ds_confounds_npz = pe.Node(TSV2NPZ(), name="ds_confounds_npz",
+                               run_without_submitting=True, mem_gb=DEFAULT_MEMORY_MIN_GB)
+
+    workflow.connect([
+        (inputnode, bold_confounds_wf, [
+            ('t1w_acompcor_masks', 'inputnode.t1w_acompcor_masks')]),
+        (previous, bold_confounds_wf, [('movpar_file', 'inputnode.movpar_file'),
+                                       ('rmsd_file', 'inputnode.rmsd_file'),
+                                       ('skip_vols', 'inputnode.skip_vols')]),
+        (bold_confounds_wf, join, [('outputnode.confounds_file', 'in_file')]),
+        (previous, join, [('carry_over_file', 'join_file')]),
+        (bold_confounds_wf, mrg_conf_metadata, [('outputnode.confounds_metadata', 'in1')]),
+        (previous, mrg_conf_metadata, [('carry_over_metadata', 'in2')]),
+        (mrg_conf_metadata, mrg_conf_metadata2, [('out', 'in_dicts')]),
+        (join, ds_confounds, [('out_file', 'in_file')]),
+        (mrg_conf_metadata2, ds_confounds, [('out_dict', 'meta_dict')]),
+        (join, ds_confounds_npz, [('out_file', 'in_file')]),
+        (ds_confounds, ds_confounds_npz, [(('out_file', _npz_name), 'out_file')]),
+        (join, outputnode, [('out_file', 'confounds_file')]),
+        (mrg_conf_metadata2, outputnode, [('out_dict', 'confounds_metadata')]),
+    ])
+    return workflow
+
+
 def init_carpetplot_wf(mem_gb, metadata, cifti_output, name="bold_carpet_wf"):
     """
     Build a workflow to generate *carpet* plots.
@@ -468,7 +674,7 @@ def init_carpetplot_wf(mem_gb, metadata, cifti_output, name="bold_carpet_wf"):
     bold_mask
         BOLD series mask
     confounds_file
-        TSV of all aggregated confounds
+        Table of aggregated confounds (TSV or its columnar binary counterpart)
     t1_bold_xform
         Affine matrix that maps the T1w space into alignment with
         the native BOLD space
@@ -552,6 +758,7 @@ def init_ica_aroma_wf(
     metadata,
     omp_nthreads,
     aroma_melodic_dim=-200,
+    aroma_native=False,
     err_on_aroma_warn=False,
     name='ica_aroma_wf',
     susan_fwhm=6.0,
@@ -614,6 +821,10 @@ def init_ica_aroma_wf(
         Negative numbers set a maximum on automatic dimensionality estimation.
         Positive numbers set an exact number of components to extract.
         (default: -200, i.e., estimate <=200 components)
+    aroma_native : :obj:`bool`
+        Classify components and denoise in-process with
+        :py:class:`~fmriprep.interfaces.aroma.ICAAROMARPT`, instead of
+        running ``ICA_AROMA.py``.
 
     Inputs
     ------
@@ -650,6 +861,8 @@ def init_ica_aroma_wf(
     from niworkflows.engine.workflows import LiterateWorkflow as Workflow
     from niworkflows.interfaces.reportlets.segmentation import ICA_AROMARPT
     from niworkflows.interfaces.utility import KeySelect, TSV2JSON
+    from ...interfaces.aroma import ICAAROMARPT
+    from ...interfaces.maths import SUSANStats
 
     workflow = Workflow(name=name)
     workflow.__postdesc__ = """\
@@ -686,13 +899,8 @@ in the corresponding confounds file.
                                                output_names=['bold_cut']),
                                   name='rm_nonsteady')
 
-    calc_median_val = pe.Node(fsl.ImageStats(op_string='-k %s -p 50'), name='calc_median_val')
-    calc_bold_mean = pe.Node(fsl.MeanImage(), name='calc_bold_mean')
-
-    def _getusans_func(image, thresh):
-        return [tuple([image, thresh])]
-    getusans = pe.Node(niu.Function(function=_getusans_func, output_names=['usans']),
-                       name='getusans', mem_gb=0.01)
+    # Temporal mean and masked median, with a single read of the series
+    susan_stats = pe.Node(SUSANStats(), name='susan_stats', mem_gb=mem_gb)
 
     smooth = pe.Node(fsl.SUSAN(fwhm=susan_fwhm), name='smooth')
 
@@ -702,9 +910,14 @@ in the corresponding confounds file.
         dim=aroma_melodic_dim), name="melodic")
 
     # ica_aroma node
-    ica_aroma = pe.Node(ICA_AROMARPT(
-        denoise_type='nonaggr', generate_report=True, TR=metadata['RepetitionTime'],
-        args='-np'), name='ica_aroma')
+    if aroma_native:
+        ica_aroma = pe.Node(ICAAROMARPT(
+            denoise_type='nonaggr', generate_report=True, TR=metadata['RepetitionTime']),
+            name='ica_aroma', mem_gb=mem_gb * 3)
+    else:
+        ica_aroma = pe.Node(ICA_AROMARPT(
+            denoise_type='nonaggr', generate_report=True, TR=metadata['RepetitionTime'],
+            args='-np'), name='ica_aroma')
 
     add_non_steady_state = pe.Node(niu.Function(function=_add_volumes,
                                                 output_names=['bold_add']),
@@ -726,9 +939,6 @@ in the corresponding confounds file.
         name='ds_report_ica_aroma', run_without_submitting=True,
         mem_gb=DEFAULT_MEMORY_MIN_GB)
 
-    def _getbtthresh(medianval):
-        return 0.75 * medianval
-
     # connect the nodes
     workflow.connect([
         (inputnode, select_std, [('spatial_reference', 'keys'),
@@ -739,19 +949,15 @@ in the corresponding confounds file.
             ('skip_vols', 'skip_vols')]),
         (select_std, rm_non_steady_state, [
             ('bold_std', 'bold_file')]),
-        (select_std, calc_median_val, [
+        (select_std, susan_stats, [
             ('bold_mask_std', 'mask_file')]),
-        (rm_non_steady_state, calc_median_val, [
-            ('bold_cut', 'in_file')]),
-        (rm_non_steady_state, calc_bold_mean, [
+        (rm_non_steady_state, susan_stats, [
             ('bold_cut', 'in_file')]),
-        (calc_bold_mean, getusans, [('out_file', 'image')]),
-        (calc_median_val, getusans, [('out_stat', 'thresh')]),
         # Connect input nodes to complete smoothing
         (rm_non_steady_state, smooth, [
             ('bold_cut', 'in_file')]),
-        (getusans, smooth, [('usans', 'usans')]),
-        (calc_median_val, smooth, [(('out_stat', _getbtthresh), 'brightness_threshold')]),
+        (susan_stats, smooth, [('usans', 'usans'),
+                               ('brightness_threshold', 'brightness_threshold')]),
         # connect smooth to melodic
         (smooth, melodic, [('smoothed_file', 'in_files')]),
         (select_std, melodic, [
@@ -787,40 +993,27 @@ in the corresponding confounds file.
 
 
 def _remove_volumes(bold_file, skip_vols):
-    """Remove skip_vols from bold_file."""
-    import nibabel as nb
+    """Remove skip_vols from bold_file, writing an uncompressed series."""
+    import os
     from nipype.utils.filemanip import fname_presuffix
+    from fmriprep.utils.images import concat_volumes
 
     if skip_vols == 0:
         return bold_file
 
-    out = fname_presuffix(bold_file, suffix='_cut')
-    bold_img = nb.load(bold_file)
-    bold_img.__class__(bold_img.dataobj[..., skip_vols:],
-                       bold_img.affine, bold_img.header).to_filename(out)
-    return out
+    out = fname_presuffix(bold_file, suffix='_cut.nii', use_ext=False, newpath=os.getcwd())
+    return concat_volumes([(bold_file, skip_vols, None)], out)
 
 
 def _add_volumes(bold_file, bold_cut_file, skip_vols):
-    """Prepend skip_vols from bold_file onto bold_cut_file."""
-    import nibabel as nb
-    import numpy as np
+    """Prepend skip_vols from bold_file onto bold_cut_file, writing an uncompressed series."""
+    import os
     from nipype.utils.filemanip import fname_presuffix
+    from fmriprep.utils.images import concat_volumes
 
     if skip_vols == 0:
         return bold_cut_file
 
-    bold_img = nb.load(bold_file)
-    bold_cut_img = nb.load(bold_cut_file)
-
-    bold_data = np.concatenate((bold_img.dataobj[..., :skip_vols],
-                                bold_cut_img.dataobj), axis=3)
-
-    out = fname_presuffix(bold_cut_file, suffix='_addnonsteady')
-    bold_img.__class__(bold_data, bold_img.affine, bold_img.header).to_filename(out)
-    return out
-
-
-def _get_zooms(in_file):
-    import nibabel as nb
-    return tuple(nb.load(in_file).header.get_zooms()[:3])
+    out = fname_presuffix(bold_cut_file, suffix='_addnonsteady.nii', use_ext=False,
+                          newpath=os.getcwd())
+    return concat_volumes([(bold_file, 0, skip_vols), (bold_cut_file, 0, None)], out)
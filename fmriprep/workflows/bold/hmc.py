@@ -34,7 +34,8 @@ from nipype.interfaces import utility as niu, fsl
 from ...config import DEFAULT_MEMORY_MIN_GB
 
 
-def init_bold_hmc_wf(mem_gb, omp_nthreads, name='bold_hmc_wf'):
+def init_bold_hmc_wf(mem_gb, omp_nthreads, name='bold_hmc_wf', fused=False, write_itk=False,
+                     chunked=False):
     """
     Build a workflow to estimate head-motion parameters.
 
@@ -60,6 +61,15 @@ def init_bold_hmc_wf(mem_gb, omp_nthreads, name='bold_hmc_wf'):
         Maximum number of threads an individual process may use
     name : :obj:`str`
         Name of workflow (default: ``bold_hmc_wf``)
+    fused : :obj:`bool`
+        Convert the MCFLIRT matrices in-process into a single stack of affines
+        (see :py:class:`~fmriprep.interfaces.resampling.MCFLIRT2Stack`), for the
+        in-process resamplers, instead of running ``c3d_affine_tool`` on each of them
+    write_itk : :obj:`bool`
+        Also write the transforms in ITK format (only if ``fused``)
+    chunked : :obj:`bool`
+        Run ``omp_nthreads`` MCFLIRT processes concurrently, on chunks of consecutive
+        volumes (see :py:class:`~fmriprep.interfaces.hmc.ChunkedMCFLIRT`)
 
     Inputs
     ------
@@ -72,6 +82,10 @@ def init_bold_hmc_wf(mem_gb, omp_nthreads, name='bold_hmc_wf'):
     -------
     xforms
         ITKTransform file aligning each volume to ``ref_image``
+        (if ``fused``, a ``.npy`` stack of RAS affines)
+    itk_xforms
+        ITKTransform file aligning each volume to ``ref_image``
+        (if ``fused``, only with ``write_itk``)
     movpar_file
         MCFLIRT motion parameters, normalized to SPM format (X, Y, Z, Rx, Ry, Rz)
     rms_file
@@ -81,6 +95,8 @@ def init_bold_hmc_wf(mem_gb, omp_nthreads, name='bold_hmc_wf'):
     from niworkflows.engine.workflows import LiterateWorkflow as Workflow
     from niworkflows.interfaces.confounds import NormalizeMotionParams
     from niworkflows.interfaces.itk import MCFLIRT2ITK
+    from ...interfaces.hmc import ChunkedMCFLIRT
+    from ...interfaces.resampling import MCFLIRT2Stack
 
     workflow = Workflow(name=name)
     workflow.__desc__ = """\
@@ -95,16 +111,25 @@ parameters) are estimated before any spatiotemporal filtering using
         name='inputnode')
     outputnode = pe.Node(
         niu.IdentityInterface(
-            fields=['xforms', 'movpar_file', 'rmsd_file']),
+            fields=['xforms', 'itk_xforms', 'movpar_file', 'rmsd_file']),
         name='outputnode')
 
     # Head motion correction (hmc)
-    mcflirt = pe.Node(
-        fsl.MCFLIRT(save_mats=True, save_plots=True, save_rms=True),
-        name='mcflirt', mem_gb=mem_gb * 3)
-
-    fsl2itk = pe.Node(MCFLIRT2ITK(), name='fsl2itk',
-                      mem_gb=0.05, n_procs=omp_nthreads)
+    if chunked:
+        mcflirt = pe.Node(ChunkedMCFLIRT(), name='mcflirt',
+                          mem_gb=mem_gb * 3, n_procs=omp_nthreads)
+    else:
+        mcflirt = pe.Node(
+            fsl.MCFLIRT(save_mats=True, save_plots=True, save_rms=True),
+            name='mcflirt', mem_gb=mem_gb * 3)
+
+    if fused:
+        fsl2itk = pe.Node(MCFLIRT2Stack(write_itk=write_itk), name='fsl2itk', mem_gb=0.05)
+        xforms = [('out_file', 'xforms')] + write_itk * [('itk_file', 'itk_xforms')]
+    else:
+        fsl2itk = pe.Node(MCFLIRT2ITK(), name='fsl2itk',
+                          mem_gb=0.05, n_procs=omp_nthreads)
+        xforms = [('out_file', 'xforms'), ('out_file', 'itk_xforms')]
 
     normalize_motion = pe.Node(NormalizeMotionParams(format='FSL'),
                                name="normalize_motion",
@@ -121,7 +146,7 @@ parameters) are estimated before any spatiotemporal filtering using
         (mcflirt, fsl2itk, [('mat_file', 'in_files')]),
         (mcflirt, normalize_motion, [('par_file', 'in_file')]),
         (mcflirt, outputnode, [(('rms_files', _pick_rel), 'rmsd_file')]),
-        (fsl2itk, outputnode, [('out_file', 'xforms')]),
+        (fsl2itk, outputnode, xforms),
         (normalize_motion, outputnode, [('out_file', 'movpar_file')]),
     ])
 
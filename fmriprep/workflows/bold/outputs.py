@@ -158,6 +158,7 @@ def init_func_derivatives_wf(
     from niworkflows.engine.workflows import LiterateWorkflow as Workflow
     from niworkflows.interfaces.utility import KeySelect
     from smriprep.workflows.outputs import _bids_relative
+    from ...interfaces.confounds import TSV2NPZ
 
     metadata = all_metadata[0]
 
@@ -190,6 +191,9 @@ def init_func_derivatives_wf(
         dismiss_entities=("echo",)),
         name="ds_confounds", run_without_submitting=True,
         mem_gb=DEFAULT_MEMORY_MIN_GB)
+    # Columnar binary copy of the confounds, next to the TSV
+    ds_confounds_npz = pe.Node(TSV2NPZ(), name="ds_confounds_npz",
+                               run_without_submitting=True, mem_gb=DEFAULT_MEMORY_MIN_GB)
     ds_ref_t1w_xfm = pe.Node(
         DerivativesDataSink(base_directory=output_dir, to='T1w',
                             mode='image', suffix='xfm',
@@ -210,6 +214,8 @@ def init_func_derivatives_wf(
         (inputnode, ds_confounds, [('source_file', 'source_file'),
                                    ('confounds', 'in_file'),
                                    ('confounds_metadata', 'meta_dict')]),
+        (inputnode, ds_confounds_npz, [('confounds', 'in_file')]),
+        (ds_confounds, ds_confounds_npz, [(('out_file', _npz_name), 'out_file')]),
         (inputnode, ds_ref_t1w_xfm, [('source_file', 'source_file'),
                                      ('bold2anat_xfm', 'in_file')]),
         (inputnode, ds_ref_t1w_inv_xfm, [('source_file', 'source_file'),
@@ -577,3 +583,8 @@ def _read_json(in_file):
     from pathlib import Path
     from json import loads
     return loads(Path(in_file).read_text())
+
+
+def _npz_name(in_file):
+    from pathlib import Path
+    return str(Path(in_file).with_suffix('.npz'))
@@ -197,7 +197,7 @@ def init_bold_reg_wf(
 
 
 def init_bold_t1_trans_wf(freesurfer, mem_gb, omp_nthreads, use_compression=True,
-                          name='bold_t1_trans_wf'):
+                          name='bold_t1_trans_wf', fused=False):
     """
     Co-register the reference BOLD image to T1w-space.
 
@@ -225,6 +225,12 @@ def init_bold_t1_trans_wf(freesurfer, mem_gb, omp_nthreads, use_compression=True
         Save registered BOLD series as ``.nii.gz``
     name : :obj:`str`
         Name of workflow (default: ``bold_reg_wf``)
+    fused : :obj:`bool`
+        Resample the whole series in one process
+        (see :py:class:`~fmriprep.interfaces.resampling.ResampleSeries`),
+        instead of splitting it and merging the resampled volumes back;
+        the mask and segmentations are then resampled together
+        (see :py:class:`~fmriprep.interfaces.resampling.ResampleLabels`)
 
     Inputs
     ------
@@ -248,6 +254,7 @@ def init_bold_t1_trans_wf(freesurfer, mem_gb, omp_nthreads, use_compression=True
         (only if ``recon-all`` was run).
     bold_split
         Individual 3D BOLD volumes, not motion corrected
+        (if ``fused``, the 4D series may be given instead)
     hmc_xforms
         List of affine transforms aligning each volume to ``ref_image`` in ITK format
     itk_bold_to_t1
@@ -277,11 +284,11 @@ def init_bold_t1_trans_wf(freesurfer, mem_gb, omp_nthreads, use_compression=True
 
     """
     from fmriprep.interfaces.maths import Clip
+    from fmriprep.interfaces.resampling import MergeSeries, ResampleLabels, ResampleSeries
     from niworkflows.engine.workflows import LiterateWorkflow as Workflow
     from niworkflows.func.util import init_bold_reference_wf
     from niworkflows.interfaces.fixes import FixHeaderApplyTransforms as ApplyTransforms
     from niworkflows.interfaces.itk import MultiApplyTransforms
-    from niworkflows.interfaces.nilearn import Merge
     from niworkflows.interfaces.nibabel import GenerateSamplingReference
 
     workflow = Workflow(name=name)
@@ -304,20 +311,54 @@ def init_bold_t1_trans_wf(freesurfer, mem_gb, omp_nthreads, use_compression=True
     gen_ref = pe.Node(GenerateSamplingReference(), name='gen_ref',
                       mem_gb=0.3)  # 256x256x256 * 64 / 8 ~ 150MB
 
-    mask_t1w_tfm = pe.Node(ApplyTransforms(interpolation='MultiLabel'),
-                           name='mask_t1w_tfm', mem_gb=0.1)
-
     workflow.connect([
         (inputnode, gen_ref, [('ref_bold_brain', 'moving_image'),
                               ('t1w_brain', 'fixed_image'),
                               ('t1w_mask', 'fov_mask')]),
-        (inputnode, mask_t1w_tfm, [('ref_bold_mask', 'input_image')]),
-        (gen_ref, mask_t1w_tfm, [('out_file', 'reference_image')]),
-        (inputnode, mask_t1w_tfm, [('itk_bold_to_t1', 'transforms')]),
-        (mask_t1w_tfm, outputnode, [('output_image', 'bold_mask_t1')]),
     ])
 
-    if freesurfer:
+    if fused:
+        # Resample the mask and the segmentations in one process
+        n_labels = 1 + 2 * freesurfer
+        labels_t1w_tfm = pe.Node(ResampleLabels(transforms=['identity']),
+                                 name='labels_t1w_tfm', mem_gb=0.3)
+        merge_labels = pe.Node(niu.Merge(n_labels), name='merge_labels',
+                               run_without_submitting=True, mem_gb=DEFAULT_MEMORY_MIN_GB)
+        merge_label_xfms = pe.Node(niu.Merge(n_labels), name='merge_label_xfms',
+                                   run_without_submitting=True, mem_gb=DEFAULT_MEMORY_MIN_GB)
+        for i in range(2, n_labels + 1):
+            setattr(merge_label_xfms.inputs, f'in{i}', 'identity')
+        mask_t1w = (labels_t1w_tfm, 'out_files')
+        workflow.connect([
+            (inputnode, merge_labels, [('ref_bold_mask', 'in1')]),
+            (inputnode, merge_label_xfms, [('itk_bold_to_t1', 'in1')]),
+            (gen_ref, labels_t1w_tfm, [('out_file', 'reference_image')]),
+            (merge_labels, labels_t1w_tfm, [('out', 'in_files')]),
+            (merge_label_xfms, labels_t1w_tfm, [('out', 'in_transforms')]),
+        ])
+        if freesurfer:
+            split_labels = pe.Node(niu.Split(splits=[1, 1, 1], squeeze=True),
+                                   name='split_labels', run_without_submitting=True,
+                                   mem_gb=DEFAULT_MEMORY_MIN_GB)
+            mask_t1w = (split_labels, 'out1')
+            workflow.connect([
+                (labels_t1w_tfm, split_labels, [('out_files', 'inlist')]),
+                (inputnode, merge_labels, [('t1w_aseg', 'in2'),
+                                           ('t1w_aparc', 'in3')]),
+                (split_labels, outputnode, [('out2', 'bold_aseg_t1'),
+                                            ('out3', 'bold_aparc_t1')]),
+            ])
+    else:
+        mask_t1w_tfm = pe.Node(ApplyTransforms(interpolation='MultiLabel'),
+                               name='mask_t1w_tfm', mem_gb=0.1)
+        mask_t1w = (mask_t1w_tfm, 'output_image')
+        workflow.connect([
+            (inputnode, mask_t1w_tfm, [('ref_bold_mask', 'input_image')]),
+            (gen_ref, mask_t1w_tfm, [('out_file', 'reference_image')]),
+            (inputnode, mask_t1w_tfm, [('itk_bold_to_t1', 'transforms')]),
+        ])
+
+    if freesurfer and not fused:
         # Resample aseg and aparc in T1w space (no transforms needed)
         aseg_t1w_tfm = pe.Node(
             ApplyTransforms(interpolation='MultiLabel', transforms='identity'),
@@ -335,19 +376,32 @@ def init_bold_t1_trans_wf(freesurfer, mem_gb, omp_nthreads, use_compression=True
             (aparc_t1w_tfm, outputnode, [('output_image', 'bold_aparc_t1')]),
         ])
 
-    bold_to_t1w_transform = pe.Node(
-        MultiApplyTransforms(interpolation="LanczosWindowedSinc", float=True, copy_dtype=True),
-        name='bold_to_t1w_transform', mem_gb=mem_gb * 3 * omp_nthreads, n_procs=omp_nthreads)
-
-    # Interpolation can occasionally produce below-zero values as an artifact
-    threshold = pe.MapNode(
-        Clip(minimum=0),
-        name="threshold",
-        iterfield=['in_file'],
-        mem_gb=DEFAULT_MEMORY_MIN_GB)
+    if fused:
+        # Resample, clip and write the series in one shot
+        bold_to_t1w_transform = pe.Node(
+            ResampleSeries(compress=use_compression),
+            name='bold_to_t1w_transform', mem_gb=mem_gb * 3, n_procs=omp_nthreads)
+        merge = bold_to_t1w_transform
+    else:
+        bold_to_t1w_transform = pe.Node(
+            MultiApplyTransforms(interpolation="LanczosWindowedSinc", float=True,
+                                 copy_dtype=True),
+            name='bold_to_t1w_transform', mem_gb=mem_gb * 3 * omp_nthreads,
+            n_procs=omp_nthreads)
+
+        # Interpolation can occasionally produce below-zero values as an artifact
+        threshold = pe.MapNode(
+            Clip(minimum=0),
+            name="threshold",
+            iterfield=['in_file'],
+            mem_gb=DEFAULT_MEMORY_MIN_GB)
 
-    # merge 3D volumes into 4D timeseries
-    merge = pe.Node(Merge(compress=use_compression), name='merge', mem_gb=mem_gb)
+        # merge 3D volumes into 4D timeseries
+        merge = pe.Node(MergeSeries(compress=use_compression), name='merge', mem_gb=0.1)
+        workflow.connect([
+            (bold_to_t1w_transform, threshold, [('out_files', 'in_file')]),
+            (threshold, merge, [('out_file', 'in_files')]),
+        ])
 
     # Generate a reference on the target T1w space
     gen_final_ref = init_bold_reference_wf(omp_nthreads, pre_mask=True)
@@ -362,13 +416,13 @@ def init_bold_t1_trans_wf(freesurfer, mem_gb, omp_nthreads, use_compression=True
             ('hmc_xforms', 'in3'),  # May be 'identity' if HMC already applied
             ('fieldwarp', 'in2'),   # May be 'identity' if SDC already applied
             ('itk_bold_to_t1', 'in1')]),
-        (inputnode, bold_to_t1w_transform, [('bold_split', 'input_image')]),
+        (inputnode, bold_to_t1w_transform, [
+            ('bold_split', 'in_files' if fused else 'input_image')]),
         (merge_xforms, bold_to_t1w_transform, [('out', 'transforms')]),
         (gen_ref, bold_to_t1w_transform, [('out_file', 'reference_image')]),
-        (bold_to_t1w_transform, threshold, [('out_files', 'in_file')]),
-        (threshold, merge, [('out_file', 'in_files')]),
         (merge, gen_final_ref, [('out_file', 'inputnode.bold_file')]),
-        (mask_t1w_tfm, gen_final_ref, [('output_image', 'inputnode.bold_mask')]),
+        (mask_t1w[0], gen_final_ref, [(mask_t1w[1], 'inputnode.bold_mask')]),
+        (mask_t1w[0], outputnode, [(mask_t1w[1], 'bold_mask_t1')]),
         (merge, outputnode, [('out_file', 'bold_t1')]),
         (gen_final_ref, outputnode, [('outputnode.ref_image', 'bold_t1_ref')]),
     ])
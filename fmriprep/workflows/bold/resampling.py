@@ -36,7 +36,14 @@ from nipype.interfaces import utility as niu, freesurfer as fs
 import nipype.interfaces.workbench as wb
 
 
-def init_bold_surf_wf(mem_gb, surface_spaces, medial_surface_nan, name="bold_surf_wf"):
+def init_bold_surf_wf(
+    mem_gb,
+    surface_spaces,
+    medial_surface_nan,
+    name="bold_surf_wf",
+    fused=False,
+    cache_dir=None,
+):
     """
     Sample functional images to FreeSurfer surfaces.
 
@@ -63,6 +70,13 @@ def init_bold_surf_wf(mem_gb, surface_spaces, medial_surface_nan, name="bold_sur
         native surface.
     medial_surface_nan : :obj:`bool`
         Replace medial wall values with NaNs on functional GIFTI files
+    fused : :obj:`bool`
+        Sample the whole series onto both hemispheres in one process, with a sparse
+        projection matrix (see :py:class:`~fmriprep.interfaces.resampling.VolumeToSurface`),
+        instead of running ``mri_vol2surf`` for each hemisphere
+    cache_dir : :obj:`str` or None
+        Directory where the projection matrices are kept for reuse by other runs
+        (only if ``fused``)
 
     Inputs
     ------
@@ -105,10 +119,6 @@ The BOLD time-series were resampled onto the following surfaces
     itersource = pe.Node(niu.IdentityInterface(fields=["target"]), name="itersource")
     itersource.iterables = [("target", surface_spaces)]
 
-    get_fsnative = pe.Node(
-        FreeSurferSource(), name="get_fsnative", run_without_submitting=True
-    )
-
     def select_target(subject_id, space):
         """Get the target subject ID, given a source subject ID and a target space."""
         return subject_id if space == "fsnative" else space
@@ -120,6 +130,42 @@ The BOLD time-series were resampled onto the following surfaces
         mem_gb=DEFAULT_MEMORY_MIN_GB,
     )
 
+    outputnode = pe.JoinNode(
+        niu.IdentityInterface(fields=["surfaces", "target"]),
+        joinsource="itersource",
+        name="outputnode",
+    )
+
+    if fused:
+        from ...interfaces.resampling import VolumeToSurface
+
+        sampler = pe.Node(
+            VolumeToSurface(medial_surface_nan=medial_surface_nan),
+            name="sampler",
+            mem_gb=mem_gb * 3,
+        )
+        if cache_dir:
+            sampler.inputs.cache_dir = cache_dir
+
+        # fmt:off
+        workflow.connect([
+            (inputnode, targets, [("subject_id", "subject_id")]),
+            (inputnode, sampler, [("source_file", "source_file"),
+                                  ("subjects_dir", "subjects_dir"),
+                                  ("subject_id", "subject_id"),
+                                  ("t1w2fsnative_xfm", "t1w2fsnative_xfm")]),
+            (itersource, targets, [("target", "space")]),
+            (targets, sampler, [("out", "target_subject")]),
+            (sampler, outputnode, [("out_files", "surfaces")]),
+            (itersource, outputnode, [("target", "target")]),
+        ])
+        # fmt:on
+        return workflow
+
+    get_fsnative = pe.Node(
+        FreeSurferSource(), name="get_fsnative", run_without_submitting=True
+    )
+
     # Rename the source file to the output space to simplify naming later
     rename_src = pe.Node(
         niu.Rename(format_string="%(subject)s", keep_ext=True),
@@ -152,12 +198,6 @@ The BOLD time-series were resampled onto the following surfaces
         mem_gb=DEFAULT_MEMORY_MIN_GB,
     )
 
-    outputnode = pe.JoinNode(
-        niu.IdentityInterface(fields=["surfaces", "target"]),
-        joinsource="itersource",
-        name="outputnode",
-    )
-
     # fmt:off
     workflow.connect([
         (inputnode, get_fsnative, [("subject_id", "subject_id"),
@@ -210,6 +250,10 @@ def init_bold_std_trans_wf(
     spaces,
     name="bold_std_trans_wf",
     use_compression=True,
+    fused=False,
+    cache_dir=None,
+    cifti_output=None,
+    use_aroma=False,
 ):
     """
     Sample fMRI into standard space with a single-step resampling of the original BOLD series.
@@ -260,6 +304,24 @@ def init_bold_std_trans_wf(
         Name of workflow (default: ``bold_std_trans_wf``)
     use_compression : :obj:`bool`
         Save registered BOLD series as ``.nii.gz``
+    fused : :obj:`bool`
+        Resample the whole series in one process
+        (see :py:class:`~fmriprep.interfaces.resampling.ResampleSeries`),
+        instead of splitting it and merging the resampled volumes back;
+        all standard spaces are then generated in a single pass over the series,
+        and the mask and segmentations are resampled together for each of them
+        (see :py:class:`~fmriprep.interfaces.resampling.ResampleLabels`)
+    cache_dir : :obj:`str` or None
+        Directory where the anatomical-to-standard transforms, evaluated on the
+        target grids, are kept for reuse by other runs (only if ``fused``)
+    cifti_output : :obj:`str` or None
+        Either ``"91k"`` or ``"170k"``: sample the subcortical grayordinates of
+        that density in the same pass over the series (only if ``fused``);
+        the corresponding ``MNI152NLin6Asym`` series is then only generated if
+        it was requested as an output space, or if ``use_aroma``
+    use_aroma : :obj:`bool`
+        Whether ICA-AROMA will be run on the ``MNI152NLin6Asym`` (``res-2``) series,
+        which must then be generated even if sampling the grayordinates directly
 
     Inputs
     ------
@@ -276,6 +338,7 @@ def init_bold_std_trans_wf(
         Skull-stripping mask of reference image
     bold_split
         Individual 3D volumes, not motion corrected
+        (if ``fused``, the 4D series may be given instead)
     fieldwarp
         a :abbr:`DFM (displacements field map)` in ITK format
     hmc_xforms
@@ -306,23 +369,38 @@ def init_bold_std_trans_wf(
     template
         Template identifiers synchronized correspondingly to previously
         described outputs.
+    bold_subcortical
+        BOLD series sampled at the subcortical grayordinates
+        (only if ``fused`` and ``cifti_output``)
 
     """
     from fmriprep.interfaces.maths import Clip
+    from fmriprep.interfaces.resampling import (
+        ComposeDisplacements, MergeSeries, ResampleLabels, ResampleSeries,
+    )
     from niworkflows.engine.workflows import LiterateWorkflow as Workflow
     from niworkflows.func.util import init_bold_reference_wf
     from niworkflows.interfaces.fixes import FixHeaderApplyTransforms as ApplyTransforms
     from niworkflows.interfaces.itk import MultiApplyTransforms
     from niworkflows.interfaces.utility import KeySelect
     from niworkflows.interfaces.nibabel import GenerateSamplingReference
-    from niworkflows.interfaces.nilearn import Merge
-    from niworkflows.utils.spaces import format_reference
+    from niworkflows.utils.spaces import Reference, format_reference
 
     workflow = Workflow(name=name)
     output_references = spaces.cached.get_spaces(nonstandard=False, dim=(3,))
     std_vol_references = [
         (s.fullname, s.spec) for s in spaces.references if s.standard and s.dim == 3
     ]
+    cifti_output = cifti_output if fused else None
+    if cifti_output:
+        # The volumetric grayordinates are sampled directly, skip the full series
+        # unless it is an output space or ICA-AROMA reads it
+        cifti_ref = Reference("MNI152NLin6Asym", {"res": "2" if cifti_output == "91k" else "1"})
+        keep_series = use_aroma and cifti_output == "91k"
+        if cifti_ref not in spaces.cached.references and not keep_series:
+            std_vol_references = [
+                ref for ref in std_vol_references if ref != (cifti_ref.fullname, cifti_ref.spec)
+            ]
 
     if len(output_references) == 1:
         workflow.__desc__ = """\
@@ -390,18 +468,6 @@ preprocessed BOLD runs*: {tpl}.
         GenerateSamplingReference(), name="gen_ref", mem_gb=0.3
     )  # 256x256x256 * 64 / 8 ~ 150MB)
 
-    mask_std_tfm = pe.Node(
-        ApplyTransforms(interpolation="MultiLabel"), name="mask_std_tfm", mem_gb=1
-    )
-
-    # Write corrected file in the designated output dir
-    mask_merge_tfms = pe.Node(
-        niu.Merge(2),
-        name="mask_merge_tfms",
-        run_without_submitting=True,
-        mem_gb=DEFAULT_MEMORY_MIN_GB,
-    )
-
     merge_xforms = pe.Node(
         niu.Merge(4),
         name="merge_xforms",
@@ -409,23 +475,196 @@ preprocessed BOLD runs*: {tpl}.
         mem_gb=DEFAULT_MEMORY_MIN_GB,
     )
 
-    bold_to_std_transform = pe.Node(
-        MultiApplyTransforms(
-            interpolation="LanczosWindowedSinc", float=True, copy_dtype=True
-        ),
-        name="bold_to_std_transform",
-        mem_gb=mem_gb * 3 * omp_nthreads,
-        n_procs=omp_nthreads,
-    )
+    if fused:
+        # Evaluate the anatomical-to-standard transform on the target grid once
+        std_warp = pe.Node(ComposeDisplacements(), name="std_warp", mem_gb=mem_gb * 3)
+        if cache_dir:
+            std_warp.inputs.cache_dir = cache_dir
+
+        # Gather all targets, so that the series is resampled onto them in one pass
+        join_targets = pe.JoinNode(
+            niu.IdentityInterface(fields=["reference_image", "target_transforms"]),
+            joinsource="iterablesource",
+            joinfield=["reference_image", "target_transforms"],
+            name="join_targets",
+        )
+        # Resample, clip and write the series in one shot
+        bold_to_std_transform = pe.Node(
+            ResampleSeries(compress=use_compression),
+            name="bold_to_std_transform",
+            mem_gb=mem_gb * 3 * len(std_vol_references),
+            n_procs=omp_nthreads,
+        )
+        merge_xforms.inputs.in1 = "identity"  # Given for each target instead
+        merge = pe.Node(
+            niu.Function(function=_select_target, output_names=["out_file"]),
+            name="select_bold",
+            run_without_submitting=True,
+        )
+        merge.inputs.targets = std_vol_references
+        # fmt:off
+        workflow.connect([
+            (iterablesource, merge, [("std_target", "target")]),
+            (inputnode, bold_to_std_transform, [("name_source", "header_source")]),
+            (select_std, std_warp, [("anat2std_xfm", "transforms")]),
+            (gen_ref, std_warp, [("out_file", "reference_image")]),
+            (gen_ref, join_targets, [("out_file", "reference_image")]),
+            (std_warp, join_targets, [("out_file", "target_transforms")]),
+            (bold_to_std_transform, merge, [("out_file", "in_files")]),
+        ])
+        # fmt:on
 
-    # Interpolation can occasionally produce below-zero values as an artifact
-    threshold = pe.MapNode(
-        Clip(minimum=0),
-        name="threshold",
-        iterfield=['in_file'],
-        mem_gb=DEFAULT_MEMORY_MIN_GB)
+        if not cifti_output:
+            # fmt:off
+            workflow.connect([
+                (join_targets, bold_to_std_transform, [
+                    ("reference_image", "reference_image"),
+                    ("target_transforms", "target_transforms")]),
+            ])
+            # fmt:on
+        else:
+            import templateflow.api as tf
+
+            # Sample the labelled voxels of the subcortical grayordinates only,
+            # as an additional target of the same pass over the series
+            label_file = str(tf.get(
+                "MNI152NLin6Asym", atlas="HCP", suffix="dseg",
+                resolution="2" if cifti_output == "91k" else "6",
+            ))
+            select_cifti_std = pe.Node(
+                KeySelect(fields=["anat2std_xfm"], key="MNI152NLin6Asym"),
+                name="select_cifti_std",
+                run_without_submitting=True,
+            )
+            cifti_warp = pe.Node(
+                ComposeDisplacements(reference_image=label_file),
+                name="cifti_warp",
+                mem_gb=mem_gb * 3,
+            )
+            if cache_dir:
+                cifti_warp.inputs.cache_dir = cache_dir
+            add_subcortical = pe.Node(
+                niu.Function(
+                    function=_add_masked_target,
+                    output_names=["reference_image", "target_transforms", "reference_mask"],
+                ),
+                name="add_subcortical",
+                run_without_submitting=True,
+            )
+            add_subcortical.inputs.mask = label_file
+            select_subcortical = pe.Node(
+                niu.Select(index=-1), name="select_subcortical", run_without_submitting=True
+            )
+            # fmt:off
+            workflow.connect([
+                (inputnode, select_cifti_std, [("anat2std_xfm", "anat2std_xfm"),
+                                               ("templates", "keys")]),
+                (select_cifti_std, cifti_warp, [("anat2std_xfm", "transforms")]),
+                (join_targets, add_subcortical, [
+                    ("reference_image", "reference_images"),
+                    ("target_transforms", "target_transforms")]),
+                (cifti_warp, add_subcortical, [("out_file", "target_transform")]),
+                (add_subcortical, bold_to_std_transform, [
+                    ("reference_image", "reference_image"),
+                    ("target_transforms", "target_transforms"),
+                    ("reference_mask", "reference_mask")]),
+                (bold_to_std_transform, select_subcortical, [("out_file", "inlist")]),
+            ])
+            # fmt:on
+    else:
+        bold_to_std_transform = pe.Node(
+            MultiApplyTransforms(
+                interpolation="LanczosWindowedSinc", float=True, copy_dtype=True
+            ),
+            name="bold_to_std_transform",
+            mem_gb=mem_gb * 3 * omp_nthreads,
+            n_procs=omp_nthreads,
+        )
+
+        # Interpolation can occasionally produce below-zero values as an artifact
+        threshold = pe.MapNode(
+            Clip(minimum=0),
+            name="threshold",
+            iterfield=['in_file'],
+            mem_gb=DEFAULT_MEMORY_MIN_GB)
+
+        # Only one volume is held in memory at a time
+        merge = pe.Node(MergeSeries(compress=use_compression), name="merge", mem_gb=0.1)
+        # fmt:off
+        workflow.connect([
+            (inputnode, merge, [("name_source", "header_source")]),
+            (select_std, merge_xforms, [("anat2std_xfm", "in1")]),
+            (gen_ref, bold_to_std_transform, [("out_file", "reference_image")]),
+            (bold_to_std_transform, threshold, [("out_files", "in_file")]),
+            (threshold, merge, [("out_file", "in_files")]),
+        ])
+        # fmt:on
 
-    merge = pe.Node(Merge(compress=use_compression), name="merge", mem_gb=mem_gb * 3)
+    if fused:
+        # Resample the mask and the segmentations in one process, through the
+        # anatomical-to-standard transform already evaluated on the target grid
+        n_labels = 1 + 2 * freesurfer
+        labels_std_tfm = pe.Node(ResampleLabels(), name="labels_std_tfm", mem_gb=1)
+        merge_labels = pe.Node(
+            niu.Merge(n_labels),
+            name="merge_labels",
+            run_without_submitting=True,
+            mem_gb=DEFAULT_MEMORY_MIN_GB,
+        )
+        merge_label_xfms = pe.Node(
+            niu.Merge(n_labels),
+            name="merge_label_xfms",
+            run_without_submitting=True,
+            mem_gb=DEFAULT_MEMORY_MIN_GB,
+        )
+        for i in range(2, n_labels + 1):
+            setattr(merge_label_xfms.inputs, f"in{i}", "identity")
+        mask_std = (labels_std_tfm, "out_files")
+        # fmt:off
+        workflow.connect([
+            (inputnode, merge_labels, [("bold_mask", "in1")]),
+            (inputnode, merge_label_xfms, [("itk_bold_to_t1", "in1")]),
+            (std_warp, labels_std_tfm, [("out_file", "transforms")]),
+            (gen_ref, labels_std_tfm, [("out_file", "reference_image")]),
+            (merge_labels, labels_std_tfm, [("out", "in_files")]),
+            (merge_label_xfms, labels_std_tfm, [("out", "in_transforms")]),
+        ])
+        # fmt:on
+        if freesurfer:
+            split_labels = pe.Node(
+                niu.Split(splits=[1, 1, 1], squeeze=True),
+                name="split_labels",
+                run_without_submitting=True,
+                mem_gb=DEFAULT_MEMORY_MIN_GB,
+            )
+            mask_std = (split_labels, "out1")
+            # fmt:off
+            workflow.connect([
+                (inputnode, merge_labels, [("bold_aseg", "in2"),
+                                           ("bold_aparc", "in3")]),
+                (labels_std_tfm, split_labels, [("out_files", "inlist")]),
+            ])
+            # fmt:on
+    else:
+        mask_std_tfm = pe.Node(
+            ApplyTransforms(interpolation="MultiLabel"), name="mask_std_tfm", mem_gb=1
+        )
+        mask_merge_tfms = pe.Node(
+            niu.Merge(2),
+            name="mask_merge_tfms",
+            run_without_submitting=True,
+            mem_gb=DEFAULT_MEMORY_MIN_GB,
+        )
+        mask_std = (mask_std_tfm, "output_image")
+        # fmt:off
+        workflow.connect([
+            (inputnode, mask_std_tfm, [("bold_mask", "input_image")]),
+            (inputnode, mask_merge_tfms, [(("itk_bold_to_t1", _aslist), "in2")]),
+            (select_std, mask_merge_tfms, [("anat2std_xfm", "in1")]),
+            (gen_ref, mask_std_tfm, [("out_file", "reference_image")]),
+            (mask_merge_tfms, mask_std_tfm, [("out", "transforms")]),
+        ])
+        # fmt:on
 
     # Generate a reference on the target standard space
     gen_final_ref = init_bold_reference_wf(omp_nthreads=omp_nthreads, pre_mask=True)
@@ -435,26 +674,17 @@ preprocessed BOLD runs*: {tpl}.
         (iterablesource, select_tpl, [("std_target", "template")]),
         (inputnode, select_std, [("anat2std_xfm", "anat2std_xfm"),
                                  ("templates", "keys")]),
-        (inputnode, mask_std_tfm, [("bold_mask", "input_image")]),
         (inputnode, gen_ref, [(("bold_split", _first), "moving_image")]),
         (inputnode, merge_xforms, [("hmc_xforms", "in4"),
                                    ("fieldwarp", "in3"),
                                    (("itk_bold_to_t1", _aslist), "in2")]),
-        (inputnode, merge, [("name_source", "header_source")]),
-        (inputnode, mask_merge_tfms, [(("itk_bold_to_t1", _aslist), "in2")]),
-        (inputnode, bold_to_std_transform, [("bold_split", "input_image")]),
+        (inputnode, bold_to_std_transform, [
+            ("bold_split", "in_files" if fused else "input_image")]),
         (split_target, select_std, [("space", "key")]),
-        (select_std, merge_xforms, [("anat2std_xfm", "in1")]),
-        (select_std, mask_merge_tfms, [("anat2std_xfm", "in1")]),
         (split_target, gen_ref, [(("spec", _is_native), "keep_native")]),
         (select_tpl, gen_ref, [("out", "fixed_image")]),
         (merge_xforms, bold_to_std_transform, [("out", "transforms")]),
-        (gen_ref, bold_to_std_transform, [("out_file", "reference_image")]),
-        (gen_ref, mask_std_tfm, [("out_file", "reference_image")]),
-        (mask_merge_tfms, mask_std_tfm, [("out", "transforms")]),
-        (mask_std_tfm, gen_final_ref, [("output_image", "inputnode.bold_mask")]),
-        (bold_to_std_transform, threshold, [("out_files", "in_file")]),
-        (threshold, merge, [("out_file", "in_files")]),
+        (mask_std[0], gen_final_ref, [(mask_std[1], "inputnode.bold_mask")]),
         (merge, gen_final_ref, [("out_file", "inputnode.bold_file")]),
     ])
     # fmt:on
@@ -477,12 +707,19 @@ preprocessed BOLD runs*: {tpl}.
             (("std_target", format_reference), "spatial_reference")]),
         (merge, poutputnode, [("out_file", "bold_std")]),
         (gen_final_ref, poutputnode, [("outputnode.ref_image", "bold_std_ref")]),
-        (mask_std_tfm, poutputnode, [("output_image", "bold_mask_std")]),
+        (mask_std[0], poutputnode, [(mask_std[1], "bold_mask_std")]),
         (select_std, poutputnode, [("key", "template")]),
     ])
     # fmt:on
 
-    if freesurfer:
+    if freesurfer and fused:
+        # fmt:off
+        workflow.connect([
+            (split_labels, poutputnode, [("out2", "bold_aseg_std"),
+                                         ("out3", "bold_aparc_std")]),
+        ])
+        # fmt:on
+    elif freesurfer:
         # Sample the parcellation files to functional space
         aseg_std_tfm = pe.Node(
             ApplyTransforms(interpolation="MultiLabel"), name="aseg_std_tfm", mem_gb=1
@@ -505,15 +742,18 @@ preprocessed BOLD runs*: {tpl}.
 
     # Connect parametric outputs to a Join outputnode
     outputnode = pe.JoinNode(
-        niu.IdentityInterface(fields=output_names),
+        niu.IdentityInterface(fields=output_names + bool(cifti_output) * ["bold_subcortical"]),
         name="outputnode",
         joinsource="iterablesource",
+        joinfield=output_names,
     )
     # fmt:off
     workflow.connect([
         (poutputnode, outputnode, [(f, f) for f in output_names]),
     ])
     # fmt:on
+    if cifti_output:
+        workflow.connect(select_subcortical, "out", outputnode, "bold_subcortical")
     return workflow
 
 
@@ -524,6 +764,9 @@ def init_bold_preproc_trans_wf(
     use_compression=True,
     use_fieldwarp=False,
     interpolation="LanczosWindowedSinc",
+    fused=False,
+    num_volumes=None,
+    joint=False,
 ):
     """
     Resample in native (original) space.
@@ -554,11 +797,23 @@ def init_bold_preproc_trans_wf(
     interpolation : :obj:`str`
         Interpolation type to be used by ANTs' ``applyTransforms``
         (default ``"LanczosWindowedSinc"``)
+    fused : :obj:`bool`
+        Resample the whole series in one process
+        (see :py:class:`~fmriprep.interfaces.resampling.ResampleSeries`),
+        instead of splitting it and merging the resampled volumes back
+    num_volumes : :obj:`int` or None
+        Resample only the first volumes of the series (only if ``fused``),
+        e.g., when only a reference is calculated from them
+    joint : :obj:`bool`
+        Resample the 4D series of all echoes of a multi-echo run together,
+        computing the sampling coordinates of each volume once (only if ``fused``)
 
     Inputs
     ------
     bold_file
         Individual 3D volumes, not motion corrected
+        (if ``fused``, the 4D series may be given instead;
+        if ``joint``, the 4D series of all echoes)
     name_source
         BOLD series NIfTI file
         Used to recover original information lost during processing
@@ -571,12 +826,13 @@ def init_bold_preproc_trans_wf(
     -------
     bold
         BOLD series, resampled in native space, including all preprocessing
+        (if ``joint``, a list with a series per echo)
 
     """
     from fmriprep.interfaces.maths import Clip
+    from fmriprep.interfaces.resampling import MergeSeries, ResampleSeries
     from niworkflows.engine.workflows import LiterateWorkflow as Workflow
     from niworkflows.interfaces.itk import MultiApplyTransforms
-    from niworkflows.interfaces.nilearn import Merge
 
     workflow = Workflow(name=name)
     workflow.__desc__ = """\
@@ -613,32 +869,50 @@ the transforms to correct for head-motion"""
         mem_gb=DEFAULT_MEMORY_MIN_GB,
     )
 
-    bold_transform = pe.Node(
-        MultiApplyTransforms(interpolation=interpolation, copy_dtype=True),
-        name="bold_transform",
-        mem_gb=mem_gb * 3 * omp_nthreads,
-        n_procs=omp_nthreads,
-    )
+    if fused:
+        # Resample, clip and write the series in one shot
+        bold_transform = pe.Node(
+            ResampleSeries(interpolation=interpolation, compress=use_compression, joint=joint),
+            name="bold_transform",
+            mem_gb=mem_gb * 3,
+            n_procs=omp_nthreads,
+        )
+        if num_volumes is not None:
+            bold_transform.inputs.num_volumes = num_volumes
+        merge = bold_transform
+    else:
+        bold_transform = pe.Node(
+            MultiApplyTransforms(interpolation=interpolation, copy_dtype=True),
+            name="bold_transform",
+            mem_gb=mem_gb * 3 * omp_nthreads,
+            n_procs=omp_nthreads,
+        )
 
-    # Interpolation can occasionally produce below-zero values as an artifact
-    threshold = pe.MapNode(
-        Clip(minimum=0),
-        name="threshold",
-        iterfield=['in_file'],
-        mem_gb=DEFAULT_MEMORY_MIN_GB)
+        # Interpolation can occasionally produce below-zero values as an artifact
+        threshold = pe.MapNode(
+            Clip(minimum=0),
+            name="threshold",
+            iterfield=['in_file'],
+            mem_gb=DEFAULT_MEMORY_MIN_GB)
 
-    merge = pe.Node(Merge(compress=use_compression), name="merge", mem_gb=mem_gb * 3)
+        # Only one volume is held in memory at a time
+        merge = pe.Node(MergeSeries(compress=use_compression), name="merge", mem_gb=0.1)
+        # fmt:off
+        workflow.connect([
+            (bold_transform, threshold, [("out_files", "in_file")]),
+            (threshold, merge, [("out_file", "in_files")]),
+        ])
+        # fmt:on
 
     # fmt:off
     workflow.connect([
         (inputnode, merge_xforms, [("fieldwarp", "in1"),
                                    ("hmc_xforms", "in2")]),
-        (inputnode, bold_transform, [("bold_file", "input_image"),
-                                     (("bold_file", _first), "reference_image")]),
+        (inputnode, bold_transform, [
+            ("bold_file", "in_files" if fused else "input_image"),
+            (("bold_file", _first), "reference_image")]),
         (inputnode, merge, [("name_source", "header_source")]),
         (merge_xforms, bold_transform, [("out", "transforms")]),
-        (bold_transform, threshold, [("out_files", "in_file")]),
-        (threshold, merge, [("out_file", "in_files")]),
         (merge, outputnode, [("out_file", "bold")]),
     ])
     # fmt:on
@@ -646,7 +920,13 @@ the transforms to correct for head-motion"""
 
 
 def init_bold_grayords_wf(
-    grayord_density, mem_gb, repetition_time, name="bold_grayords_wf"
+    grayord_density,
+    mem_gb,
+    repetition_time,
+    name="bold_grayords_wf",
+    fused=False,
+    cache_dir=None,
+    subcortical_samples=False,
 ):
     """
     Sample Grayordinates files onto the fsLR atlas.
@@ -669,11 +949,25 @@ def init_bold_grayords_wf(
         Size of BOLD file in GB
     name : :obj:`str`
         Unique name for the subworkflow (default: ``"bold_grayords_wf"``)
+    fused : :obj:`bool`
+        Resample the surface series in process, with sparse matrices calculated once
+        (see :py:class:`~fmriprep.interfaces.resampling.ResampleSurfaceSeries`),
+        instead of running ``wb_command -metric-resample``
+    cache_dir : :obj:`str` or None
+        Directory where the resampling matrices are kept for reuse by other runs
+        (only if ``fused``)
+    subcortical_samples : :obj:`bool`
+        Build the volumetric part of the grayordinates from ``bold_subcortical``
+        (see :py:class:`~fmriprep.interfaces.cifti.CiftiFromSamples`), instead of
+        extracting it from the ``MNI152NLin6Asym`` series in ``bold_std``
 
     Inputs
     ------
     bold_std : :obj:`str`
         List of BOLD conversions to standard spaces.
+    bold_subcortical : :obj:`str`
+        BOLD series sampled at the subcortical grayordinates
+        (only if ``subcortical_samples``).
     spatial_reference :obj:`str`
         List of unique identifiers corresponding to the BOLD standard-conversions.
     subjects_dir : :obj:`str`
@@ -717,6 +1011,7 @@ surface space.
         niu.IdentityInterface(
             fields=[
                 "bold_std",
+                "bold_subcortical",
                 "spatial_reference",
                 "subjects_dir",
                 "surf_files",
@@ -738,15 +1033,6 @@ surface space.
         name="outputnode",
     )
 
-    # extract out to BOLD base
-    select_std = pe.Node(
-        KeySelect(fields=["bold_std"]),
-        name="select_std",
-        run_without_submitting=True,
-        nohash=True,
-    )
-    select_std.inputs.key = "MNI152NLin6Asym_res-%s" % mni_density
-
     select_fs_surf = pe.Node(
         KeySelect(fields=["surf_files"]),
         name="select_fs_surf",
@@ -757,8 +1043,16 @@ surface space.
 
     # Setup Workbench command. LR ordering for hemi can be assumed, as it is imposed
     # by the iterfield of the MapNode in the surface sampling workflow above.
+    if fused:
+        from ...interfaces.resampling import ResampleSurfaceSeries
+
+        metric_resample = ResampleSurfaceSeries()
+        if cache_dir:
+            metric_resample.inputs.cache_dir = cache_dir
+    else:
+        metric_resample = wb.MetricResample(method="ADAP_BARY_AREA", area_metrics=True)
     resample = pe.MapNode(
-        wb.MetricResample(method="ADAP_BARY_AREA", area_metrics=True),
+        metric_resample,
         name="resample",
         iterfield=[
             "in_file",
@@ -813,25 +1107,53 @@ surface space.
         "space-fsLR_hemi-%s_den-%s_bold.gii" % (h, grayord_density) for h in "LR"
     ]
 
-    gen_cifti = pe.Node(
-        GenerateCifti(
-            volume_target="MNI152NLin6Asym",
-            surface_target="fsLR",
-            TR=repetition_time,
-            surface_density=fslr_density,
-        ),
-        name="gen_cifti",
-    )
+    if subcortical_samples:
+        from ...interfaces.cifti import CiftiFromSamples
+
+        gen_cifti = pe.Node(
+            CiftiFromSamples(
+                label_file=str(tf.get(
+                    "MNI152NLin6Asym", atlas="HCP", suffix="dseg",
+                    resolution="2" if grayord_density == "91k" else "6",
+                )),
+                TR=repetition_time,
+                surface_density=fslr_density,
+            ),
+            name="gen_cifti",
+        )
+        workflow.connect(inputnode, "bold_subcortical", gen_cifti, "subcortical_file")
+    else:
+        # extract out to BOLD base
+        select_std = pe.Node(
+            KeySelect(fields=["bold_std"]),
+            name="select_std",
+            run_without_submitting=True,
+            nohash=True,
+        )
+        select_std.inputs.key = "MNI152NLin6Asym_res-%s" % mni_density
+        gen_cifti = pe.Node(
+            GenerateCifti(
+                volume_target="MNI152NLin6Asym",
+                surface_target="fsLR",
+                TR=repetition_time,
+                surface_density=fslr_density,
+            ),
+            name="gen_cifti",
+        )
+        # fmt:off
+        workflow.connect([
+            (inputnode, select_std, [("bold_std", "bold_std"),
+                                     ("spatial_reference", "keys")]),
+            (select_std, gen_cifti, [("bold_std", "bold_file")]),
+        ])
+        # fmt:on
 
     # fmt:off
     workflow.connect([
         (inputnode, gen_cifti, [("subjects_dir", "subjects_dir")]),
-        (inputnode, select_std, [("bold_std", "bold_std"),
-                                 ("spatial_reference", "keys")]),
         (inputnode, select_fs_surf, [("surf_files", "surf_files"),
                                      ("surf_refs", "keys")]),
         (select_fs_surf, resample, [("surf_files", "in_file")]),
-        (select_std, gen_cifti, [("bold_std", "bold_file")]),
         (resample, gen_cifti, [("out_file", "surface_bolds")]),
         (gen_cifti, outputnode, [("out_file", "cifti_bold"),
                                  ("variant", "cifti_variant"),
@@ -873,8 +1195,27 @@ def _select_template(template):
     return out[0]
 
 
+def _add_masked_target(reference_images, target_transforms, mask, target_transform):
+    """Append a target, restricted to the voxels of ``mask``, to those of the series."""
+    reference_images = list(reference_images)
+    return (
+        reference_images + [mask],
+        list(target_transforms) + [target_transform],
+        ["none"] * len(reference_images) + [mask],
+    )
+
+
+def _select_target(in_files, targets, target):
+    """Pick the series resampled onto ``target`` among those of all ``targets``."""
+    if not isinstance(in_files, list):
+        return in_files
+    return in_files[[tuple(t) for t in targets].index(tuple(target))]
+
+
 def _first(inlist):
-    return inlist[0]
+    if isinstance(inlist, (list, tuple)):
+        return inlist[0]
+    return inlist
 
 
 def _aslist(in_value):
@@ -53,7 +53,7 @@ class TShift(afni.TShift):
         return runtime
 
 
-def init_bold_stc_wf(metadata, name='bold_stc_wf'):
+def init_bold_stc_wf(metadata, name='bold_stc_wf', omp_nthreads=1, fused=False):
     """
     Create a workflow for :abbr:`STC (slice-timing correction)`.
 
@@ -77,6 +77,13 @@ def init_bold_stc_wf(metadata, name='bold_stc_wf'):
         BIDS metadata for BOLD file
     name : :obj:`str`
         Name of workflow (default: ``bold_stc_wf``)
+    omp_nthreads : :obj:`int`
+        Maximum number of threads an individual process may use (only if ``fused``)
+    fused : :obj:`bool`
+        Shift the slices in-process and write the output with the header of the
+        input in one pass (see
+        :py:class:`~fmriprep.interfaces.stc.SliceTimingCorrection`), instead of
+        running ``3dTshift`` and fixing the header of its output
 
     Inputs
     ------
@@ -99,9 +106,15 @@ def init_bold_stc_wf(metadata, name='bold_stc_wf'):
     frac = config.workflow.slice_time_ref
     tzero = np.round(first + frac * (last - first), 3)
 
-    afni_ver = ''.join('%02d' % v for v in afni.Info().version() or [])
     workflow = Workflow(name=name)
-    workflow.__desc__ = f"""\
+    if fused:
+        workflow.__desc__ = f"""\
+BOLD runs were slice-time corrected to {tzero:0.3g}s ({frac:g} of slice acquisition range
+{first:.3g}s-{last:.3g}s) by Fourier interpolation of the time series of each slice.
+"""
+    else:
+        afni_ver = ''.join('%02d' % v for v in afni.Info().version() or [])
+        workflow.__desc__ = f"""\
 BOLD runs were slice-time corrected to {tzero:0.3g}s ({frac:g} of slice acquisition range
 {first:.3g}s-{last:.3g}s) using `3dTshift` from AFNI {afni_ver} [@afni, RRID:SCR_005927].
 """
@@ -110,6 +123,26 @@ BOLD runs were slice-time corrected to {tzero:0.3g}s ({frac:g} of slice acquisit
 
     LOGGER.log(25, f'BOLD series will be slice-timing corrected to an offset of {tzero:.3g}s.')
 
+    if fused:
+        from ...interfaces.stc import SLAB_BYTES_PER_SAMPLE, SliceTimingCorrection
+
+        stc = SliceTimingCorrection(
+            tr=metadata['RepetitionTime'],
+            slice_timing=metadata['SliceTiming'],
+            slice_encoding_direction=metadata.get('SliceEncodingDirection', 'k'),
+            tzero=tzero)
+        # Only one slab of the series is held in memory, whatever the size of the series
+        slice_timing_correction = pe.Node(
+            stc, name='slice_timing_correction', n_procs=omp_nthreads,
+            mem_gb=stc.inputs.chunk_size * SLAB_BYTES_PER_SAMPLE / 1024 ** 3)
+
+        workflow.connect([
+            (inputnode, slice_timing_correction, [('bold_file', 'in_file'),
+                                                  ('skip_vols', 'ignore')]),
+            (slice_timing_correction, outputnode, [('out_file', 'stc_file')]),
+        ])
+        return workflow
+
     # It would be good to fingerprint memory use of afni.TShift
     slice_timing_correction = pe.Node(
         TShift(outputtype='NIFTI_GZ',
@@ -30,7 +30,7 @@ Generate T2* map from multi-echo BOLD images
 from nipype.pipeline import engine as pe
 from nipype.interfaces import utility as niu
 
-from ...interfaces.multiecho import T2SMap
+from ...interfaces.multiecho import T2SMap, FusedT2SMap
 from ... import config
 
 
@@ -39,7 +39,7 @@ LOGGER = config.loggers.workflow
 
 # pylint: disable=R0914
 def init_bold_t2s_wf(echo_times, mem_gb, omp_nthreads,
-                     name='bold_t2s_wf'):
+                     name='bold_t2s_wf', fused=False):
     r"""
     Combine multiple echos of :abbr:`ME-EPI (multi-echo echo-planar imaging)`.
 
@@ -62,6 +62,11 @@ def init_bold_t2s_wf(echo_times, mem_gb, omp_nthreads,
         Maximum number of threads an individual process may use
     name : :obj:`str`
         Name of workflow (default: ``bold_t2s_wf``)
+    fused : :obj:`bool`
+        Fit the decay of all voxels at once within the workflow's process and
+        stream the optimally combined series
+        (see :py:class:`~fmriprep.interfaces.multiecho.FusedT2SMap`), instead of
+        running *tedana*
 
     Inputs
     ------
@@ -98,7 +103,11 @@ The optimally combined time series was carried forward as the *preprocessed BOLD
 
     LOGGER.log(25, 'Generating T2* map and optimally combined ME-EPI time series.')
 
-    t2smap_node = pe.Node(T2SMap(echo_times=list(echo_times)), name='t2smap_node')
+    if fused:
+        t2smap_node = pe.Node(FusedT2SMap(echo_times=list(echo_times)), name='t2smap_node',
+                              n_procs=omp_nthreads)
+    else:
+        t2smap_node = pe.Node(T2SMap(echo_times=list(echo_times)), name='t2smap_node')
 
     workflow.connect([
         (inputnode, t2smap_node, [('bold_file', 'in_files'),
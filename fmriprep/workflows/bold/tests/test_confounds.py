@@ -23,9 +23,10 @@
 ''' Testing module for fmriprep.workflows.bold.confounds '''
 import pytest
 import os
+import numpy as np
 import nibabel as nib
 
-from ..confounds import _add_volumes, _remove_volumes
+from ..confounds import _add_volumes, _remove_volumes, init_bold_confs_wf
 
 
 skip_pytest = pytest.mark.skipif(
@@ -67,3 +68,48 @@ def test_add_volumes():
     os.remove(add_file)
 
     assert out_volumes == expected_volumes
+
+
+@pytest.mark.parametrize("dtype,slope", [("float32", None), ("int16", 2.0)])
+def test_remove_add_volumes_roundtrip(tmp_path, monkeypatch, dtype, slope):
+    monkeypatch.chdir(tmp_path)
+    data = np.arange(4 * 5 * 6 * 10).reshape((4, 5, 6, 10)).astype(dtype)
+    img = nib.Nifti1Image(data, np.diag([2.0, 2.0, 2.0, 1.0]))
+    img.header.set_zooms((2.0, 2.0, 2.0, 1.5))
+    if slope is not None:
+        img.header.set_slope_inter(slope, 1.0)
+    bold_file = str(tmp_path / "sub-01_task-rest_bold.nii.gz")
+    img.to_filename(bold_file)
+    expected = nib.load(bold_file).get_fdata()
+
+    cut_file = _remove_volumes(bold_file, 3)
+    assert cut_file.endswith("_cut.nii")
+    cut_img = nib.load(cut_file)
+    assert cut_img.header.get_zooms() == (2.0, 2.0, 2.0, 1.5)
+    assert np.allclose(cut_img.affine, img.affine)
+    assert np.array_equal(cut_img.get_fdata(), expected[..., 3:])
+
+    # Denoised series as written by FSL, in a different data type
+    denoised_file = str(tmp_path / "denoised_func_data_nonaggr.nii.gz")
+    nib.Nifti1Image(cut_img.get_fdata(dtype="float32"),
+                    cut_img.affine).to_filename(denoised_file)
+
+    add_file = _add_volumes(bold_file, denoised_file, 3)
+    assert np.array_equal(nib.load(add_file).get_fdata(), expected)
+
+    assert _remove_volumes(bold_file, 0) == bold_file
+    assert _add_volumes(bold_file, denoised_file, 0) == denoised_file
+
+
+@pytest.mark.parametrize("fused_masks", [False, True])
+@pytest.mark.parametrize("fused", [False, True])
+def test_bold_confs_wf_masks(fused, fused_masks):
+    """The projection of aCompCor masks does not depend on the confounds engine."""
+    wf = init_bold_confs_wf(
+        mem_gb=1, metadata={"RepetitionTime": 2.0}, regressors_all_comps=False,
+        regressors_dvars_th=1.5, regressors_fd_th=0.5, fused=fused, fused_masks=fused_masks,
+    )
+    nodes = set(wf.list_node_names())
+    assert ("acc_msk" in nodes) is fused_masks
+    assert ("acc_msk_tfm" in nodes) is not fused_masks
+    assert ("fused_confounds" in nodes) is fused
@@ -0,0 +1,38 @@
+''' Testing module for fmriprep.workflows.bold.resampling '''
+import pytest
+
+from .... import config
+from ..resampling import init_bold_std_trans_wf
+
+
+@pytest.mark.parametrize("aroma_native", [False, True])
+@pytest.mark.parametrize("use_aroma", [False, True])
+def test_std_trans_cifti_aroma(tmp_path, monkeypatch, use_aroma, aroma_native):
+    """The MNI152NLin6Asym res-2 series is generated whenever ICA-AROMA runs."""
+    import templateflow.api as tf
+
+    label_file = tmp_path / "dseg.nii.gz"
+    label_file.touch()
+    monkeypatch.setattr(tf, "get", lambda *args, **kwargs: str(label_file))
+    monkeypatch.setattr(
+        config.execution, "output_spaces", "MNI152NLin2009cAsym:res-2 fsaverage:den-10k"
+    )
+    monkeypatch.setattr(config.workflow, "use_aroma", use_aroma)
+    monkeypatch.setattr(config.workflow, "aroma_native", aroma_native)
+    monkeypatch.setattr(config.workflow, "cifti_output", "91k")
+    monkeypatch.setattr(config.workflow, "spaces", None)
+    config.init_spaces()
+
+    wf = init_bold_std_trans_wf(
+        freesurfer=True,
+        mem_gb=1,
+        omp_nthreads=1,
+        spaces=config.workflow.spaces,
+        fused=True,
+        cifti_output=config.workflow.cifti_output,
+        use_aroma=config.workflow.use_aroma,
+    )
+    targets = dict(wf.get_node("iterablesource").iterables)["std_target"]
+    assert ("MNI152NLin2009cAsym", {"res": "2"}) in targets
+    assert (("MNI152NLin6Asym", {"res": "2"}) in targets) is use_aroma
+    assert wf.get_node("cifti_warp") is not None